@@ -0,0 +1,157 @@
+import atexit
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+from balls import BALL_TYPES
+from snapshot import capture, restore
+
+ANGLES = (-90, 0)
+POWERS = (1, 10)
+COARSE_ANGLE_STEP = 6
+COARSE_POWER_STEP = 1.5
+FINE_ANGLE_STEP = 1
+FINE_POWER_STEP = 0.3 # Power moves in 0.1 steps, so every candidate can be dialled in
+FINE_CANDIDATES = 3 # Best coarse shots refined
+MAX_FRAMES = 240 # A shot still bouncing or collapsing after this long is scored as it stands
+
+def shot_grid(angle_lo, angle_hi, angle_step, power_lo, power_hi, power_step):
+    angles = range(max(ANGLES[0], angle_lo), min(ANGLES[1], angle_hi) + 1, angle_step)
+    n_powers = int(round((power_hi - power_lo) / power_step)) + 1
+    powers = [round(power_lo + k * power_step, 2) for k in range(n_powers)]
+    return [(a, p) for a in angles for p in powers if POWERS[0] <= p <= POWERS[1]]
+
+def layout_key(sim):
+    # Identifies everything a shot's outcome depends on
+    blocks = sim.blocks
+    n = blocks.count
+    h = hashlib.blake2b(digest_size=16)
+    for column in (blocks.x, blocks.y, blocks.width, blocks.height, blocks.vy, blocks.hp, blocks.type_id, blocks.active, blocks.awake):
+        h.update(column[:n].tobytes())
+    h.update(repr((sim.width, sim.height, sim.launcher.x, sim.launcher.y, sim.current_ball_type, sim.big_ball_timer > 0)).encode())
+    return h.hexdigest()
+
+def evaluate_shots(state, shots):
+    # Worker: fires each shot alone into a copy of the stage and returns
+    # (blocks destroyed, -frames taken, angle, power) for each. Blocks knocked
+    # loose fall and can break on landing as in a game, so a shot counts as
+    # taken until its ball is gone and every block has come to rest.
+    sim = pickle.loads(state)
+    start = capture(sim)
+    blocks, balls = sim.blocks, sim.balls
+    remaining = blocks.remaining
+    ball_type = BALL_TYPES.index(sim.current_ball_type)
+    radius = 6 if sim.big_ball_timer > 0 else 3
+    results = []
+    for angle, power in shots:
+        restore(sim, start)
+        balls.clear()
+        balls.spawn(sim.launcher.x, sim.launcher.y, angle, power, ball_type, radius)
+        frame = 0
+        while frame < MAX_FRAMES and (len(balls) or blocks.awake_count):
+            sim.update_balls()
+            sim.settle_blocks()
+            balls.compact()
+            sim.events = []
+            sim.items = []
+            frame += 1
+        results.append((remaining - blocks.remaining, -frame, angle, power))
+    return results
+
+class AimSolver:
+    # Searches launcher angle and power for the shot that destroys the most
+    # blocks, on worker processes. request() starts a search and returns at
+    # once; poll() collects finished chunks, so `best` improves while the
+    # game keeps running. A coarse grid runs first, then the area around the
+    # best few coarse shots is searched at full resolution. Finished answers
+    # are cached by layout_key().
+    def __init__(self, workers=None, cache_size=64):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.key = None
+        self.state = None
+        self.pending = []
+        self.phase = None # "coarse", "fine" or None when idle
+        self.coarse = []
+        self.best = None # (destroyed, -frames, angle, power)
+        self.total = 0 # Active blocks when the search started
+        atexit.register(self.close)
+
+    def request(self, sim):
+        key = layout_key(sim)
+        if key == self.key:
+            return
+        self.cancel()
+        self.key = key
+        self.best = None
+        self.total = len(sim.blocks)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.best = self.cache[key]
+            return
+        self.state = pickle.dumps(sim)
+        self.submit("coarse", shot_grid(*ANGLES, COARSE_ANGLE_STEP, *POWERS, COARSE_POWER_STEP))
+
+    def submit(self, phase, shots):
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor # ~25 ms of imports, so only once the hint is used
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.phase = phase
+        chunk = max(1, -(-len(shots) // (self.workers * 4))) # A few chunks per worker so results stream in
+        self.pending = [self.executor.submit(evaluate_shots, self.state, shots[i:i + chunk]) for i in range(0, len(shots), chunk)]
+
+    def poll(self):
+        if self.phase is None:
+            return
+        still_pending = []
+        for future in self.pending:
+            if not future.done():
+                still_pending.append(future)
+                continue
+            results = future.result()
+            if self.phase == "coarse":
+                self.coarse.extend(results)
+            for result in results:
+                if self.best is None or result > self.best:
+                    self.best = result
+        self.pending = still_pending
+        if still_pending:
+            return
+        if self.phase == "coarse" and self.best[0] < self.total:
+            # Nothing cleared the stage, so refine around the best coarse shots
+            shots = set()
+            for _, _, angle, power in sorted(self.coarse, reverse=True)[:FINE_CANDIDATES]:
+                shots.update(shot_grid(angle - COARSE_ANGLE_STEP, angle + COARSE_ANGLE_STEP, FINE_ANGLE_STEP,
+                                       power - COARSE_POWER_STEP, power + COARSE_POWER_STEP, FINE_POWER_STEP))
+            self.coarse = []
+            self.submit("fine", sorted(shots))
+            return
+        self.finish()
+
+    def finish(self):
+        self.cache[self.key] = self.best
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        self.phase = None
+        self.coarse = []
+        self.state = None
+
+    def searching(self):
+        return self.phase is not None
+
+    def cancel(self):
+        for future in self.pending:
+            future.cancel()
+        self.pending = []
+        self.phase = None
+        self.coarse = []
+        self.key = None
+
+    def close(self):
+        self.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
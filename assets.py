@@ -0,0 +1,137 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import zipfile
+
+import pyxel
+
+from renderer import ATLAS_SPECS, LayeredRenderer, atlas_for, background_sheet_name, use_sheets
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PACK_PATH = os.path.join(HERE, "assets.pyxres")
+MANIFEST_NAME = "demolisher.json" # Extra zip entry in the pack; pyxel.load ignores it
+SHEET_WIDTH = 1280 # Wide enough for both launcher atlases side by side
+BACKGROUND_STAGES = 6 # Stages past the fifth share one background
+
+
+# Sound id -> (notes, tones, volumes, effects, speed)
+SOUNDS = {
+    0: ("c2", "t", "7", "s", 3), # Ball hits a block
+    1: ("c1", "n", "7", "s", 7), # Wood/glass breaks, bomb blast
+    2: ("c2", "t", "7", "s", 10), # Stone breaks
+    3: ("c1e1g1", "t", "7", "s", 5), # Launch
+    4: ("c3", "p", "7", "s", 10), # Item pickup
+    5: ("c3e3g3", "p", "6", "s", 8), # Combo
+    6: ("c4", "s", "7", "v", 15), # Laser
+    7: ("c4", "t", "7", "s", 10), # Fever start
+    8: ("c4g4c4", "t", "7", "s", 10), # Full power
+    10: ("g2c3e3g3c3g3e3c3", "p", "6", "s", 15),
+    11: ("c1g1c2g2c1g1c2g2", "t", "7", "s", 15),
+    12: ("c4e4g4c4", "t", "7", "s", 10),
+    13: ("g3e3c3a2", "t", "7", "f", 12),
+    14: ("c3g3c4g4 c3g3c4g4", "p", "6", "s", 12),
+}
+# Music id -> one sound sequence per channel: normal, stage clear, game over, fever
+MUSICS = {0: ([10], [11]), 1: ([12],), 2: ([13],), 3: ([14],)}
+
+def setup_sounds():
+    for sound_id, params in SOUNDS.items():
+        pyxel.sounds[sound_id].set(*params)
+    for music_id, seqs in MUSICS.items():
+        pyxel.musics[music_id].set(*seqs)
+
+def source_hash(width, height, images):
+    # Changes whenever the pack would come out differently, so a stale pack
+    # is never loaded. Images are painted by renderer.py, so with images any
+    # change there counts.
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((width, height, SOUNDS, MUSICS)).encode())
+    if images:
+        with open(os.path.join(HERE, "renderer.py"), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+def read_manifest(path):
+    try:
+        with zipfile.ZipFile(path) as pack:
+            return json.loads(pack.read(MANIFEST_NAME))
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        return None
+
+def load_pack(width, height, path=PACK_PATH):
+    # One pyxel.load for every sound, music and pre-rendered sheet. Without a
+    # pack made from the current sources, sounds are set up here and the
+    # renderer paints everything itself on first use. True if the pack loaded.
+    manifest = read_manifest(path)
+    if manifest is None or manifest["hash"] != source_hash(width, height, bool(manifest["sheets"])):
+        if manifest is not None:
+            print(f"{os.path.basename(path)} is out of date, using procedural assets (rebuild with: python3 assets.py)", file=sys.stderr)
+        setup_sounds()
+        return False
+    pyxel.load(path, exclude_images=not manifest["sheets"], exclude_tilemaps=True)
+    use_sheets({name: (pyxel.images[bank], u, v, color) for name, (bank, u, v, color) in manifest["sheets"].items()})
+    return True
+
+def pack_shelves(pieces, width):
+    # Tallest first, left to right in rows; returns {name: (u, v)} and the height used
+    placed = {}
+    x = y = row_height = 0
+    for name, image, _ in sorted(pieces, key=lambda piece: -piece[1].height):
+        if x + image.width > width:
+            x, y, row_height = 0, y + row_height, 0
+        placed[name] = (x, y)
+        x += image.width
+        row_height = max(row_height, image.height)
+    return placed, y + row_height
+
+def bake(width, height, ground_y, path=PACK_PATH, images=False):
+    # Needs pyxel.init. With images, every atlas and background goes into
+    # image bank 0 as one sheet; backgrounds are keyed by ground_y, so a stage
+    # with other ground paints its own. pyxel parses a pack's image data at
+    # roughly 0.3 us per pixel, far slower than painting these on first use,
+    # so by default only sounds and musics are baked.
+    setup_sounds()
+    if not images:
+        pyxel.save(path, exclude_images=True, exclude_tilemaps=True)
+        write_manifest(path, {"hash": source_hash(width, height, False), "sheets": {}})
+        return None
+    pieces = [(style, atlas_for(style).image, None) for style in ATLAS_SPECS]
+    renderer = LayeredRenderer(width, height)
+    for stage in range(BACKGROUND_STAGES):
+        color, images = renderer.background(stage, ground_y)
+        for variant, (image, _, _) in enumerate(images):
+            pieces.append((background_sheet_name(stage, ground_y, variant), image, color))
+    placed, sheet_height = pack_shelves(pieces, SHEET_WIDTH)
+    sheet = pyxel.Image(SHEET_WIDTH, sheet_height)
+    sheets = {}
+    for name, image, color in pieces:
+        u, v = placed[name]
+        sheet.blt(u, v, image, 0, 0, image.width, image.height)
+        sheets[name] = (0, u, v, color)
+    pyxel.images[0] = sheet
+    pyxel.save(path, exclude_tilemaps=True)
+    write_manifest(path, {"hash": source_hash(width, height, True), "sheets": sheets})
+    return sheet
+
+def write_manifest(path, manifest):
+    with zipfile.ZipFile(path, "a", zipfile.ZIP_DEFLATED) as pack:
+        pack.writestr(MANIFEST_NAME, json.dumps(manifest))
+
+def main():
+    parser = argparse.ArgumentParser(description="Bake Pyxel Demolisher's sounds and pre-rendered images into a resource pack")
+    parser.add_argument("--out", default=PACK_PATH)
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--height", type=int, default=150)
+    parser.add_argument("--images", action="store_true", help="also bake launcher/ball atlases and backgrounds (slower to load than to paint)")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    pyxel.init(args.width, args.height, headless=True)
+    sheet = bake(args.width, args.height, args.height - 5, args.out, args.images) # Simulation puts the ground 5 pixels above the bottom
+    contents = f"{len(SOUNDS)} sounds, {len(MUSICS)} musics" + (f", {sheet.width}x{sheet.height} sheet" if sheet else "")
+    print(f"wrote {args.out}: {contents}, {os.path.getsize(args.out)} bytes in {time.perf_counter() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+FRAMES_PER_SECOND = 30
+TICKS_PER_SECOND = 120 # A note of speed 1 lasts one tick
+
+def note_count(notes):
+    # Notes and rests in a pyxel note string such as "c3e3g3" or "c4 r g4"
+    return sum(1 for c in notes.lower() if c in "abcdefgr")
+
+def sound_frames(notes, speed):
+    return max(1, -(-note_count(notes) * speed * FRAMES_PER_SECOND // TICKS_PER_SECOND))
+
+class AudioMixer:
+    # Collects the frame's sound and music requests and turns them into at
+    # most one play per channel in flush(). Repeats of a sound within the
+    # frame collapse into one request. Requests are served highest priority
+    # first; each takes an idle channel, or else the channel playing the
+    # least important sound that is no more important than itself. Anything
+    # left over is dropped. Channels held by the current music are never
+    # used for sound effects.
+    #
+    # flush() returns commands for the caller to apply:
+    #   ("stop",), ("playm", music_id, loop), ("play", channel, sound_id)
+    def __init__(self, durations, priorities, music_channels, music_durations, num_channels=4):
+        self.durations = durations # Sound id -> length in frames
+        self.priorities = priorities # Sound id -> priority, higher wins
+        self.music_channels = music_channels # Music id -> channels it plays on
+        self.music_durations = music_durations # Music id -> length in frames
+        self.num_channels = num_channels
+        self.frame = 0
+        self.requests = []
+        self.music_request = None # ("stop",) or ("playm", music_id, loop)
+        self.music_until = 0 # Frame the current music stops holding its channels
+        self.music_held = ()
+        self.playing = [None] * num_channels # Sound id per channel
+        self.busy_until = [0] * num_channels
+        self.plays = 0 # Lifetime play commands issued
+        self.requested = 0 # Lifetime sound requests
+
+    def play(self, sound_id):
+        self.requested += 1
+        if sound_id not in self.requests:
+            self.requests.append(sound_id)
+
+    def music(self, music_id, loop):
+        # Stops everything, sound effects included, like a scene change
+        self.music_request = ("playm", music_id, loop)
+
+    def stop(self):
+        self.music_request = ("stop",)
+
+    def flush(self):
+        commands = []
+        frame = self.frame
+        if self.music_request is not None:
+            commands.append(("stop",))
+            self.playing = [None] * self.num_channels
+            self.busy_until = [0] * self.num_channels
+            self.music_held = ()
+            if self.music_request[0] == "playm":
+                _, music_id, loop = self.music_request
+                commands.append(self.music_request)
+                self.music_held = self.music_channels[music_id]
+                self.music_until = None if loop else frame + self.music_durations[music_id]
+            self.music_request = None
+        if self.music_held and self.music_until is not None and frame >= self.music_until:
+            self.music_held = ()
+
+        requests = sorted(self.requests, key=lambda sound_id: -self.priorities.get(sound_id, 0)) # Stable: ties keep request order
+        self.requests = []
+        used = set()
+        for sound_id in requests:
+            priority = self.priorities.get(sound_id, 0)
+            best = None
+            best_key = None
+            for ch in range(self.num_channels):
+                if ch in used or ch in self.music_held:
+                    continue
+                if self.busy_until[ch] <= frame:
+                    key = (0, 0, ch) # Idle
+                else:
+                    current = self.priorities.get(self.playing[ch], 0)
+                    if current > priority:
+                        continue
+                    key = (1, current, self.busy_until[ch])
+                if best_key is None or key < best_key:
+                    best, best_key = ch, key
+            if best is None:
+                continue
+            used.add(best)
+            self.playing[best] = sound_id
+            self.busy_until[best] = frame + self.durations.get(sound_id, 1)
+            commands.append(("play", best, sound_id))
+            self.plays += 1
+        self.frame += 1
+        return commands
@@ -0,0 +1,123 @@
+import math
+
+import numpy as np
+
+BALL_TYPES = ["normal", "bomb", "pierce"]
+NORMAL = 0
+BOMB = 1
+PIERCE = 2
+
+class BallStore:
+    # All live balls as parallel NumPy columns. Integration, culling and the
+    # broadphase test run over every ball at once; only balls that are near a
+    # block drop back to per-ball Python for the collision response.
+    def __init__(self, capacity=64, style="Normal", gravity=0.15):
+        self.style = style
+        self.gravity = gravity
+        self.count = 0
+        self.capacity = 0
+        self.high_water = 0
+        self.allocations = 0 # Times the columns were (re)allocated
+        self.frame_allocations = 0
+        self.x = self.y = self.vx = self.vy = self.radius = None
+        self.prev_x = self.prev_y = None # Positions at the start of the tick, for interpolated drawing
+        self.ball_type = self.pierce_count = self.active = None
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        def resize(old, dtype):
+            new = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+        self.x = resize(self.x, np.float64)
+        self.y = resize(self.y, np.float64)
+        self.vx = resize(self.vx, np.float64)
+        self.vy = resize(self.vy, np.float64)
+        self.prev_x = resize(self.prev_x, np.float64)
+        self.prev_y = resize(self.prev_y, np.float64)
+        self.radius = resize(self.radius, np.float64)
+        self.ball_type = resize(self.ball_type, np.int8)
+        self.pierce_count = resize(self.pierce_count, np.int16)
+        self.active = resize(self.active, np.bool_)
+        self.capacity = capacity
+        self.allocations += 1
+        self.frame_allocations += 1
+
+    def spawn(self, x, y, angle, power, ball_type=NORMAL, radius=3):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = math.cos(math.radians(angle)) * power
+        self.vy[i] = math.sin(math.radians(angle)) * power
+        self.prev_x[i] = x
+        self.prev_y[i] = y
+        self.radius[i] = radius
+        self.ball_type[i] = ball_type
+        self.pierce_count[i] = 0
+        self.active[i] = True
+        self.count += 1
+        if self.count > self.high_water:
+            self.high_water = self.count
+        return i
+
+    def clear(self):
+        self.count = 0
+
+    def begin_frame(self):
+        self.frame_allocations = 0
+
+    def stats(self):
+        return {"live": self.count, "free": self.capacity - self.count, "high_water": self.high_water,
+                "allocations": self.allocations, "frame_allocations": self.frame_allocations}
+
+    def set_radius(self, radius):
+        self.radius[:self.count] = radius
+
+    def begin_tick(self):
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+
+    def integrate(self, width, height, dt=1.0):
+        # dt is the share of a tick moved; velocities are in pixels per tick
+        n = self.count
+        if n == 0:
+            return
+        x, y, vy, r = self.x[:n], self.y[:n], self.vy[:n], self.radius[:n]
+        vy += self.gravity * dt
+        x += self.vx[:n] * dt
+        y += vy * dt
+        self.active[:n] &= ~((x < -r) | (x > width + r) | (y > height + r))
+
+    def near_blocks(self, grid, dt=1.0):
+        # Indices of active balls whose swept bounds over the last move touch
+        # an occupied grid cell, in spawn order
+        n = self.count
+        if n <= 8:
+            # Too few to amortize the vectorized test; the per-ball grid
+            # query in the collision response already skips empty space
+            return np.flatnonzero(self.active[:n]).tolist()
+        x, y, r = self.x[:n], self.y[:n], self.radius[:n]
+        prev_x = x - self.vx[:n] * dt
+        prev_y = y - self.vy[:n] * dt
+        hit = grid.any_in_rects(np.minimum(prev_x, x) - r, np.minimum(prev_y, y) - r,
+                                np.maximum(prev_x, x) + r, np.maximum(prev_y, y) + r)
+        return np.flatnonzero(hit & self.active[:n]).tolist()
+
+    def compact(self):
+        # Stable compaction: balls keep their spawn order, which decides who
+        # gets to a shared block first
+        n = self.count
+        keep = np.flatnonzero(self.active[:n])
+        k = len(keep)
+        if k == n:
+            return
+        for column in (self.x, self.y, self.vx, self.vy, self.prev_x, self.prev_y, self.radius, self.ball_type, self.pierce_count, self.active):
+            column[:k] = column[keep]
+        self.count = k
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,36 @@
+# Aim hint search time per stage: time to the first streamed answer and to
+# the final one, with the solver's default worker count.
+#
+#   python benchmarks/bench_aim.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from aim import AimSolver
+from simulation import Simulation
+
+STAGES = [0, 10, 30, 60, 100, 200]
+
+def main():
+    solver = AimSolver()
+    print(f"{solver.workers} workers")
+    print(f"{'stage':>6} {'blocks':>7} {'first ms':>9} {'final ms':>9} {'destroyed':>10} {'angle':>6} {'power':>6}")
+    for stage in STAGES:
+        sim = Simulation(stage=stage, seed=stage)
+        t = time.perf_counter()
+        first = None
+        solver.request(sim)
+        while solver.searching():
+            solver.poll()
+            if first is None and solver.best is not None:
+                first = time.perf_counter() - t
+            time.sleep(0.001)
+        final = time.perf_counter() - t
+        destroyed, _, angle, power = solver.best
+        print(f"{stage:>6} {len(sim.blocks):>7} {first * 1000:>9.0f} {final * 1000:>9.0f} {destroyed:>10} {angle:>6} {power:>6}")
+    solver.close()
+
+if __name__ == "__main__":
+    main()
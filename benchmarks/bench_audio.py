@@ -0,0 +1,47 @@
+# Sound requests against play calls per frame through a bomb-ball fever run,
+# where one frame can ask for dozens of sounds.
+#
+#   python benchmarks/bench_audio.py
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from demolisher import make_mixer
+from simulation import Simulation, INPUT_FIRE, INPUT_LEFT, INPUT_RIGHT
+
+STAGE = 100
+FRAMES = 600
+
+def main():
+    sim = Simulation(stage=STAGE, seed=1)
+    sim.current_ball_type = "bomb"
+    sim.fever_mode = True
+    sim.fever_timer = FRAMES + 1
+    mixer = make_mixer()
+    full = len(sim.blocks)
+    requests = []
+    plays = []
+    for frame in range(FRAMES):
+        if len(sim.blocks) < full // 2:
+            sim.generate_random_blocks()
+        sim.outcome = None
+        buttons = INPUT_FIRE | (INPUT_LEFT if frame // 60 % 2 else INPUT_RIGHT)
+        sounds = 0
+        for event in sim.step(buttons):
+            if event[0] == "sound":
+                mixer.play(event[1])
+                sounds += 1
+            elif event[0] == "music":
+                mixer.music(event[1], event[2])
+        requests.append(sounds)
+        plays.append(sum(1 for command in mixer.flush() if command[0] == "play"))
+
+    busy = [i for i, n in enumerate(requests) if n > 1]
+    print(f"stage {STAGE}, {FRAMES} fever frames with bomb balls")
+    print(f"{'':>16} {'total':>7} {'max/frame':>10} {'frames > 1':>11}")
+    print(f"{'sound requests':>16} {sum(requests):>7} {max(requests):>10} {len(busy):>11}")
+    print(f"{'play calls':>16} {sum(plays):>7} {max(plays):>10} {sum(1 for n in plays if n > 1):>11}")
+
+if __name__ == "__main__":
+    main()
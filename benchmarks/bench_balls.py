@@ -0,0 +1,43 @@
+# Frame time of Simulation.step with many simultaneous balls in flight,
+# as in fever mode combined with multi-ball.
+#
+#   python benchmarks/bench_balls.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulation import Simulation
+
+BALL_COUNTS = [10, 100, 1000, 3000]
+STAGE = 50
+FRAMES = 200
+
+def run(live_balls):
+    sim = Simulation(stage=STAGE, seed=1)
+    rng = random.Random(1)
+    times = []
+    for _ in range(FRAMES):
+        sim.balls_left = 1000
+        while len(sim.balls) < live_balls:
+            sim.balls.spawn(sim.launcher.x, sim.launcher.y, rng.uniform(-85, -5), rng.uniform(3, 15))
+        if len(sim.blocks) < STAGE:
+            sim.generate_random_blocks()
+        t = time.perf_counter()
+        sim.step(0)
+        times.append(time.perf_counter() - t)
+        sim.outcome = None
+    times.sort()
+    return sum(times) / len(times) * 1000, times[int(len(times) * 0.95)] * 1000
+
+def main():
+    print(f"stage {STAGE}, {FRAMES} frames, budget 33.3ms")
+    print(f"{'balls':>6} {'mean':>10} {'p95':>10}")
+    for count in BALL_COUNTS:
+        mean, p95 = run(count)
+        print(f"{count:>6} {mean:>8.3f}ms {p95:>8.3f}ms")
+
+if __name__ == "__main__":
+    main()
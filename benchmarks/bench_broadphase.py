@@ -0,0 +1,79 @@
+# Frame time of Simulation.step across stages with dozens of live balls,
+# using the uniform grid versus a plain scan of every block.
+#
+#   python benchmarks/bench_broadphase.py
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import simulation
+from simulation import Simulation
+
+STAGES = [0, 25, 50, 100, 200, 400]
+LIVE_BALLS = 48
+FRAMES = 300
+
+class BruteForceGrid:
+    # Same interface as BlockGrid, but every query returns every block
+    def __init__(self, cell_size=16):
+        self.bounds = {}
+
+    def insert(self, i, x, y, width, height):
+        self.bounds[i] = (x, y, x + width, y + height)
+
+    def place(self, i, x, y, width, height):
+        self.insert(i, x, y, width, height)
+
+    def remove(self, i):
+        self.bounds.pop(i, None)
+
+    def query(self, x0, y0, x1, y1):
+        return sorted(self.bounds) # Settled blocks go back in out of index order
+
+    def query_after(self, x0, y0, x1, y1, after):
+        return [i for i in self.query(x0, y0, x1, y1) if i > after]
+
+    def any_in_rects(self, x0, y0, x1, y1):
+        return np.full(len(x0), len(self.bounds) > 0)
+
+    def __len__(self):
+        return len(self.bounds)
+
+def run(stage, grid_class):
+    simulation.BlockGrid = grid_class
+    sim = Simulation(stage=stage, seed=stage)
+    rng = random.Random(stage)
+    full = len(sim.blocks)
+    times = []
+    for _ in range(FRAMES):
+        sim.balls_left = 1000
+        while len(sim.balls) < LIVE_BALLS:
+            angle = rng.uniform(-80, -20)
+            sim.balls.spawn(sim.launcher.x, sim.launcher.y, angle, rng.uniform(4, 10))
+        # Keep the block count at the stage's size
+        if len(sim.blocks) < full // 2:
+            sim.generate_random_blocks()
+        t = time.perf_counter()
+        sim.step(0)
+        times.append(time.perf_counter() - t)
+        sim.outcome = None
+    times.sort()
+    return sum(times) / len(times) * 1000, times[int(len(times) * 0.95)] * 1000, full
+
+def main():
+    from broadphase import BlockGrid
+    print(f"{LIVE_BALLS} live balls, {FRAMES} frames per stage")
+    print(f"{'stage':>6} {'blocks':>7} {'grid mean':>10} {'grid p95':>9} {'scan mean':>10} {'scan p95':>9}")
+    for stage in STAGES:
+        grid_mean, grid_p95, blocks = run(stage, BlockGrid)
+        scan_mean, scan_p95, _ = run(stage, BruteForceGrid)
+        print(f"{stage:>6} {blocks:>7} {grid_mean:>8.3f}ms {grid_p95:>7.3f}ms {scan_mean:>8.3f}ms {scan_p95:>7.3f}ms")
+    simulation.BlockGrid = BlockGrid
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Batched shot simulation throughput per ball type, and a check that lone
+# shots destroy the same blocks as in a real Simulation.
+#
+#   python benchmarks/bench_difficulty.py
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from balls import BALL_TYPES
+from difficulty import StageModel, random_shots, simulate_shots, verify
+from simulation import Simulation
+
+STAGES = [0, 30, 60, 200]
+BATCHES = [20000, 100000]
+VERIFY_SHOTS = 200
+
+def main():
+    rng = np.random.default_rng(1)
+    print(f"{'stage':>6} {'blocks':>7} {'batch':>7} " + " ".join(f"{name + ' k/s':>10}" for name in BALL_TYPES) + f" {'mismatches':>11}")
+    for stage in STAGES:
+        model = StageModel(Simulation(stage=stage, seed=stage))
+        for batch in BATCHES:
+            angles, powers = random_shots(rng, batch)
+            hp = np.tile(model.hp, (batch, 1))
+            rates = []
+            for ball_type in range(len(BALL_TYPES)):
+                t = time.perf_counter()
+                simulate_shots(model, hp, angles, powers, ball_type)
+                rates.append(batch / (time.perf_counter() - t) / 1000)
+            mismatches = sum(verify(stage, stage, ball_type, VERIFY_SHOTS, rng) for ball_type in range(len(BALL_TYPES))) if batch == BATCHES[0] else ""
+            print(f"{stage:>6} {model.count:>7} {batch:>7} " + " ".join(f"{rate:>10.0f}" for rate in rates) + f" {mismatches:>11}")
+
+if __name__ == "__main__":
+    main()
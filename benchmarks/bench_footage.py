@@ -0,0 +1,111 @@
+# Offline rendering speed for a scripted session, split into drawing and
+# encoding, and how closely framebuffer.py's primitives match pyxel's own
+# when pyxel can start headless.
+#
+#   python benchmarks/bench_footage.py
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+import footage # Installs framebuffer as pyxel
+import framebuffer
+from replay import Recording, save_session
+from simulation import INPUT_DOWN, INPUT_FIRE, INPUT_FIRE_PRESSED, INPUT_LEFT, INPUT_RIGHT, INPUT_UP
+
+STAGES = [(0, "Classic", "Normal"), (3, "Triangle", "Baseball"), (12, "Pistol", "Slipper"), (40, "Crossbow", "Billiard")]
+PARITY_TRIALS = 2000
+
+def scripted_session(path, seed=1):
+    # Aims about at random and fires every 40 frames until the stage ends
+    rng = random.Random(seed)
+    recordings = []
+    for stage, launcher_style, ball_style in STAGES:
+        recording = Recording(stage, rng.getrandbits(64), launcher_style, ball_style)
+        sim = recording.make_simulation()
+        held = 0
+        while sim.outcome is None and recording.frames < 1800:
+            if recording.frames % 12 == 0: held = rng.choice([INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN, 0])
+            buttons = held | (INPUT_FIRE | INPUT_FIRE_PRESSED if recording.frames % 40 == 0 else 0)
+            recording.record(buttons)
+            sim.step(buttons)
+        recordings.append(recording)
+    save_session(path, recordings)
+    return recordings
+
+def time_stages(recordings):
+    frames = []
+    start = time.perf_counter()
+    for recording in recordings:
+        frames.extend(frame.copy() for frame in footage.render_frames(recording, 0, recording.frames + footage.HOLD_FRAMES))
+    return frames, time.perf_counter() - start
+
+def time_encoders(frames):
+    start = time.perf_counter()
+    for frame in frames:
+        footage.png_bytes(frame)
+    png = time.perf_counter() - start
+    start = time.perf_counter()
+    previous = None
+    for frame in frames:
+        footage.gif_frame(frame, previous, 3)
+        previous = frame
+    return png, time.perf_counter() - start
+
+def parity():
+    # Random calls drawn by both; {primitive: share of calls with any pixel different}
+    del sys.modules["pyxel"]
+    try:
+        import pyxel
+        pyxel.init(200, 150, headless=True)
+    except Exception as e:
+        print(f"pyxel unavailable for the parity check: {e}")
+        return None
+    rng = random.Random(0)
+    def coord(lo, hi):
+        value = rng.uniform(lo, hi)
+        return round(value * 2) / 2 if rng.random() < 0.3 else value # Halves hit the rounding rule
+    calls = {
+        "pset": lambda: (coord(-2, 202), coord(-2, 152)),
+        "rect": lambda: (coord(-20, 210), coord(-20, 160), coord(-1, 30), coord(-1, 30)),
+        "rectb": lambda: (coord(-20, 210), coord(-20, 160), coord(-1, 30), coord(-1, 30)),
+        "circ": lambda: (coord(-10, 210), coord(-10, 160), coord(0, 12)),
+        "line": lambda: (coord(-20, 220), coord(-20, 170), coord(-20, 220), coord(-20, 170)),
+        "tri": lambda: tuple(coord(-20, 220) if i % 2 == 0 else coord(-20, 170) for i in range(6)),
+        "text": lambda: (coord(-10, 200), coord(-10, 150), "".join(chr(rng.randrange(32, 127)) for _ in range(rng.randrange(1, 12)))),
+    }
+    mismatches = {}
+    for name, make_args in calls.items():
+        bad = 0
+        for _ in range(PARITY_TRIALS):
+            args = make_args() + (rng.randrange(1, 16),)
+            camera = (coord(-5, 5), coord(-5, 5)) if rng.random() < 0.5 else (0, 0)
+            for target in (pyxel, framebuffer):
+                target.cls(0)
+                target.camera(*camera)
+                getattr(target, name)(*args)
+                target.camera()
+            screen = np.ctypeslib.as_array(pyxel.screen.data_ptr(), shape=(150 * 200,)).reshape(150, 200)
+            bad += not np.array_equal(screen, framebuffer.screen.data)
+        mismatches[name] = bad / PARITY_TRIALS
+    return mismatches
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        recordings = scripted_session(os.path.join(tmp, "bench.dmr"))
+    framebuffer.init(200, 150)
+    frames, draw = time_stages(recordings)
+    png, gif = time_encoders(frames)
+    n = len(frames)
+    print(f"{n} frames: draw {n / draw:.0f}/s ({n / draw / 30:.1f}x real time), png {n / png:.0f}/s, gif {n / gif:.0f}/s")
+    mismatches = parity()
+    if mismatches:
+        print("calls not pixel-identical to pyxel: " + ", ".join(f"{name} {share:.1%}" for name, share in mismatches.items()))
+
+if __name__ == "__main__":
+    main()
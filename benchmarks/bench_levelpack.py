@@ -0,0 +1,53 @@
+# Level pack write throughput, open time and random stage loads for packs of
+# growing size, against generating the same stage, and a check that loaded
+# stages match what was written.
+#
+#   python benchmarks/bench_levelpack.py
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from levelpack import LevelPack, LevelPackWriter, generated_stage, stage_records
+from simulation import Simulation
+
+SIZES = [1000, 100000, 1000000]
+SOURCE_STAGES = 16 # Packs cycle through this many generated stages, to keep writing cheap
+LOADS = 20000
+
+def main():
+    rng = random.Random(1)
+    source = [stage_records(generated_stage(stage, rng.getrandbits(64))) for stage in range(SOURCE_STAGES)]
+    start = time.perf_counter()
+    for stage in range(SOURCE_STAGES):
+        Simulation(stage=stage, seed=stage)
+    generate = (time.perf_counter() - start) / SOURCE_STAGES * 1e6
+    print(f"generating a stage in Simulation: {generate:.0f} us")
+    print(f"{'stages':>8} {'MB':>7} {'write k/s':>10} {'open us':>8} {'load us':>8} {'same':>5}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            path = os.path.join(tmp, f"{size}.dmlp")
+            start = time.perf_counter()
+            with LevelPackWriter(path) as writer:
+                for n in range(size):
+                    writer.add_stage(source[n % SOURCE_STAGES])
+            write = size / (time.perf_counter() - start) / 1000
+            start = time.perf_counter()
+            pack = LevelPack(path)
+            opened = (time.perf_counter() - start) * 1e6
+            picks = [rng.randrange(size) for _ in range(LOADS)]
+            start = time.perf_counter()
+            for n in picks:
+                pack.stage(n)
+            load = (time.perf_counter() - start) / LOADS * 1e6
+            same = all(np.array_equal(pack.stage(n), source[n % SOURCE_STAGES]) for n in picks[:1000])
+            pack.close()
+            print(f"{size:>8} {os.path.getsize(path) / 1e6:>7.1f} {write:>10.0f} {opened:>8.0f} {load:>8.1f} {'yes' if same else 'NO':>5}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# Per-frame update cost of the NumPy particle pool versus the old
+# per-Explosion dict particles, at several live particle counts.
+#
+#   python benchmarks/bench_particles.py
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from particles import ParticlePool
+
+COUNTS = [800, 10000, 50000]
+FRAMES = 60
+
+class DictExplosion:
+    # The previous Explosion, kept here as the reference implementation
+    def __init__(self, x, y, color):
+        self.life = 20
+        self.particles = []
+        for _ in range(8):
+            angle = random.uniform(0, 2 * math.pi)
+            speed = random.uniform(0.5, 2)
+            self.particles.append({'x': x, 'y': y, 'vx': math.cos(angle) * speed, 'vy': math.sin(angle) * speed, 'color': color})
+
+    def update(self):
+        self.life -= 1
+        for p in self.particles:
+            p['x'] += p['vx']
+            p['y'] += p['vy']
+            p['vy'] += 0.05
+
+def bench_dicts(count):
+    # Respawn a constant share each frame so the live count stays at `count`
+    explosions = [DictExplosion(100, 50, 7) for _ in range(count // 8)]
+    t = time.perf_counter()
+    for _ in range(FRAMES):
+        for _ in range(count // 8 // 20):
+            explosions.append(DictExplosion(100, 50, 7))
+        for exp in explosions: exp.update()
+        explosions = [exp for exp in explosions if exp.life > 0]
+        explosions = explosions[-(count // 8):]
+    return (time.perf_counter() - t) / FRAMES * 1000
+
+def bench_pool(count):
+    pool = ParticlePool(capacity=count)
+    for _ in range(count // 8):
+        pool.emit(100, 50, 7, life=1000)
+    t = time.perf_counter()
+    for _ in range(FRAMES):
+        for _ in range(count // 8 // 20):
+            pool.emit(100, 50, 7, life=1000)
+        pool.update()
+    return (time.perf_counter() - t) / FRAMES * 1000
+
+def main():
+    print(f"{'particles':>10} {'dicts':>10} {'pool':>10}")
+    for count in COUNTS:
+        print(f"{count:>10} {bench_dicts(count):>8.3f}ms {bench_pool(count):>8.3f}ms")
+
+if __name__ == "__main__":
+    main()
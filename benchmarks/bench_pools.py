@@ -0,0 +1,43 @@
+# Entity pool high-water marks and allocations per frame over a full fever
+# run with multi-ball and lasers active.
+#
+#   python benchmarks/bench_pools.py
+import gc
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulation import Simulation, INPUT_FIRE, INPUT_LASER, INPUT_LEFT, INPUT_RIGHT
+
+STAGE = 100
+FRAMES = 600
+
+def main():
+    sim = Simulation(stage=STAGE, seed=1)
+    sim.fever_mode = True
+    sim.fever_timer = FRAMES + 1
+    per_frame = {}
+    gc.collect()
+    collections = sum(stat["collections"] for stat in gc.get_stats())
+    for frame in range(FRAMES):
+        sim.multi_ball_timer = sim.laser_beam_timer = 100
+        sim.balls_left = 100
+        if len(sim.blocks) < STAGE:
+            sim.generate_random_blocks()
+        buttons = INPUT_FIRE | (INPUT_LASER if frame % 10 == 0 else 0)
+        buttons |= INPUT_LEFT if frame // 60 % 2 else INPUT_RIGHT
+        sim.step(buttons)
+        sim.outcome = None
+        for name, stats in sim.pool_stats().items():
+            per_frame.setdefault(name, []).append(stats["frame_allocations"])
+    collections = sum(stat["collections"] for stat in gc.get_stats()) - collections
+
+    print(f"stage {STAGE}, {FRAMES} fever frames, {collections} GC collections")
+    print(f"{'pool':>8} {'high water':>11} {'allocs':>7} {'allocs/frame':>13} {'max/frame':>10}")
+    for name, stats in sim.pool_stats().items():
+        counts = per_frame[name]
+        print(f"{name:>8} {stats['high_water']:>11} {stats['allocations']:>7} {sum(counts) / len(counts):>13.3f} {max(counts):>10}")
+
+if __name__ == "__main__":
+    main()
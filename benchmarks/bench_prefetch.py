@@ -0,0 +1,63 @@
+# Stage transition cost: App.reset_game() moving on to the next stage when
+# the worker has had time to build it, against building it on the spot, and
+# how long building and checking a stage takes on the worker.
+#
+#   python benchmarks/bench_prefetch.py
+import os
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "stub"))
+
+from demolisher import App, GameState
+from prefetch import check_stage
+from replay import Recording
+
+STAGES = [0, 50, 200, 1000]
+WORLD_WIDTHS = [None, 800]
+TRANSITIONS = 20
+
+def transitions(stage, world_width, wait):
+    # reset_game() times in ms, moving on from `stage` TRANSITIONS times
+    app = App(seed=1, leaderboard_path=":memory:", world_width=world_width)
+    app.game_state = GameState.RUNNING
+    if not wait: app.prefetcher.request = lambda recording: None # Every stage built in reset_game()
+    times = []
+    for n in range(TRANSITIONS):
+        app.current_stage = stage + n
+        if wait:
+            while app.prefetcher.results.empty(): # As if the stage were being played meanwhile
+                time.sleep(0.001)
+        start = time.perf_counter()
+        app.reset_game()
+        times.append((time.perf_counter() - start) * 1000)
+    app.prefetcher.close()
+    app.leaderboard.close()
+    return times[1:] # The first reset has nothing prefetched for it
+
+def build_and_check(stage, world_width):
+    builds, checks = [], []
+    for seed in range(TRANSITIONS):
+        recording = Recording(stage, seed, width=world_width or 200)
+        start = time.perf_counter()
+        sim = recording.make_simulation()
+        built = time.perf_counter()
+        check_stage(sim)
+        builds.append((built - start) * 1000)
+        checks.append((time.perf_counter() - built) * 1000)
+    return statistics.median(builds), statistics.median(checks)
+
+def main():
+    print(f"{'stage':>6} {'width':>6} {'build ms':>9} {'check ms':>9} {'sync ms':>8} {'ready ms':>9}")
+    for world_width in WORLD_WIDTHS:
+        for stage in STAGES:
+            build, check = build_and_check(stage, world_width)
+            sync = statistics.median(transitions(stage, world_width, wait=False))
+            ready = statistics.median(transitions(stage, world_width, wait=True))
+            print(f"{stage:>6} {world_width or 200:>6} {build:>9.2f} {check:>9.2f} {sync:>8.2f} {ready:>9.2f}")
+
+if __name__ == "__main__":
+    main()
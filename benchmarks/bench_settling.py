@@ -0,0 +1,50 @@
+# Block settling cost per tick: a whole stage collapsing after its bottom row
+# is knocked out, and the same stage once everything is asleep again.
+#
+#   python benchmarks/bench_settling.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulation import Simulation
+
+STAGES = [0, 50, 100, 200]
+SEEDS = 5
+IDLE_TICKS = 10000
+
+def collapse(stage, seed):
+    # (blocks woken, ticks to settle, worst tick s, all ticks s, blocks broken)
+    sim = Simulation(stage=stage, seed=seed)
+    sim.settle_blocks() # Stage start: everything is checked once and falls asleep
+    blocks = sim.blocks
+    bottom = [i for i in blocks.active_indices().tolist() if blocks.y[i] + blocks.height[i] == sim.ground_y]
+    for i in bottom:
+        sim.damage_block(i, int(blocks.hp[i]))
+    woken = blocks.awake_count
+    before = len(blocks)
+    ticks, worst, total = 0, 0.0, 0.0
+    while blocks.awake_count:
+        t = time.perf_counter()
+        sim.settle_blocks()
+        t = time.perf_counter() - t
+        worst, total, ticks = max(worst, t), total + t, ticks + 1
+    return sim, woken, ticks, worst, total, before - len(blocks)
+
+def main():
+    print(f"{'stage':>6} {'blocks':>7} {'woken':>6} {'ticks':>6} {'mean ms':>8} {'worst ms':>9} {'broken':>7} {'idle us':>8}")
+    for stage in STAGES:
+        runs = [collapse(stage, seed) for seed in range(SEEDS)]
+        sim = runs[0][0]
+        t = time.perf_counter()
+        for _ in range(IDLE_TICKS):
+            sim.settle_blocks()
+        idle = (time.perf_counter() - t) / IDLE_TICKS * 1e6
+        woken = sum(r[1] for r in runs) / SEEDS
+        ticks = sum(r[2] for r in runs)
+        print(f"{stage:>6} {sim.blocks.count:>7} {woken:>6.0f} {ticks / SEEDS:>6.1f} {sum(r[4] for r in runs) / ticks * 1000:>8.3f} "
+              f"{max(r[3] for r in runs) * 1000:>9.3f} {sum(r[5] for r in runs) / SEEDS:>7.1f} {idle:>8.2f}")
+
+if __name__ == "__main__":
+    main()
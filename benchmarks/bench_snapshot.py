@@ -0,0 +1,68 @@
+# Snapshot capture, restore, cloning and serialization against copy.deepcopy,
+# and a check that restored and cloned worlds play the rest of the stage out
+# identically.
+#
+#   python benchmarks/bench_snapshot.py
+import copy
+import os
+import pickle
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from simulation import INPUT_DOWN, INPUT_FIRE, INPUT_FIRE_PRESSED, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, Simulation
+from snapshot import Snapshot, capture, clone, from_snapshot, restore
+
+STAGES = [0, 30, 100, 200]
+WARMUP = 120 # Frames played before the snapshot, so balls and items are in flight
+CHECK_FRAMES = 600
+
+def scripted_inputs(seed, n):
+    rng = random.Random(seed)
+    held = 0
+    inputs = []
+    for frame in range(n):
+        if frame % 12 == 0: held = rng.choice([INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN, 0])
+        inputs.append(held | (INPUT_FIRE | INPUT_FIRE_PRESSED if frame % 25 == 0 else 0))
+    return inputs
+
+def per_call(fn, seconds=0.2):
+    n = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        fn()
+        n += 1
+    return (time.perf_counter() - start) / n * 1e6
+
+def play(sim, inputs, first):
+    events = []
+    for buttons in inputs[first:]:
+        if sim.outcome is not None: break
+        events.append(list(sim.step(buttons)))
+    return events, sim.frame, sim.score, sim.outcome
+
+def main():
+    print(f"{'stage':>6} {'blocks':>7} {'capture us':>11} {'restore us':>11} {'clone us':>9} {'bytes us':>9} {'size':>6} "
+          f"{'deepcopy us':>12} {'pickle size':>12} {'same':>5}")
+    for stage in STAGES:
+        inputs = scripted_inputs(stage, WARMUP + CHECK_FRAMES)
+        sim = Simulation(stage=stage, seed=stage)
+        play(sim, inputs[:WARMUP], 0)
+        snapshot = capture(sim)
+        reference = copy.deepcopy(sim)
+        data = snapshot.to_bytes()
+        timings = [per_call(lambda: capture(sim)), per_call(lambda: restore(sim, snapshot)), per_call(lambda: clone(sim)),
+                   per_call(snapshot.to_bytes),
+                   per_call(lambda: copy.deepcopy(sim))]
+        expected = play(reference, inputs, WARMUP)
+        play(sim, inputs, WARMUP)
+        restore(sim, Snapshot.from_bytes(data))
+        copied = from_snapshot(snapshot, sim)
+        same = play(sim, inputs, WARMUP) == expected and play(copied, inputs, WARMUP) == expected
+        print(f"{stage:>6} {sim.blocks.count:>7} {timings[0]:>11.1f} {timings[1]:>11.1f} {timings[2]:>9.1f} {timings[3]:>9.1f} {len(data):>6} "
+              f"{timings[4]:>12.1f} {len(pickle.dumps(reference)):>12} {'yes' if same else 'NO':>5}")
+
+if __name__ == "__main__":
+    main()
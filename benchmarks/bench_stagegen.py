@@ -0,0 +1,59 @@
+# Stage generation time and overlap, the structured generator against the
+# old independent random placement.
+#
+#   python benchmarks/bench_stagegen.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from blocks import BlockStore, stage_block_types
+from broadphase import BlockGrid
+from stagegen import CELL, generate_layout
+
+COUNTS = [100, 1000, 10000]
+BLOCK_TYPES = stage_block_types(0)
+REPEATS = 5
+
+def random_layout(count, seed, left, right, top, bottom):
+    # Placement as generate_random_blocks used to do it
+    rng = random.Random(seed)
+    return [(rng.randint(left, right - CELL), rng.randint(top, bottom - CELL), rng.choice(BLOCK_TYPES)) for _ in range(count)]
+
+def overlapping(layout):
+    # Blocks that share some area with another block
+    grid = BlockGrid()
+    for i, (x, y, _) in enumerate(layout):
+        grid.insert(i, x, y, CELL, CELL)
+    return sum(1 for i, (x, y, _) in enumerate(layout)
+               if any(j != i and abs(layout[j][0] - x) < CELL and abs(layout[j][1] - y) < CELL for j in grid.query(x, y, x + CELL, y + CELL)))
+
+def best_ms(fn):
+    best = float("inf")
+    for _ in range(REPEATS):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+def main():
+    print(f"{'blocks':>7} {'layout ms':>10} {'+blocks+grid ms':>16} {'overlapping':>12} {'random overlapping':>19}")
+    for count in COUNTS:
+        # Square field with room for twice the blocks
+        side = int((count * 2) ** 0.5 + 1) * CELL
+        field = (0, side, 0, side)
+        layout_ms = best_ms(lambda: generate_layout(count, 1, *field, BLOCK_TYPES))
+
+        def build():
+            blocks = BlockStore()
+            grid = BlockGrid()
+            for x, y, block_type in generate_layout(count, 1, *field, BLOCK_TYPES):
+                grid.insert(blocks.add(x, y, CELL, CELL, block_type), x, y, CELL, CELL)
+        build_ms = best_ms(build)
+        layout = generate_layout(count, 1, *field, BLOCK_TYPES)
+        print(f"{count:>7} {layout_ms:>10.2f} {build_ms:>16.2f} {overlapping(layout):>12} {overlapping(random_layout(count, 1, *field)):>19}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+# Scripted gameplay scenarios timed against the pyxel stub. update_game and
+# draw_game are timed separately per frame; a second, traced pass measures
+# transient memory per frame. Results can be saved as JSON and compared
+# against a saved baseline.
+#
+#   python benchmarks/run_scenarios.py --out results.json
+#   python benchmarks/run_scenarios.py --baseline results.json --threshold 0.2
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, os.path.join(HERE, "stub"))
+
+import pyxel # The stub, via the path above
+from demolisher import App, GameState
+
+class Scenario:
+    def __init__(self, name, stage, frames=600, ball_style="Normal", setup=None, script=None, refill=True, world_width=None):
+        self.name = name
+        self.stage = stage
+        self.frames = frames
+        self.ball_style = ball_style
+        self.setup = setup # Called once with the App after the stage is built
+        self.script = script # Called every frame before update; returns (held, pressed) keys
+        self.refill = refill # Regenerate blocks when half are gone so the load stays put
+        self.world_width = world_width # Scrolling world wider than the screen
+
+def sweep_keys(frame):
+    # Aim back and forth and ramp power, as a player would
+    held = [pyxel.KEY_LEFT if frame // 45 % 2 else pyxel.KEY_RIGHT]
+    if frame // 90 % 2:
+        held.append(pyxel.KEY_UP)
+    return held
+
+def fire_every(period):
+    def script(app, frame):
+        pressed = [pyxel.KEY_SPACE] if frame % period == 0 else []
+        return sweep_keys(frame) + pressed, pressed
+    return script
+
+def start_fever(app):
+    app.sim.fever_mode = True
+    app.sim.fever_timer = 600
+
+def fever_script(app, frame):
+    return sweep_keys(frame) + [pyxel.KEY_SPACE], []
+
+def bomb_setup(app):
+    app.sim.current_ball_type = "bomb"
+
+def bomb_script(app, frame):
+    pressed = [pyxel.KEY_SPACE] if frame % 8 == 0 else []
+    return sweep_keys(frame) + pressed, pressed
+
+def slipper_script(app, frame):
+    balls = app.sim.balls
+    while len(balls) < 100:
+        balls.spawn(app.sim.launcher.x, app.sim.launcher.y, -10 - (len(balls) * 7) % 75, 3 + len(balls) % 8)
+    return sweep_keys(frame), []
+
+def laser_script(app, frame):
+    app.sim.laser_beam_timer = 120
+    pressed = [pyxel.KEY_F] if frame % 3 == 0 else []
+    return sweep_keys(frame) + pressed, pressed
+
+SCENARIOS = [
+    Scenario("stage_0", 0, script=fire_every(15)),
+    Scenario("stage_50", 50, script=fire_every(15)),
+    Scenario("stage_200", 200, script=fire_every(15)),
+    Scenario("fever_600", 20, setup=start_fever, script=fever_script),
+    Scenario("bomb_chain", 100, setup=bomb_setup, script=bomb_script),
+    Scenario("slipper_100", 50, ball_style="Slipper", script=slipper_script),
+    Scenario("laser_sweep", 100, script=laser_script),
+    Scenario("wide_800", 200, script=fire_every(15), world_width=800),
+]
+
+def make_app(scenario):
+    app = App(seed=1, leaderboard_path=":memory:", world_width=scenario.world_width) # Keep benchmark runs out of the real score table
+    app.selected_ball_index = app.ball_styles.index(scenario.ball_style)
+    app.game_state = GameState.RUNNING
+    app.current_stage = scenario.stage
+    app.reset_game()
+    if scenario.setup:
+        scenario.setup(app)
+    return app
+
+def keep_alive(app, scenario, full_blocks):
+    sim = app.sim
+    sim.balls_left = max(sim.balls_left, 1)
+    if scenario.refill and len(sim.blocks) < full_blocks // 2:
+        sim.generate_random_blocks()
+        sim.outcome = None
+    app.game_state = GameState.RUNNING
+
+def run_frames(scenario, on_frame):
+    app = make_app(scenario)
+    full_blocks = len(app.sim.blocks)
+    for frame in range(scenario.frames):
+        keep_alive(app, scenario, full_blocks)
+        held, pressed = scenario.script(app, frame)
+        pyxel.set_input(held, pressed)
+        app.latch_input()
+        on_frame(app)
+        app.pressed.clear()
+        pyxel.frame_count += 1
+    return app
+
+def percentiles(samples):
+    samples = sorted(samples)
+    def at(q):
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+    return {"mean": statistics.fmean(samples), "p50": at(0.50), "p95": at(0.95), "p99": at(0.99)}
+
+def run_scenario(scenario):
+    update_ms = []
+    draw_ms = []
+
+    def timed(app):
+        t0 = time.perf_counter()
+        app.update_game()
+        app.apply_audio(app.mixer.flush())
+        t1 = time.perf_counter()
+        app.draw_game()
+        t2 = time.perf_counter()
+        update_ms.append((t1 - t0) * 1000)
+        draw_ms.append((t2 - t1) * 1000)
+
+    app = run_frames(scenario, timed)
+    entity_allocs = sum(stats["allocations"] for stats in app.sim.pool_stats().values())
+
+    # Second pass under tracemalloc: peak memory above the frame's starting
+    # point is what the frame allocated and threw away
+    transient = []
+
+    def traced(app):
+        start, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        app.update_game()
+        app.apply_audio(app.mixer.flush())
+        app.draw_game()
+        _, peak = tracemalloc.get_traced_memory()
+        transient.append((peak - start) / 1024)
+
+    tracemalloc.start()
+    try:
+        run_frames(scenario, traced)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "frames": scenario.frames,
+        "update_ms": percentiles(update_ms),
+        "draw_ms": percentiles(draw_ms),
+        "transient_kib_per_frame": statistics.fmean(transient),
+        "entity_allocs_per_frame": entity_allocs / scenario.frames,
+    }
+
+def compare(results, baseline, threshold, floor_ms=0.05):
+    # A metric regresses when it is more than `threshold` slower than the
+    # baseline and by more than `floor_ms`, so sub-noise changes don't trip it
+    regressions = []
+    for name, result in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for phase in ("update_ms", "draw_ms"):
+            for stat in ("p50", "p95", "p99"):
+                old, new = base[phase][stat], result[phase][stat]
+                if new > old * (1 + threshold) and new - old > floor_ms:
+                    regressions.append((name, phase, stat, old, new))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Timed gameplay scenarios against the pyxel stub")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    parser.add_argument("--only", nargs="*", help="scenario names to run")
+    args = parser.parse_args()
+
+    results = {"python": platform.python_version(), "platform": platform.platform(), "scenarios": {}}
+    print(f"{'scenario':<12} {'update p50/p95/p99 ms':>24} {'draw p50/p95/p99 ms':>24} {'KiB/frame':>10} {'allocs/frame':>13}")
+    for scenario in SCENARIOS:
+        if args.only and scenario.name not in args.only:
+            continue
+        result = run_scenario(scenario)
+        results["scenarios"][scenario.name] = result
+        u, d = result["update_ms"], result["draw_ms"]
+        print(f"{scenario.name:<12} {u['p50']:>8.3f}{u['p95']:>8.3f}{u['p99']:>8.3f} {d['p50']:>8.3f}{d['p95']:>8.3f}{d['p99']:>8.3f}"
+              f" {result['transient_kib_per_frame']:>10.1f} {result['entity_allocs_per_frame']:>13.3f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, phase, stat, old, new in regressions:
+            print(f"REGRESSION {name} {phase} {stat}: {old:.3f}ms -> {new:.3f}ms")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
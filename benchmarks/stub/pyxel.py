@@ -0,0 +1,98 @@
+# Stand-in for the pyxel module: no window, no audio. Drawing calls only
+# count themselves, so timings measure the game's own Python work. Put this
+# directory first on sys.path before importing the game.
+width = 0
+height = 0
+frame_count = 0
+
+KEY_LEFT = 0
+KEY_RIGHT = 1
+KEY_UP = 2
+KEY_DOWN = 3
+KEY_SPACE = 4
+KEY_RETURN = 5
+KEY_F = 6
+KEY_P = 7
+KEY_ESCAPE = 8
+KEY_H = 9
+
+held = set()
+pressed = set()
+draw_calls = 0
+
+def set_input(keys_held=(), keys_pressed=()):
+    held.clear()
+    held.update(keys_held)
+    pressed.clear()
+    pressed.update(keys_pressed)
+
+class Sound:
+    def set(self, *args, **kwargs):
+        pass
+
+class Music:
+    def set(self, *args, **kwargs):
+        pass
+
+class Image:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+    def _draw(self, *args, **kwargs):
+        global draw_calls
+        draw_calls += 1
+
+    cls = rect = rectb = circ = circb = tri = trib = line = pset = text = blt = elli = ellib = fill = _draw
+
+    def pget(self, x, y):
+        return 0
+
+    def load(self, *args, **kwargs):
+        pass
+
+sounds = [Sound() for _ in range(64)]
+musics = [Music() for _ in range(8)]
+images = [Image(256, 256) for _ in range(3)]
+
+def init(w, h, **kwargs):
+    global width, height
+    width = w
+    height = h
+
+def run(update, draw):
+    # The caller drives update/draw itself
+    pass
+
+def btn(key):
+    return key in held
+
+def btnp(key, hold=None, repeat=None):
+    return key in pressed
+
+def _draw(*args, **kwargs):
+    global draw_calls
+    draw_calls += 1
+
+cls = rect = rectb = circ = circb = tri = trib = line = pset = text = blt = camera = clip = pal = elli = ellib = fill = _draw
+
+def pget(x, y):
+    return 0
+
+def play(*args, **kwargs):
+    pass
+
+def playm(*args, **kwargs):
+    pass
+
+def stop(*args, **kwargs):
+    pass
+
+def load(*args, **kwargs):
+    pass
+
+def save(*args, **kwargs):
+    pass
+
+def quit():
+    pass
@@ -0,0 +1,175 @@
+import json
+import os
+
+import numpy as np
+
+class BlockType:
+    # Properties shared by every block of one material. Blocks only store a
+    # type_id into BLOCK_TYPES, so each material exists once.
+    __slots__ = ("name", "type_id", "hp", "base_color", "highlight_color", "shadow_color", "explosion_color",
+                 "destruction_sound_id", "style", "min_stage", "damage_sprites")
+
+    def __init__(self, name, hp=1, base_color=3, highlight_color=7, shadow_color=2, explosion_color=5,
+                 destruction_sound_id=1, style="plain", min_stage=0, damage_sprites=()):
+        self.name = name
+        self.type_id = None
+        self.hp = hp
+        self.base_color = base_color
+        self.highlight_color = highlight_color
+        self.shadow_color = shadow_color
+        self.explosion_color = explosion_color
+        self.destruction_sound_id = destruction_sound_id
+        self.style = style # How the renderer paints it: "bevel", "speckled", "glass" or "plain"
+        self.min_stage = min_stage # First stage (0-based) the generator uses it on
+        # Overlays for a damaged block, one per hit taken. Rows of hex colors,
+        # "." for transparent, drawn from the block's top-left corner.
+        self.damage_sprites = tuple(tuple(rows) for rows in damage_sprites)
+
+BLOCK_TYPES = [] # Indexed by type_id
+BLOCK_TYPE_IDS = {}
+
+def register_block_type(block_type):
+    # A name that is already registered is redefined in place and keeps its id
+    type_id = BLOCK_TYPE_IDS.get(block_type.name)
+    if type_id is None:
+        type_id = len(BLOCK_TYPES)
+        BLOCK_TYPES.append(block_type)
+        BLOCK_TYPE_IDS[block_type.name] = type_id
+    else:
+        BLOCK_TYPES[type_id] = block_type
+    block_type.type_id = type_id
+    return block_type
+
+def load_block_types(path):
+    # JSON list of objects with BlockType's keyword arguments
+    with open(path) as f:
+        for entry in json.load(f):
+            register_block_type(BlockType(**entry))
+
+def stage_block_types(stage):
+    # Names the stage generator picks from, in type_id order
+    return [t.name for t in BLOCK_TYPES if t.min_stage <= stage]
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blocks.json")
+load_block_types(DATA_PATH) # Wood, stone and glass, in the order the generator has always picked from
+
+class BlockStore:
+    # All blocks of a stage as parallel NumPy columns. Destroyed blocks only
+    # clear their active flag; indices stay valid until clear(). Blocks at
+    # rest are asleep; awake ones are settled by the Simulation every tick.
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.remaining = 0 # Active blocks
+        self.awake_count = 0
+        self.capacity = 0
+        self.x = self.y = self.width = self.height = self.vy = None
+        self.hp = self.type_id = self.active = self.awake = None
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        def resize(old, dtype):
+            new = np.zeros(capacity, dtype=dtype)
+            if old is not None:
+                new[:self.count] = old[:self.count]
+            return new
+        self.x = resize(self.x, np.float64)
+        self.y = resize(self.y, np.float64)
+        self.width = resize(self.width, np.float64)
+        self.height = resize(self.height, np.float64)
+        self.vy = resize(self.vy, np.float64)
+        self.hp = resize(self.hp, np.int16)
+        self.type_id = resize(self.type_id, np.int16)
+        self.active = resize(self.active, np.bool_)
+        self.awake = resize(self.awake, np.bool_)
+        self.capacity = capacity
+
+    def add(self, x, y, width, height, type_name):
+        if self.count == self.capacity:
+            self.grow(self.capacity * 2)
+        block_type = BLOCK_TYPES[BLOCK_TYPE_IDS[type_name]]
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y
+        self.width[i] = width
+        self.height[i] = height
+        self.vy[i] = 0
+        self.hp[i] = block_type.hp
+        self.type_id[i] = block_type.type_id
+        self.active[i] = True
+        self.awake[i] = False
+        self.count += 1
+        self.remaining += 1
+        return i
+
+    def add_records(self, records):
+        # Appends a level pack RECORD array (types already as type_ids); a
+        # record with no hp left is added destroyed
+        n = len(records)
+        if self.count + n > self.capacity:
+            self.grow(max(self.count + n, self.capacity * 2))
+        i = self.count
+        self.x[i:i + n] = records["x"]
+        self.y[i:i + n] = records["y"]
+        self.width[i:i + n] = records["width"]
+        self.height[i:i + n] = records["height"]
+        self.vy[i:i + n] = 0
+        self.hp[i:i + n] = records["hp"]
+        self.type_id[i:i + n] = records["type"]
+        self.active[i:i + n] = records["hp"] > 0
+        self.awake[i:i + n] = False
+        self.count += n
+        self.remaining += int(np.count_nonzero(self.active[i:i + n]))
+        return range(i, i + n)
+
+    def clear(self):
+        self.count = 0
+        self.remaining = 0
+        self.awake_count = 0
+
+    def wake(self, i):
+        if not self.awake[i]:
+            self.awake[i] = True
+            self.awake_count += 1
+
+    def sleep(self, i):
+        if self.awake[i]:
+            self.awake[i] = False
+            self.awake_count -= 1
+        self.vy[i] = 0
+
+    def block_type(self, i):
+        return BLOCK_TYPES[self.type_id[i]]
+
+    def damage(self, i, damage):
+        # True when this hit leaves the block with no hp
+        hp = int(self.hp[i]) - damage
+        self.hp[i] = hp
+        if hp <= 0:
+            if self.active[i]:
+                self.active[i] = False
+                self.remaining -= 1
+            return True
+        return False
+
+    def active_indices(self):
+        return np.flatnonzero(self.active[:self.count])
+
+    def in_rect(self, x0, y0, x1, y1):
+        # Active blocks overlapping the rectangle, in index order
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        hit = self.active[:n] & (x < x1) & (x + self.width[:n] > x0) & (y < y1) & (y + self.height[:n] > y0)
+        return np.flatnonzero(hit).tolist()
+
+    def near(self, x, y, distance):
+        # Active blocks whose corner is less than `distance` away on both axes
+        n = self.count
+        hit = self.active[:n] & (np.abs(self.x[:n] - x) < distance) & (np.abs(self.y[:n] - y) < distance)
+        return np.flatnonzero(hit).tolist()
+
+    def count_by_type(self):
+        # Active blocks per type_id
+        return np.bincount(self.type_id[:self.count][self.active[:self.count]], minlength=len(BLOCK_TYPES))
+
+    def __len__(self):
+        return self.remaining
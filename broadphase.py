@@ -0,0 +1,172 @@
+import math
+from bisect import insort
+
+import numpy as np
+
+def ray_aabb(ox, oy, dx, dy, bounds):
+    # Slab test: distance along the ray where it enters the (x0, y0, x1, y1)
+    # box (0 if it starts inside), or None if it misses. Edges count as hits.
+    x0, y0, x1, y1 = bounds
+    t_enter, t_exit = -math.inf, math.inf
+    for o, d, lo, hi in ((ox, dx, x0, x1), (oy, dy, y0, y1)):
+        if d == 0:
+            if o < lo or o > hi:
+                return None
+        else:
+            t1 = (lo - o) / d
+            t2 = (hi - o) / d
+            if t1 > t2:
+                t1, t2 = t2, t1
+            t_enter = max(t_enter, t1)
+            t_exit = min(t_exit, t2)
+    if t_enter > t_exit or t_exit < 0:
+        return None
+    return max(t_enter, 0)
+
+class BlockGrid:
+    # Uniform spatial hash over block AABBs, keyed by block index. Each block
+    # is stored in every cell its rectangle touches; queries return indices in
+    # ascending order so collision resolution stays identical to a plain scan
+    # of the blocks. The grid keeps each block's bounds as Python floats for
+    # the per-ball paths, where NumPy scalar access would cost more.
+    def __init__(self, cell_size=16):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = {} # Index -> (x0, y0, x1, y1)
+        self.table = None # Summed-area table of occupied cells, rebuilt lazily
+
+    def cell_range(self, x0, y0, x1, y1):
+        cs = self.cell_size
+        return (math.floor(x0 / cs), math.floor(y0 / cs),
+                math.floor(x1 / cs), math.floor(y1 / cs))
+
+    def insert(self, i, x, y, width, height):
+        self.table = None
+        self.bounds[i] = (x, y, x + width, y + height)
+        cx0, cy0, cx1, cy1 = self.cell_range(x, y, x + width, y + height)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    self.cells[(cx, cy)] = [i]
+                else:
+                    cell.append(i)
+
+    def place(self, i, x, y, width, height):
+        # insert() for a block that may not have the highest index in its
+        # cells, keeping each cell in index order
+        self.table = None
+        self.bounds[i] = (x, y, x + width, y + height)
+        cx0, cy0, cx1, cy1 = self.cell_range(x, y, x + width, y + height)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is None:
+                    self.cells[(cx, cy)] = [i]
+                else:
+                    insort(cell, i)
+
+    def remove(self, i):
+        bounds = self.bounds.pop(i, None)
+        if bounds is None:
+            return
+        self.table = None
+        cx0, cy0, cx1, cy1 = self.cell_range(*bounds)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells[(cx, cy)]
+                cell.remove(i)
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def query(self, x0, y0, x1, y1):
+        cx0, cy0, cx1, cy1 = self.cell_range(x0, y0, x1, y1)
+        if cx0 == cx1 and cy0 == cy1:
+            return list(self.cells.get((cx0, cy0), ()))
+        found = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell:
+                    found.update(cell)
+        return sorted(found)
+
+    def query_after(self, x0, y0, x1, y1, after):
+        # Candidates with a higher index than `after`
+        return [i for i in self.query(x0, y0, x1, y1) if i > after]
+
+    def raycast(self, ox, oy, dx, dy, t0, t1):
+        # Blocks first entered by the ray between distances t0 and t1, nearest
+        # first. Walks only the cells the segment crosses (DDA), so extending a
+        # ray piece by piece tests each block once.
+        cs = self.cell_size
+        cx = math.floor((ox + dx * t0) / cs)
+        cy = math.floor((oy + dy * t0) / cs)
+        if dx > 0:
+            step_x, t_max_x, t_delta_x = 1, ((cx + 1) * cs - ox) / dx, cs / dx
+        elif dx < 0:
+            step_x, t_max_x, t_delta_x = -1, (cx * cs - ox) / dx, -cs / dx
+        else:
+            step_x, t_max_x, t_delta_x = 0, math.inf, math.inf
+        if dy > 0:
+            step_y, t_max_y, t_delta_y = 1, ((cy + 1) * cs - oy) / dy, cs / dy
+        elif dy < 0:
+            step_y, t_max_y, t_delta_y = -1, (cy * cs - oy) / dy, -cs / dy
+        else:
+            step_y, t_max_y, t_delta_y = 0, math.inf, math.inf
+
+        seen = set()
+        hits = []
+        while True:
+            cell = self.cells.get((cx, cy))
+            if cell:
+                for i in cell:
+                    if i in seen:
+                        continue
+                    seen.add(i)
+                    t = ray_aabb(ox, oy, dx, dy, self.bounds[i])
+                    if t is not None and t0 <= t < t1:
+                        hits.append((t, i))
+            if t_max_x < t_max_y:
+                if t_max_x > t1:
+                    break
+                cx += step_x
+                t_max_x += t_delta_x
+            else:
+                if t_max_y > t1:
+                    break
+                cy += step_y
+                t_max_y += t_delta_y
+        hits.sort()
+        return hits
+
+    def build_table(self):
+        keys = np.array(list(self.cells.keys()), dtype=np.int64).reshape(-1, 2)
+        if len(keys) == 0:
+            self.origin = (0, 0)
+            self.table = np.zeros((1, 1), dtype=np.int32)
+            return
+        ox, oy = keys.min(axis=0)
+        w, h = keys.max(axis=0) - (ox, oy) + 1
+        occupied = np.zeros((w + 1, h + 1), dtype=np.int32)
+        occupied[keys[:, 0] - ox + 1, keys[:, 1] - oy + 1] = 1
+        self.origin = (ox, oy)
+        self.table = occupied.cumsum(axis=0).cumsum(axis=1)
+
+    def any_in_rects(self, x0, y0, x1, y1):
+        # Vectorized: for arrays of rectangles, whether each one touches any
+        # occupied cell
+        if self.table is None:
+            self.build_table()
+        ox, oy = self.origin
+        w, h = self.table.shape[0] - 1, self.table.shape[1] - 1
+        cs = self.cell_size
+        cx0 = np.minimum(np.maximum(np.floor(x0 / cs).astype(np.int64) - ox, 0), w)
+        cy0 = np.minimum(np.maximum(np.floor(y0 / cs).astype(np.int64) - oy, 0), h)
+        cx1 = np.minimum(np.maximum(np.floor(x1 / cs).astype(np.int64) - ox + 1, 0), w)
+        cy1 = np.minimum(np.maximum(np.floor(y1 / cs).astype(np.int64) - oy + 1, 0), h)
+        t = self.table
+        return (t[cx1, cy1] - t[cx0, cy1] - t[cx1, cy0] + t[cx0, cy0]) > 0
+
+    def __len__(self):
+        return len(self.bounds)
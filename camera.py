@@ -0,0 +1,52 @@
+LEAD = 0.4 # Where across the screen the lead ball is kept
+SMOOTHING = 0.2 # Share of the way to its target the camera moves each tick
+MARGIN = 16 # Pixels past the screen edges still counted as in view
+
+class Camera:
+    # Screen-sized window onto a world that may be larger than the screen.
+    # While balls are in flight it follows the lead ball, the one furthest
+    # right, otherwise it drifts back to the launcher. It only ever reads the
+    # Simulation, so replays and footage frame shots the same way.
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.world_width = width
+        self.world_height = height
+        self.x = self.y = 0.0
+        self.prev_x = self.prev_y = 0.0
+
+    def reset(self, sim):
+        self.world_width, self.world_height = sim.width, sim.height
+        self.x, self.y = self.clamp(self.target(sim))
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def target(self, sim):
+        balls = sim.balls
+        n = balls.count
+        xs = balls.x[:n][balls.active[:n]]
+        if len(xs):
+            i = xs.argmax()
+            return xs[i] - self.width * LEAD, balls.y[:n][balls.active[:n]][i] - self.height / 2
+        return sim.launcher.x - self.width * LEAD / 2, sim.launcher.y - self.height / 2
+
+    def clamp(self, position):
+        x, y = position
+        return (float(min(max(x, 0), self.world_width - self.width)),
+                float(min(max(y, 0), self.world_height - self.height)))
+
+    def follow(self, sim):
+        # Once per tick
+        self.prev_x, self.prev_y = self.x, self.y
+        target_x, target_y = self.clamp(self.target(sim))
+        self.x += (target_x - self.x) * SMOOTHING
+        self.y += (target_y - self.y) * SMOOTHING
+
+    def position(self, alpha=1.0):
+        # Whole-pixel top left of the view, part way through the tick
+        return (round(self.prev_x + (self.x - self.prev_x) * alpha),
+                round(self.prev_y + (self.y - self.prev_y) * alpha))
+
+    def view(self, alpha=1.0, margin=MARGIN):
+        # World rectangle (x0, y0, x1, y1) on screen, widened by `margin`
+        x, y = self.position(alpha)
+        return x - margin, y - margin, x + self.width + margin, y + self.height + margin
@@ -1,6 +1,22 @@
+import argparse
+import atexit
 import pyxel
-import math
 import random
+import time
+from aim import AimSolver
+from camera import Camera
+from assets import MUSICS, SOUNDS, load_pack
+from audio import AudioMixer, sound_frames
+from leaderboard import HttpSink, Leaderboard
+from levelpack import LevelPack
+from particles import ParticlePool
+from prefetch import StagePrefetcher
+from profiler import Profiler
+from replay import Recording, Replayer, load_session, save_session
+from renderer import LayeredRenderer, prepare_styles, draw_launcher, draw_balls, draw_item, draw_laser, draw_particles, draw_aim_hint, in_view
+from timestep import TICK_RATE, FixedClock
+from simulation import (split_seed, INPUT_LEFT, INPUT_RIGHT, INPUT_UP, INPUT_DOWN,
+                        INPUT_FIRE, INPUT_FIRE_PRESSED, INPUT_LASER)
 
 class GameState:
     START_SCREEN = 0
@@ -8,405 +24,31 @@ class GameState:
     GAME_OVER = 2
     GAME_WON = 3
 
-class Launcher:
+# Keys whose presses are read through App.btnp
+LATCHED_KEYS = (pyxel.KEY_UP, pyxel.KEY_DOWN, pyxel.KEY_LEFT, pyxel.KEY_RIGHT, pyxel.KEY_RETURN, pyxel.KEY_SPACE,
+                pyxel.KEY_F, pyxel.KEY_P, pyxel.KEY_H)
+# Higher wins a channel when more sounds want to play than there are free
+SOUND_PRIORITIES = {0: 1, 1: 2, 2: 2, 3: 3, 4: 4, 5: 3, 6: 3, 7: 5, 8: 4}
 
-    def __init__(self, x, y, style="Classic"):
-        self.x = x
-        self.y = y
-        self.angle = -45
-        self.power = 5
-        self.style = style
-
-    def update(self):
-        if pyxel.btn(pyxel.KEY_LEFT):
-            self.angle -= 1
-        if pyxel.btn(pyxel.KEY_RIGHT):
-            self.angle += 1
-        self.angle = max(-90, min(0, self.angle))
-
-        if pyxel.btn(pyxel.KEY_UP):
-            self.power += 0.1
-        if pyxel.btn(pyxel.KEY_DOWN):
-            self.power -= 0.1
-        self.power = max(1, min(10, self.power))
-
-    def draw(self):
-        angle_rad = math.radians(self.angle)
-        end_x = self.x + math.cos(angle_rad) * (self.power * 3)
-        end_y = self.y + math.sin(angle_rad) * (self.power * 3)
-
-        if self.style == "Classic":
-            pyxel.rect(self.x - 6, self.y, 12, 5, 1) # Shadow
-            pyxel.rect(self.x - 5, self.y - 1, 10, 5, 13) # Body
-            pyxel.line(self.x, self.y, end_x, end_y, 1) # Barrel Shadow
-            pyxel.line(self.x, self.y-1, end_x, end_y-1, 7) # Barrel
-        elif self.style == "Triangle":
-            pyxel.rect(self.x - 8, self.y + 2, 16, 4, 1)
-            pyxel.rect(self.x - 7, self.y+1, 14, 2, 13)
-            pyxel.circ(self.x, self.y + 2, 3, 1)
-            barrel_length = self.power * 2.5
-            barrel_width = 3
-            p_rad = angle_rad + math.pi / 2
-            dx, dy = math.cos(p_rad) * barrel_width, math.sin(p_rad) * barrel_width
-            x1, y1 = self.x + dx, self.y + dy
-            x2, y2 = self.x - dx, self.y - dy
-            tip_x = self.x + math.cos(angle_rad) * (barrel_length + 2)
-            tip_y = self.y + math.sin(angle_rad) * (barrel_length + 2)
-            pyxel.tri(x1, y1, x2, y2, tip_x, tip_y, 7)
-        elif self.style == "Pistol":
-            cos_a = math.cos(angle_rad)
-            sin_a = math.sin(angle_rad)
-
-            # Points for body and grip, relative to pivot
-            body = [(-6, -3), (12, -3), (12, 3), (-6, 3)]
-            grip = [(-4, 3), (2, 3), (2, 8), (-4, 8)]
-            
-            # Rotate body points
-            r_body = []
-            for x, y in body:
-                r_body.append((self.x + x * cos_a - y * sin_a, self.y + x * sin_a + y * cos_a))
-
-            # Rotate grip points
-            r_grip = []
-            for x, y in grip:
-                r_grip.append((self.x + x * cos_a - y * sin_a, self.y + x * sin_a + y * cos_a))
-
-            # Draw Body
-            pyxel.tri(r_body[0][0], r_body[0][1], r_body[1][0], r_body[1][1], r_body[2][0], r_body[2][1], 13)
-            pyxel.tri(r_body[0][0], r_body[0][1], r_body[2][0], r_body[2][1], r_body[3][0], r_body[3][1], 13)
-            
-            # Draw Grip
-            pyxel.tri(r_grip[0][0], r_grip[0][1], r_grip[1][0], r_grip[1][1], r_grip[2][0], r_grip[2][1], 1)
-            pyxel.tri(r_grip[0][0], r_grip[0][1], r_grip[2][0], r_grip[2][1], r_grip[3][0], r_grip[3][1], 1)
-
-        elif self.style == "Crossbow":
-            cos_a = math.cos(angle_rad)
-            sin_a = math.sin(angle_rad)
-
-            # Define relative points for the crossbow components
-            # Bow (relative to launcher pivot)
-            bow_left_rel = (-15, 0)
-            bow_right_rel = (15, 0)
-            
-            # Stock (relative to launcher pivot)
-            stock_points_rel = [
-                (0, -3),  # Top-left of stock
-                (4, -3),  # Top-right of stock
-                (4, 5),   # Bottom-right of stock
-                (0, 5)    # Bottom-left of stock
-            ]
-
-            # Function to rotate and translate a point
-            def get_rotated_point(px_rel, py_rel):
-                rotated_x = self.x + (px_rel * cos_a - py_rel * sin_a)
-                rotated_y = self.y + (px_rel * sin_a + py_rel * cos_a)
-                return rotated_x, rotated_y
-
-            # Get rotated points for bow
-            bl_x, bl_y = get_rotated_point(bow_left_rel[0], bow_left_rel[1])
-            br_x, br_y = get_rotated_point(bow_right_rel[0], bow_right_rel[1])
-
-            # Get rotated points for stock
-            rotated_stock_points = [get_rotated_point(p[0], p[1]) for p in stock_points_rel]
-
-            # Draw Bow
-            pyxel.line(bl_x, bl_y, br_x, br_y, 4) # Bow line
-
-            # Draw Stock
-            pyxel.tri(rotated_stock_points[0][0], rotated_stock_points[0][1],
-                      rotated_stock_points[1][0], rotated_stock_points[1][1],
-                      rotated_stock_points[2][0], rotated_stock_points[2][1], 4)
-            pyxel.tri(rotated_stock_points[0][0], rotated_stock_points[0][1],
-                      rotated_stock_points[2][0], rotated_stock_points[2][1],
-                      rotated_stock_points[3][0], rotated_stock_points[3][1], 4)
-
-            # Main barrel/arrow (still from launcher pivot to end_x, end_y)
-            pyxel.line(self.x, self.y, end_x, end_y, 7)
-
-            # Crossbow string (perpendicular to barrel)
-            string_offset_from_pivot = -5 # How far back the string is from the pivot
-            string_center_x = self.x + math.cos(angle_rad) * string_offset_from_pivot
-            string_center_y = self.y + math.sin(angle_rad) * string_offset_from_pivot
-
-            # Perpendicular direction
-            perp_angle_rad = angle_rad + math.pi / 2
-            string_half_width = 15 # Half of the bow width (30 / 2)
-
-            string_start_x = string_center_x + math.cos(perp_angle_rad) * string_half_width
-            string_start_y = string_center_y + math.sin(perp_angle_rad) * string_half_width
-            string_end_x = string_center_x - math.cos(perp_angle_rad) * string_half_width
-            string_end_y = string_center_y - math.sin(perp_angle_rad) * string_half_width
-
-            pyxel.line(string_start_x, string_start_y, string_end_x, string_end_y, 0) # Black string
-
-        pyxel.text(self.x - 10, self.y - 12, f"P:{int(self.power)}", 7)
-
-class Ball:
-    def __init__(self, x, y, angle, power, ball_type="normal", radius=3, style="Normal"):
-        self.x = x
-        self.y = y
-        self.vx = math.cos(math.radians(angle)) * power
-        self.vy = math.sin(math.radians(angle)) * power
-        self.radius = radius
-        self.is_active = True
-        self.ball_type = ball_type
-        self.style = style
-        self.pierce_count = 0
-
-    def update(self):
-        if not self.is_active:
-            return
-        self.vy += 0.15
-        self.x += self.vx
-        self.y += self.vy
-        if self.x < -self.radius or self.x > pyxel.width + self.radius or self.y > pyxel.height + self.radius:
-            self.is_active = False
-
-    def draw(self):
-        if not self.is_active:
-            return
-
-        if self.style == "Normal":
-            color = 10
-            if self.ball_type == "bomb": color = 8
-            elif self.ball_type == "pierce": color = 6
-            pyxel.circ(self.x, self.y, self.radius, 1) # Shadow
-            pyxel.circ(self.x, self.y - 1, self.radius, color)
-            pyxel.circ(self.x, self.y - 2, 1, 7) # Highlight
-        elif self.style == "Baseball":
-            pyxel.circ(self.x, self.y, self.radius, 1) # Shadow
-            pyxel.circ(self.x, self.y - 1, self.radius, 7)
-            for i in range(-2, 3):
-                pyxel.pset(self.x + i, self.y + (1-abs(i)), 8)
-                pyxel.pset(self.x + i, self.y - (3-abs(i)), 8)
-        elif self.style == "Billiard":
-            pyxel.circ(self.x, self.y, self.radius, 1) # Shadow
-            pyxel.circ(self.x, self.y - 1, self.radius, 10)
-            pyxel.circ(self.x, self.y - 1, self.radius - 1, 7)
-            pyxel.text(self.x - 1, self.y - 3, "8", 1)
-        elif self.style == "Slipper":
-            # Calculate rotation for slipper
-            angle_rad = math.atan2(self.vy, self.vx) # Angle based on ball's velocity
-            cos_a = math.cos(angle_rad)
-            sin_a = math.sin(angle_rad)
-
-            # Define relative points for slipper components (sole and strap)
-            # Sole points relative to ball center
-            sole_points_rel = [
-                (-4, -2), (4, -2), (4, 3), (-4, 3) # x, y relative to ball center
-            ]
-            # Strap points relative to ball center
-            strap_points_rel = [
-                (-4, -4), (1, -4), (1, -2), (-4, -2) # x, y relative to ball center
-            ]
-
-            # Function to rotate and translate a point
-            def get_rotated_point(px_rel, py_rel):
-                rotated_x = self.x + (px_rel * cos_a - py_rel * sin_a)
-                rotated_y = self.y + (px_rel * sin_a + py_rel * cos_a)
-                return rotated_x, rotated_y
-
-            # Get rotated points for sole
-            rotated_sole_points = [get_rotated_point(p[0], p[1]) for p in sole_points_rel]
-
-            # Get rotated points for strap
-            rotated_strap_points = [get_rotated_point(p[0], p[1]) for p in strap_points_rel]
-
-            # Draw Sole (Shadow)
-            pyxel.tri(rotated_sole_points[0][0]+1, rotated_sole_points[0][1]+1,
-                      rotated_sole_points[1][0]+1, rotated_sole_points[1][1]+1,
-                      rotated_sole_points[2][0]+1, rotated_sole_points[2][1]+1, 1)
-            pyxel.tri(rotated_sole_points[0][0]+1, rotated_sole_points[0][1]+1,
-                      rotated_sole_points[2][0]+1, rotated_sole_points[2][1]+1,
-                      rotated_sole_points[3][0]+1, rotated_sole_points[3][1]+1, 1)
-
-            # Draw Sole (Main)
-            pyxel.tri(rotated_sole_points[0][0], rotated_sole_points[0][1],
-                      rotated_sole_points[1][0], rotated_sole_points[1][1],
-                      rotated_sole_points[2][0], rotated_sole_points[2][1], 0)
-            pyxel.tri(rotated_sole_points[0][0], rotated_sole_points[0][1],
-                      rotated_sole_points[2][0], rotated_sole_points[2][1],
-                      rotated_sole_points[3][0], rotated_sole_points[3][1], 0)
-
-            # Draw Strap (Shadow)
-            pyxel.tri(rotated_strap_points[0][0]+1, rotated_strap_points[0][1]+1,
-                      rotated_strap_points[1][0]+1, rotated_strap_points[1][1]+1,
-                      rotated_strap_points[2][0]+1, rotated_strap_points[2][1]+1, 1)
-            pyxel.tri(rotated_strap_points[0][0]+1, rotated_strap_points[0][1]+1,
-                      rotated_strap_points[2][0]+1, rotated_strap_points[2][1]+1,
-                      rotated_strap_points[3][0]+1, rotated_strap_points[3][1]+1, 1)
-
-            # Draw Strap (Main)
-            pyxel.tri(rotated_strap_points[0][0], rotated_strap_points[0][1],
-                      rotated_strap_points[1][0], rotated_strap_points[1][1],
-                      rotated_strap_points[2][0], rotated_strap_points[2][1], 0)
-            pyxel.tri(rotated_strap_points[0][0], rotated_strap_points[0][1],
-                      rotated_strap_points[2][0], rotated_strap_points[2][1],
-                      rotated_strap_points[3][0], rotated_strap_points[3][1], 0)
-
-class Block:
-    def __init__(self, x, y, width, height, block_type="wood"):
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
-        self.block_type = block_type
-        self.is_active = True
-        if block_type == "wood":
-            self.hp = 1
-            self.base_color = 4
-            self.highlight_color = 10
-            self.shadow_color = 2
-            self.explosion_color = 5
-            self.destruction_sound_id = 1
-        elif block_type == "stone":
-            self.hp = 1
-            self.base_color = 13
-            self.highlight_color = 7
-            self.shadow_color = 6
-            self.explosion_color = 0
-            self.destruction_sound_id = 2
-        elif block_type == "glass":
-            self.hp = 1
-            self.base_color = 12
-            self.highlight_color = 7
-            self.shadow_color = 5
-            self.explosion_color = 7
-            self.destruction_sound_id = 1
-        else: # Fallback
-            self.hp = 1
-            self.base_color = 3
-            self.highlight_color = 7
-            self.shadow_color = 2
-            self.explosion_color = 5
-            self.destruction_sound_id = 1
-        self.max_hp = self.hp
-
-    def take_damage(self, damage):
-        self.hp -= damage
-        if self.hp <= 0:
-            self.is_active = False
-            return True
-        return False
-
-    def draw(self):
-        if not self.is_active:
-            return
-
-        # Draw main body
-        pyxel.rect(self.x, self.y, self.width, self.height, self.base_color)
-
-        # Draw 3D effect
-        if self.block_type == "wood":
-            pyxel.rect(self.x, self.y, self.width, 1, self.highlight_color)
-            pyxel.rect(self.x, self.y + self.height -1, self.width, 1, self.shadow_color)
-            pyxel.rect(self.x + self.width -1, self.y, 1, self.height, self.shadow_color)
-        elif self.block_type == "stone":
-            pyxel.rect(self.x, self.y, self.width, 1, self.highlight_color)
-            pyxel.rect(self.x, self.y + self.height -1, self.width, 1, self.shadow_color)
-            pyxel.rect(self.x + self.width -1, self.y, 1, self.height, self.shadow_color)
-            for _ in range(5):
-                pyxel.pset(self.x + random.randint(1, self.width-2), self.y + random.randint(1, self.height-2), self.shadow_color)
-        elif self.block_type == "glass":
-            pyxel.rectb(self.x, self.y, self.width, self.height, self.shadow_color)
-            pyxel.rect(self.x+1, self.y+1, self.width-2, self.height-2, self.base_color)
-            pyxel.pset(self.x + 1, self.y + 1, self.highlight_color)
-        else:
-            pyxel.rectb(self.x, self.y, self.width, self.height, 0)
-
-class Explosion:
-    def __init__(self, x, y, color):
-        self.x = x
-        self.y = y
-        self.life = 20
-        self.particles = []
-        for _ in range(8):
-            angle = random.uniform(0, 2 * math.pi)
-            speed = random.uniform(0.5, 2)
-            self.particles.append({
-                'x': x, 'y': y,
-                'vx': math.cos(angle) * speed,
-                'vy': math.sin(angle) * speed,
-                'color': color
-            })
-
-    def update(self):
-        self.life -= 1
-        for p in self.particles:
-            p['x'] += p['vx']
-            p['y'] += p['vy']
-            p['vy'] += 0.05
-
-    def draw(self):
-        if self.life > 0:
-            for p in self.particles:
-                pyxel.pset(p['x'], p['y'], p['color'])
-
-class Item:
-    def __init__(self, x, y, item_type):
-        self.x = x
-        self.y = y
-        self.item_type = item_type
-        self.is_active = True
-        self.vy = 0.5
-
-    def update(self):
-        self.y += self.vy
-        if self.y > pyxel.height:
-            self.is_active = False
-
-    def draw(self):
-        if self.is_active:
-            if self.item_type == "multi_ball":
-                pyxel.circ(self.x, self.y, 4, 11)
-            elif self.item_type == "big_ball":
-                pyxel.rect(self.x - 2, self.y - 2, 5, 5, 14)
-            elif self.item_type == "laser_beam":
-                pyxel.tri(self.x, self.y - 2, self.x - 3, self.y + 2, self.x + 3, self.y + 2, 8)
-
-class Laser:
-    def __init__(self, x, y, angle):
-        self.x = x
-        self.y = y
-        self.angle = angle
-        self.is_active = True
-        self.length = 0
-
-    def update(self):
-        self.length += 10
-        if self.length > pyxel.width:
-            self.is_active = False
-
-    def draw(self):
-        if self.is_active:
-            end_x = self.x + math.cos(math.radians(self.angle)) * self.length
-            end_y = self.y + math.sin(math.radians(self.angle)) * self.length
-            pyxel.line(self.x, self.y, end_x, end_y, 8)
+def make_mixer():
+    durations = {sound_id: sound_frames(notes, speed) for sound_id, (notes, _, _, _, speed) in SOUNDS.items()}
+    music_channels = {music_id: tuple(range(len(seqs))) for music_id, seqs in MUSICS.items()}
+    music_durations = {music_id: max(sum(durations[s] for s in seq) for seq in seqs) for music_id, seqs in MUSICS.items()}
+    return AudioMixer(durations, SOUND_PRIORITIES, music_channels, music_durations, num_channels=4)
 
 class App:
-    def __init__(self):
-        pyxel.init(200, 150, title="Pyxel Demolisher")
-        # Sounds
-        pyxel.sounds[0].set('c2', 't', '7', 's', 3)
-        pyxel.sounds[1].set('c1', 'n', '7', 's', 7)
-        pyxel.sounds[2].set('c2', 't', '7', 's', 10)
-        pyxel.sounds[3].set('c1e1g1', 't', '7', 's', 5)
-        pyxel.sounds[4].set('c3', 'p', '7', 's', 10)
-        pyxel.sounds[5].set('c3e3g3', 'p', '6', 's', 8)
-        pyxel.sounds[6].set('c4', 's', '7', 'v', 15)
-        pyxel.sounds[7].set('c4', 't', '7', 's', 10)
-        pyxel.sounds[8].set("c4g4c4", "t", "7", "s", 10)
-
-        # Music
-        pyxel.musics[0].set([10], [11])
-        pyxel.sounds[10].set("g2c3e3g3c3g3e3c3", "p", "6", "s", 15)
-        pyxel.sounds[11].set("c1g1c2g2c1g1c2g2", "t", "7", "s", 15)
-        pyxel.musics[1].set([12])
-        pyxel.sounds[12].set("c4e4g4c4", "t", "7", "s", 10)
-        pyxel.musics[2].set([13])
-        pyxel.sounds[13].set("g3e3c3a2", "t", "7", "f", 12)
-        pyxel.musics[3].set([14])
-        pyxel.sounds[14].set("c3g3c4g4 c3g3c4g4", "p", "6", "s", 12)
+    def __init__(self, seed=None, record_path=None, replay_path=None, trace_path=None, profile=False, hint=False,
+                 leaderboard_path="leaderboard.db", upload_url=None, fps=TICK_RATE, sim_rate=TICK_RATE, pack_path=None, world_width=None):
+        pyxel.init(200, 150, title="Pyxel Demolisher", fps=fps)
+        load_pack(pyxel.width, pyxel.height) # Falls back to setting sounds up here
+        self.mixer = make_mixer()
+        # The game advances in fixed ticks however often pyxel calls update();
+        # drawing more often than that interpolates between the last two ticks
+        if sim_rate % TICK_RATE: raise ValueError(f"sim_rate must be a multiple of {TICK_RATE}")
+        self.clock = FixedClock(TICK_RATE)
+        self.interpolate = fps != TICK_RATE
+        self.substeps = sim_rate // TICK_RATE
+        self.pressed = set() # Keys pressed since the last tick
 
         self.game_state = GameState.START_SCREEN
         self.launcher_styles = ["Classic", "Triangle", "Pistol", "Crossbow"]
@@ -416,89 +58,157 @@ class App:
         self.selected_option = 0
 
         self.current_stage = 0
-        self.highscore = 0
-        self.load_highscore()
+        # Scores are read on the start screen the first time they are shown
+        self.leaderboard = Leaderboard(leaderboard_path, HttpSink(upload_url) if upload_url else None)
+        atexit.register(self.leaderboard.close)
+        self.highscore = None
+        self.style_best = {} # (launcher style, ball style) -> best score
+
+        # Every stage gets its own seed drawn from the session seed
+        self.session_seed = seed if seed is not None else random.SystemRandom().getrandbits(32)
+        self.seed_rng = random.Random(self.session_seed)
+        self.record_path = record_path
+        self.recordings = []
+        self.replay_queue = load_session(replay_path) if replay_path else []
+        self.replayer = None
+        # Stages the pack has are loaded from it; later ones are generated
+        self.level_pack = LevelPack(pack_path) if pack_path else None
+
+        self.particles = ParticlePool()
+        self.renderer = LayeredRenderer(pyxel.width, pyxel.height)
+        # Worlds wider than the screen scroll to follow the ball
+        self.world_width = max(world_width or pyxel.width, pyxel.width)
+        self.camera = Camera(pyxel.width, pyxel.height)
+        # P toggles the overlay; a trace file keeps the profiler on throughout
+        self.profiler = Profiler(trace_path)
+        if profile: self.profiler.toggle_overlay()
+        atexit.register(self.profiler.close)
+        # H toggles the aim hint; the solver's worker processes start on first use
+        self.hint = hint
+        self.solver = None
+        self.hint_layout = None
+        # The stage after the one being played is built and checked on a
+        # worker thread, so moving on never waits for generation
+        self.prefetcher = StagePrefetcher()
+        atexit.register(self.prefetcher.close)
+        self.next_recording = self.new_recording(0, self.seed_rng.getrandbits(64))
         self.reset_game()
         pyxel.run(self.update, self.draw)
 
-    def load_highscore(self):
-        try:
-            with open("highscore.txt", "r") as f:
-                self.highscore = int(f.read())
-        except FileNotFoundError:
-            self.highscore = 0
-        except ValueError:
-            self.highscore = 0 # Handle corrupted file
-
-    def save_highscore(self):
-        with open("highscore.txt", "w") as f:
-            f.write(str(self.highscore))
+    def selected_styles(self):
+        return self.launcher_styles[self.selected_launcher_index], self.ball_styles[self.selected_ball_index]
+
+    def load_highscores(self):
+        if self.highscore is None:
+            self.highscore = self.leaderboard.best()
+        styles = self.selected_styles()
+        if styles not in self.style_best:
+            rows = self.leaderboard.top_for_style(*styles, 1)
+            self.style_best[styles] = rows[0]["score"] if rows else 0
+
+    def save_score(self):
+        # Queued for the leaderboard's writer thread; only the cached bests change here
+        score = self.sim.score
+        styles = (self.sim.launcher.style, self.sim.ball_style)
+        self.leaderboard.submit(score, self.current_stage + 1, *styles)
+        if self.highscore is not None: self.highscore = max(self.highscore, score)
+        if styles in self.style_best: self.style_best[styles] = max(self.style_best[styles], score)
 
     def reset_game(self):
-        pyxel.stop()
-        selected_launcher_style = self.launcher_styles[self.selected_launcher_index]
-        self.launcher = Launcher(20, pyxel.height - 10, style=selected_launcher_style)
-        self.balls = []
-        self.blocks = []
-        self.explosions = []
-        self.items = []
-        self.lasers = []
-        self.score = 0
-        self.balls_left = 5
-        self.current_ball_type = "normal"
+        self.mixer.stop()
+        if self.game_state == GameState.RUNNING and self.replay_queue:
+            self.replayer = Replayer(self.replay_queue.pop(0))
+            self.recording = self.replayer.recording
+            self.current_stage = self.recording.stage
+            self.sim = self.replayer.sim
+        else:
+            self.replayer = None
+            # Seeds are drawn a stage ahead but used in the order stages are
+            # played, so a prefetched stage that is never played hands its
+            # seed on to the one that is
+            recording = self.next_recording
+            if (recording.stage, recording.launcher_style, recording.ball_style) != (self.current_stage, *self.selected_styles()):
+                recording = self.new_recording(self.current_stage, recording.seed)
+            self.recording = recording
+            self.sim = self.prefetcher.take(recording)
+            self.next_recording = self.new_recording(self.current_stage + 1, self.seed_rng.getrandbits(64))
+            self.prefetcher.request(self.next_recording)
+        _, cosmetic_seed = split_seed(self.recording.seed)
+        self.cosmetic_rng = random.Random(cosmetic_seed)
+        self.particles.seed(cosmetic_seed)
+        self.particles.clear()
         self.shake_intensity = 0
-        self.combo_count = 0
-        self.combo_timer = 0
-        self.multi_ball_timer = 0
-        self.big_ball_timer = 0
-        self.laser_beam_timer = 0
-        self.fever_mode = False
-        self.fever_timer = 0
-        self.fever_shot_timer = 0
-        self.fantastic_display_timer = 0
-        self.was_power_max = False
-        self.ground_y = pyxel.height - 5
-        self.generate_random_blocks()
-        if self.current_stage % 3 == 1: self.current_ball_type = "bomb"
-        elif self.current_stage % 3 == 2: self.current_ball_type = "pierce"
-        else: self.current_ball_type = "normal"
-        
+        self.camera.reset(self.sim)
+
         if self.game_state == GameState.RUNNING:
-            pyxel.playm(0, loop=True)
+            prepare_styles(self.sim.launcher.style, self.sim.ball_style)
+            self.mixer.music(0, True)
+
+    def new_recording(self, stage, seed):
+        pack = self.level_pack
+        layout = pack.stage(stage) if pack is not None and stage < len(pack) else None
+        return Recording(stage, seed, *self.selected_styles(), width=self.world_width, height=pyxel.height,
+                         substeps=self.substeps, layout=layout)
 
     def update(self):
+        self.latch_input()
+        if self.profiler.enabled: self.profiler.begin_frame()
+        for _ in range(self.clock.advance(time.perf_counter())):
+            self.tick()
+
+    def latch_input(self):
+        # Presses are kept until a tick sees them, so none fall between ticks
+        for key in LATCHED_KEYS:
+            if pyxel.btnp(key): self.pressed.add(key)
+
+    def btnp(self, key):
+        return key in self.pressed
+
+    def tick(self):
+        if self.btnp(pyxel.KEY_P): self.profiler.toggle_overlay()
+        if self.btnp(pyxel.KEY_H): self.hint = not self.hint
         if self.game_state == GameState.START_SCREEN:
             self.update_start_screen()
         elif self.game_state == GameState.RUNNING:
             self.update_game()
         elif self.game_state == GameState.GAME_OVER:
-            if pyxel.btnp(pyxel.KEY_RETURN):
+            if self.btnp(pyxel.KEY_RETURN):
                 self.game_state = GameState.START_SCREEN
         elif self.game_state == GameState.GAME_WON:
-            if pyxel.btnp(pyxel.KEY_RETURN):
+            if self.btnp(pyxel.KEY_RETURN):
                 self.current_stage += 1
                 self.game_state = GameState.RUNNING
                 self.reset_game()
+        self.apply_audio(self.mixer.flush())
+        self.pressed.clear()
 
     def draw(self):
         pyxel.cls(12)
         if self.game_state == GameState.START_SCREEN:
             self.draw_start_screen()
         else:
+            profiler = self.profiler
+            if profiler.enabled: profiler.start()
             self.draw_game()
+            if profiler.enabled:
+                sim = self.sim
+                profiler.end_frame(self.current_stage, {"balls": len(sim.balls), "blocks": len(sim.blocks),
+                                                        "particles": len(self.particles), "items": len(sim.items)})
+                if profiler.overlay: profiler.draw_overlay(pyxel.width - 98, 14)
 
     def update_start_screen(self):
-        if pyxel.btnp(pyxel.KEY_UP): self.selected_option = 0
-        if pyxel.btnp(pyxel.KEY_DOWN): self.selected_option = 1
+        self.load_highscores()
+        if self.btnp(pyxel.KEY_UP): self.selected_option = 0
+        if self.btnp(pyxel.KEY_DOWN): self.selected_option = 1
 
         if self.selected_option == 0:
-            if pyxel.btnp(pyxel.KEY_LEFT): self.selected_launcher_index = (self.selected_launcher_index - 1 + len(self.launcher_styles)) % len(self.launcher_styles)
-            if pyxel.btnp(pyxel.KEY_RIGHT): self.selected_launcher_index = (self.selected_launcher_index + 1) % len(self.launcher_styles)
+            if self.btnp(pyxel.KEY_LEFT): self.selected_launcher_index = (self.selected_launcher_index - 1 + len(self.launcher_styles)) % len(self.launcher_styles)
+            if self.btnp(pyxel.KEY_RIGHT): self.selected_launcher_index = (self.selected_launcher_index + 1) % len(self.launcher_styles)
         else:
-            if pyxel.btnp(pyxel.KEY_LEFT): self.selected_ball_index = (self.selected_ball_index - 1 + len(self.ball_styles)) % len(self.ball_styles)
-            if pyxel.btnp(pyxel.KEY_RIGHT): self.selected_ball_index = (self.selected_ball_index + 1) % len(self.ball_styles)
+            if self.btnp(pyxel.KEY_LEFT): self.selected_ball_index = (self.selected_ball_index - 1 + len(self.ball_styles)) % len(self.ball_styles)
+            if self.btnp(pyxel.KEY_RIGHT): self.selected_ball_index = (self.selected_ball_index + 1) % len(self.ball_styles)
 
-        if pyxel.btnp(pyxel.KEY_RETURN):
+        if self.btnp(pyxel.KEY_RETURN):
             self.game_state = GameState.RUNNING
             self.current_stage = 0
             self.reset_game()
@@ -513,209 +223,140 @@ class App:
         ball_text = f"Ball Style: < {self.ball_styles[self.selected_ball_index]} >"
         pyxel.text(50, 80, ball_text, 10 if self.selected_option == 1 else 7)
 
+        best = self.style_best.get(self.selected_styles())
+        if best: pyxel.text(50, 100, f"Best with these: {best}", 6)
+
         pyxel.text(55, 120, "Press Enter to Start", 7)
-        pyxel.text(5, 140, f"HIGH SCORE: {self.highscore}", 7)
+        pyxel.text(5, 140, f"HIGH SCORE: {self.highscore or 0}", 7)
+
+    def read_input(self):
+        buttons = 0
+        if pyxel.btn(pyxel.KEY_LEFT): buttons |= INPUT_LEFT
+        if pyxel.btn(pyxel.KEY_RIGHT): buttons |= INPUT_RIGHT
+        if pyxel.btn(pyxel.KEY_UP): buttons |= INPUT_UP
+        if pyxel.btn(pyxel.KEY_DOWN): buttons |= INPUT_DOWN
+        if pyxel.btn(pyxel.KEY_SPACE): buttons |= INPUT_FIRE
+        if self.btnp(pyxel.KEY_SPACE): buttons |= INPUT_FIRE_PRESSED
+        if self.btnp(pyxel.KEY_F): buttons |= INPUT_LASER
+        return buttons
+
+    def handle_events(self, events):
+        for event in events:
+            kind = event[0]
+            if kind == "sound":
+                self.mixer.play(event[1])
+            elif kind == "music":
+                self.mixer.music(event[1], event[2])
+            elif kind == "explosion":
+                if in_view(event[1], event[2], self.camera.view()): self.particles.emit(event[1], event[2], event[3])
+            elif kind == "shake":
+                self.trigger_shake(event[1])
 
     def update_game(self):
+        profiler = self.profiler if self.profiler.enabled else None
         if self.shake_intensity > 0:
             self.shake_intensity *= 0.9
             if self.shake_intensity < 0.1: self.shake_intensity = 0
 
-        if self.combo_timer > 0: self.combo_timer -= 1
+        if self.replayer is not None:
+            if self.replayer.done():
+                # Recording ended mid-stage
+                self.game_state = GameState.START_SCREEN
+                self.mixer.stop()
+                return
+            events = self.replayer.step(profiler)
+            self.sim = self.replayer.sim
         else:
-            if self.combo_count > 1: self.score += self.combo_count * 50
-            self.combo_count = 0
-
-        if self.multi_ball_timer > 0: self.multi_ball_timer -= 1
-        if self.big_ball_timer > 0:
-            self.big_ball_timer -= 1
-            if self.big_ball_timer == 0:
-                for ball in self.balls: ball.radius = 3
-        if self.laser_beam_timer > 0: self.laser_beam_timer -= 1
-
-        if self.fever_mode:
-            self.fever_timer -= 1
-            if self.fever_timer == 0:
-                self.fever_mode = False
-                pyxel.stop()
-                pyxel.playm(0, loop=True)
-            if self.fever_shot_timer > 0: self.fever_shot_timer -= 1
-
-        self.launcher.update()
-
-        if self.launcher.power == 10 and not self.was_power_max:
-            self.fantastic_display_timer = 60
-            pyxel.play(0, 8)
-        self.was_power_max = (self.launcher.power == 10)
-
-        if self.fantastic_display_timer > 0: self.fantastic_display_timer -= 1
-
-        selected_ball_style = self.ball_styles[self.selected_ball_index]
-        if self.fever_mode:
-            if pyxel.btn(pyxel.KEY_SPACE) and self.fever_shot_timer == 0:
-                power = self.launcher.power * 1.5
-                self.balls.append(Ball(self.launcher.x, self.launcher.y, self.launcher.angle, power, ball_type="normal", style=selected_ball_style))
-                pyxel.play(0, 3)
-                self.fever_shot_timer = 5
-        elif pyxel.btnp(pyxel.KEY_SPACE) and self.balls_left > 0:
-            radius = 6 if self.big_ball_timer > 0 else 3
-            self.balls.append(Ball(self.launcher.x, self.launcher.y, self.launcher.angle, self.launcher.power, self.current_ball_type, radius, selected_ball_style))
-            if not self.fever_mode: self.balls_left -= 1
-            pyxel.play(0, 3)
-            if self.multi_ball_timer > 0:
-                for i in range(2):
-                    angle = self.launcher.angle + random.uniform(-10, 10)
-                    self.balls.append(Ball(self.launcher.x, self.launcher.y, angle, self.launcher.power, self.current_ball_type, radius, selected_ball_style))
-
-        if self.laser_beam_timer > 0 and pyxel.btnp(pyxel.KEY_F):
-            self.lasers.append(Laser(self.launcher.x, self.launcher.y, self.launcher.angle))
-            pyxel.play(0, 6)
-
-        for laser in self.lasers:
-            laser.update()
-            for block in self.blocks:
-                if block.is_active and self.check_laser_collision(laser, block):
-                    if block.take_damage(1):
-                        self.score += 100
-                        self.explosions.append(Explosion(block.x + block.width / 2, block.y + block.height / 2, block.explosion_color))
-                        pyxel.play(0, block.destruction_sound_id)
-                        self.trigger_shake(1)
-
-        for ball in self.balls:
-            ball.update()
-            for block in self.blocks:
-                if block.is_active and self.check_collision(ball, block):
-                    if ball.ball_type == "normal":
-                        overlap_x = (ball.radius + block.width / 2) - abs(ball.x - (block.x + block.width / 2))
-                        overlap_y = (ball.radius + block.height / 2) - abs(ball.y - (block.y + block.height / 2))
-                        if overlap_x < overlap_y:
-                            ball.vx *= -1
-                            ball.x += math.copysign(overlap_x, -ball.vx)
-                        else:
-                            ball.vy *= -1
-                            ball.y += math.copysign(overlap_y, -ball.vy)
-                    elif ball.ball_type == "bomb":
-                        ball.is_active = False
-                        for other_block in self.blocks:
-                            if other_block.is_active and abs(block.x - other_block.x) < 20 and abs(block.y - other_block.y) < 20:
-                                if other_block.take_damage(1):
-                                    self.score += 100
-                                    self.explosions.append(Explosion(other_block.x + other_block.width / 2, other_block.y + other_block.height / 2, other_block.explosion_color))
-                                    pyxel.play(0, 1)
-                                    self.trigger_shake(4)
-                                    if random.random() < 0.1: self.items.append(Item(other_block.x, other_block.y, random.choice(["multi_ball", "big_ball", "laser_beam"])))
-                    elif ball.ball_type == "pierce":
-                        ball.pierce_count += 1
-                        if ball.pierce_count >= 3: ball.is_active = False
-                    pyxel.play(0, 0)
-                    if block.take_damage(1):
-                        self.score += 100
-                        self.explosions.append(Explosion(block.x + block.width / 2, block.y + block.height / 2, block.explosion_color))
-                        pyxel.play(0, block.destruction_sound_id)
-                        self.trigger_shake(2)
-                        self.combo_count += 1
-                        self.combo_timer = 30
-                        if self.combo_count >= 10 and not self.fever_mode:
-                            self.fever_mode = True
-                            self.fever_timer = 600
-                            pyxel.stop()
-                            pyxel.playm(3, loop=True)
-                            pyxel.play(0, 7)
-                        if self.combo_count > 1: pyxel.play(0, 5)
-                        if random.random() < 0.1: self.items.append(Item(block.x, block.y, random.choice(["multi_ball", "big_ball", "laser_beam"])))
-
-        for item in self.items:
-            item.update()
-            if item.is_active and self.check_item_collision(item):
-                item.is_active = False
-                pyxel.play(0, 4)
-                if item.item_type == "multi_ball": self.multi_ball_timer = 300
-                elif item.item_type == "big_ball":
-                    self.big_ball_timer = 300
-                    for ball in self.balls: ball.radius = 6
-                elif item.item_type == "laser_beam": self.laser_beam_timer = 120
-
-        self.explosions = [exp for exp in self.explosions if exp.life > 0]
-        self.balls = [b for b in self.balls if b.is_active]
-        self.blocks = [b for b in self.blocks if b.is_active]
-        self.items = [i for i in self.items if i.is_active]
-        self.lasers = [l for l in self.lasers if l.is_active]
-
-        if not any(b.is_active for b in self.blocks):
-            self.game_state = GameState.GAME_WON
-            self.balls = []
-            self.balls_left = 0
-            pyxel.stop()
-            pyxel.playm(1, loop=False)
+            buttons = self.read_input()
+            self.recording.record(buttons)
+            events = self.sim.step(buttons, profiler)
+        self.handle_events(events)
+        self.camera.follow(self.sim)
+
+        self.particles.cull(self.camera.view())
+        self.particles.update()
+        if profiler: profiler.lap("update_particles")
+
+        if self.hint and self.replayer is None: self.update_hint()
+
+        if self.sim.outcome is not None and self.replayer is None:
+            self.recordings.append(self.recording)
+            if self.record_path:
+                save_session(self.record_path, self.recordings)
 
-        if self.balls_left == 0 and not any(b.is_active for b in self.balls) and any(b.is_active for b in self.blocks):
+        if self.sim.outcome == "won":
+            self.game_state = GameState.GAME_WON
+        elif self.sim.outcome == "lost":
             self.game_state = GameState.GAME_OVER
-            pyxel.stop()
-            pyxel.playm(2, loop=False)
-            if self.score > self.highscore:
-                self.highscore = self.score
-                self.save_highscore()
+            if self.replayer is None:
+                self.save_score()
+                # Enter goes back to the start screen and stage 1, so that is
+                # the stage to have ready, on the seed drawn for the next one
+                self.next_recording = self.new_recording(0, self.next_recording.seed)
+                self.prefetcher.request(self.next_recording)
+
+    def update_hint(self):
+        # Search again once the balls and falling blocks have settled on a
+        # changed layout; the solver runs in the background and poll() never
+        # waits on it
+        sim = self.sim
+        if self.solver is None:
+            self.solver = AimSolver()
+        layout = (sim, sim.block_version, sim.current_ball_type, sim.big_ball_timer > 0)
+        if len(sim.balls) == 0 and sim.blocks.awake_count == 0 and layout != self.hint_layout:
+            self.hint_layout = layout
+            self.solver.request(sim)
+        self.solver.poll()
 
     def draw_game(self):
+        sim = self.sim
+        profiler = self.profiler if self.profiler.enabled else None
         offset_x, offset_y = (0, 0)
         if self.shake_intensity > 0:
-            offset_x = random.uniform(-self.shake_intensity, self.shake_intensity)
-            offset_y = random.uniform(-self.shake_intensity, self.shake_intensity)
+            offset_x = self.cosmetic_rng.uniform(-self.shake_intensity, self.shake_intensity)
+            offset_y = self.cosmetic_rng.uniform(-self.shake_intensity, self.shake_intensity)
         
-        pyxel.camera(offset_x, offset_y)
+        alpha = self.clock.alpha if self.interpolate else 1.0
+        camera_x, camera_y = self.camera.position(alpha)
+        view = self.camera.view(alpha)
 
-        # Draw background based on stage
-        stage_bg_color = 12 # Default sky blue
-        if self.current_stage == 0: # Grassland
-            pyxel.cls(12) # Sky
-            pyxel.rect(0, self.ground_y - 20, pyxel.width, 20, 3) # Green grass
-            pyxel.rect(0, self.ground_y, pyxel.width, pyxel.height - self.ground_y, 1) # Dirt
-            for i in range(0, pyxel.width, 8):
-                pyxel.tri(i+4, self.ground_y - 20, i, self.ground_y - 30, i+8, self.ground_y - 30, 3) # Hills
-        elif self.current_stage == 1: # Volcano
-            pyxel.cls(0) # Dark sky
-            pyxel.tri(pyxel.width/2, self.ground_y, pyxel.width/2 - 50, self.ground_y - 50, pyxel.width/2 + 50, self.ground_y - 50, 8) # Volcano mountain
-            pyxel.circ(pyxel.width/2, self.ground_y - 50, 5, 10) # Lava
-            pyxel.rect(0, self.ground_y, pyxel.width, pyxel.height - self.ground_y, 1) # Ground
-        elif self.current_stage == 2: # Ocean
-            pyxel.cls(6) # Deep blue ocean
-            pyxel.rect(0, self.ground_y - 10, pyxel.width, 10, 12) # Lighter blue surface
-            for i in range(0, pyxel.width, 10):
-                pyxel.circ(i + random.randint(-2,2), self.ground_y - 5 + random.randint(-2,2), 2, 7) # Bubbles
-            pyxel.rect(0, self.ground_y, pyxel.width, pyxel.height - self.ground_y, 1) # Seabed
-        elif self.current_stage == 3: # Sky
-            pyxel.cls(12) # Bright sky
-            for i in range(0, pyxel.width, 15):
-                pyxel.circ(i + random.randint(-5,5), 30 + random.randint(-5,5), 10, 7) # Clouds
-                pyxel.circ(i + random.randint(-5,5), 50 + random.randint(-5,5), 8, 7) # Clouds
-            pyxel.rect(0, self.ground_y, pyxel.width, pyxel.height - self.ground_y, 3) # Ground
-        elif self.current_stage == 4: # Space
-            pyxel.cls(0) # Black space
-            for _ in range(50): # Stars
-                pyxel.pset(random.randint(0, pyxel.width), random.randint(0, pyxel.height), 7)
-            pyxel.circ(pyxel.width - 20, 20, 10, 10) # Moon/Planet
-            pyxel.rect(0, self.ground_y, pyxel.width, pyxel.height - self.ground_y, 1) # Ground
-        else: # Default background for stages beyond 4
-            pyxel.cls(12)
-            pyxel.rect(0, self.ground_y, pyxel.width, pyxel.height - self.ground_y, 3)
-
-        self.launcher.draw()
-        for ball in self.balls: ball.draw()
-        for block in self.blocks: block.draw()
-        for exp in self.explosions: exp.draw()
-        for item in self.items: item.draw()
-        for laser in self.lasers: laser.draw()
+        pyxel.camera(offset_x, offset_y)
+        self.renderer.draw_background(self.current_stage, sim.ground_y, pyxel.frame_count)
+        if profiler: profiler.lap("draw_background")
+
+        # The world scrolls under the screen-fixed background
+        pyxel.camera(camera_x + offset_x, camera_y + offset_y)
+        draw_launcher(sim.launcher)
+        if profiler: profiler.lap("draw_launcher")
+        draw_balls(sim.balls, alpha, view)
+        if self.hint and self.solver is not None and self.solver.best is not None:
+            _, _, angle, power = self.solver.best
+            draw_aim_hint(sim.launcher.x, sim.launcher.y, angle, power, sim.balls.gravity, sim.width, sim.height,
+                          7 if self.solver.searching() else 10)
+        if profiler: profiler.lap("draw_balls")
+        self.renderer.draw_blocks(sim, camera_x, camera_y)
+        if profiler: profiler.lap("draw_blocks")
+        draw_particles(self.particles, alpha, view)
+        if profiler: profiler.lap("draw_explosions")
+        for item in sim.items:
+            if in_view(item.x, item.y, view): draw_item(item)
+        for laser in sim.lasers: draw_laser(laser)
+        if profiler: profiler.lap("draw_items")
         pyxel.camera(0, 0)
 
-        pyxel.text(5, 5, f"SCORE: {self.score}", 7)
-        pyxel.text(5, 15, f"BALLS: {self.balls_left}", 7)
+        pyxel.text(5, 5, f"SCORE: {sim.score}", 7)
+        pyxel.text(5, 15, f"BALLS: {sim.balls_left}", 7)
         pyxel.text(5, 25, f"STAGE: {self.current_stage + 1}", 7)
-        if self.combo_count > 0: pyxel.text(5, 35, f"COMBO: {self.combo_count}", 8)
-        if self.multi_ball_timer > 0: pyxel.text(5, 45, f"MULTI-BALL: {self.multi_ball_timer // 60}", 11)
-        if self.big_ball_timer > 0: pyxel.text(5, 55, f"BIG-BALL: {self.big_ball_timer // 60}", 14)
-        if self.laser_beam_timer > 0: pyxel.text(5, 65, f"LASER: {self.laser_beam_timer // 60}", 8)
-        if self.fever_mode: pyxel.text(pyxel.width / 2 - 20, 5, f"FEVER MODE: {self.fever_timer // 60}", 8)
-        if self.fantastic_display_timer > 0: pyxel.text(pyxel.width / 2 - 30, pyxel.height / 2 - 10, "FANTASTIC!!", 10)
+        if sim.combo_count > 0: pyxel.text(5, 35, f"COMBO: {sim.combo_count}", 8)
+        if sim.multi_ball_timer > 0: pyxel.text(5, 45, f"MULTI-BALL: {sim.multi_ball_timer // 60}", 11)
+        if sim.big_ball_timer > 0: pyxel.text(5, 55, f"BIG-BALL: {sim.big_ball_timer // 60}", 14)
+        if sim.laser_beam_timer > 0: pyxel.text(5, 65, f"LASER: {sim.laser_beam_timer // 60}", 8)
+        if self.hint and self.solver is not None and self.solver.best is not None:
+            destroyed, _, angle, power = self.solver.best
+            pyxel.text(5, 75, f"HINT: {angle} / {power:.1f} ({destroyed})", 10)
+        if sim.fever_mode: pyxel.text(pyxel.width / 2 - 20, 5, f"FEVER MODE: {sim.fever_timer // 60}", 8)
+        if self.replayer is not None: pyxel.text(pyxel.width - 30, 5, "REPLAY", 8)
+        if sim.fantastic_display_timer > 0: pyxel.text(pyxel.width / 2 - 30, pyxel.height / 2 - 10, "FANTASTIC!!", 10)
 
         if self.game_state == GameState.GAME_OVER:
             pyxel.text(pyxel.width / 2 - 20, pyxel.height / 2 - 4, "GAME OVER", 8)
@@ -723,35 +364,37 @@ class App:
         elif self.game_state == GameState.GAME_WON:
             pyxel.text(pyxel.width / 2 - 25, pyxel.height / 2 - 4, "STAGE CLEAR!", 14)
             pyxel.text(pyxel.width / 2 - 40, pyxel.height / 2 + 4, "Press ENTER for next stage", 7)
-
-    def check_collision(self, ball, block):
-        return (ball.x - ball.radius < block.x + block.width and
-                ball.x + ball.radius > block.x and
-                ball.y - ball.radius < block.y + block.height and
-                ball.y + ball.radius > block.y)
-
-    def check_item_collision(self, item):
-        return (item.x > self.launcher.x - 5 and item.x < self.launcher.x + 10 and
-                item.y > self.launcher.y and item.y < self.launcher.y + 5)
-
-    def check_laser_collision(self, laser, block):
-        end_x = laser.x + math.cos(math.radians(laser.angle)) * laser.length
-        end_y = laser.y + math.sin(math.radians(laser.angle)) * laser.length
-        return (max(laser.x, end_x) >= block.x and
-                min(laser.x, end_x) <= block.x + block.width and
-                max(laser.y, end_y) >= block.y and
-                min(laser.y, end_y) <= block.y + block.height)
-
-    def generate_random_blocks(self):
-        self.blocks = []
-        num_blocks = 5 + self.current_stage * 2
-        for _ in range(num_blocks):
-            block_type = random.choice(["wood", "stone", "glass"])
-            x = random.randint(pyxel.width // 2, pyxel.width - 20)
-            y_offset = random.randint(10, pyxel.height // 2)
-            self.blocks.append(Block(x, self.ground_y - y_offset, 10, 10, block_type=block_type))
+        if profiler: profiler.lap("draw_hud")
+
+    def apply_audio(self, commands):
+        for command in commands:
+            kind = command[0]
+            if kind == "play":
+                pyxel.play(command[1], command[2])
+            elif kind == "playm":
+                pyxel.playm(command[1], loop=command[2])
+            elif kind == "stop":
+                pyxel.stop()
 
     def trigger_shake(self, intensity):
         self.shake_intensity = max(self.shake_intensity, intensity)
 
-App()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pyxel Demolisher")
+    parser.add_argument("--seed", type=int, help="session seed, for reproducible stages")
+    parser.add_argument("--record", metavar="PATH", help="write every finished stage's inputs to PATH")
+    parser.add_argument("--replay", metavar="PATH", help="play back a session recorded with --record")
+    parser.add_argument("--profile", action="store_true", help="start with the profiler overlay shown (toggle with P)")
+    parser.add_argument("--trace", metavar="PATH", help="write per-phase frame times to PATH (.csv or .json)")
+    parser.add_argument("--hint", action="store_true", help="start with the aim hint on (toggle with H)")
+    parser.add_argument("--leaderboard", metavar="PATH", default="leaderboard.db", help="SQLite file scores are kept in")
+    parser.add_argument("--upload", metavar="URL", help="also POST finished scores to URL (see leaderboard.py serve)")
+    parser.add_argument("--fps", type=int, default=TICK_RATE, help="frames drawn per second; the game itself always runs at 30 ticks/s")
+    parser.add_argument("--sim-rate", type=int, default=TICK_RATE, help="physics steps per second, a multiple of 30; higher is more precise")
+    parser.add_argument("--pack", metavar="PATH", help="play stages from a level pack built with levelpack.py")
+    parser.add_argument("--world-width", type=int, help="stage width in pixels; wider than the 200 pixel screen scrolls with the ball")
+    args = parser.parse_args()
+    if args.sim_rate <= 0 or args.sim_rate % TICK_RATE: parser.error(f"--sim-rate must be a positive multiple of {TICK_RATE}")
+    App(seed=args.seed, record_path=args.record, replay_path=args.replay, trace_path=args.trace, profile=args.profile, hint=args.hint,
+        leaderboard_path=args.leaderboard, upload_url=args.upload, fps=args.fps, sim_rate=args.sim_rate, pack_path=args.pack,
+        world_width=args.world_width)
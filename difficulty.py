@@ -0,0 +1,295 @@
+import argparse
+import json
+import math
+import time
+
+import numpy as np
+
+from aim import ANGLES, COARSE_ANGLE_STEP, COARSE_POWER_STEP, POWERS, shot_grid
+from balls import BALL_TYPES, BOMB, NORMAL, PIERCE
+from simulation import Simulation
+from stagegen import CELL
+
+RADIUS = 3 # Big-ball items aren't modelled
+BOMB_REACH = 20 # Simulation.collide_ball damages blocks with a corner this close to the hit one
+PIERCE_HITS = 3
+BALLS = 5 # Simulation.balls_left
+MAX_BALLS = 12 # Greedy games give up after this many
+MAX_TICKS = 600 # Every ball has fallen out of the field long before this
+MAX_PASSES = 8 # Blocks one ball can touch in a tick: four cells, plus fresh ones after each bounce
+NO_BLOCK = np.iinfo(np.int32).max
+PAD = 2 # Empty cells around StageModel's cell map
+
+class StageModel:
+    # A stage's blocks as lookup tables for simulate_shots(). Blocks sit on
+    # the generator's CELL lattice, so the blocks a ball touches are found by
+    # reading at most four cells. Block k here is the k-th active block of
+    # the Simulation, so lower k still wins ties like a lower block index.
+    def __init__(self, sim):
+        blocks = sim.blocks
+        idx = blocks.active_indices()
+        self.count = len(idx)
+        self.x = blocks.x[idx].copy()
+        self.y = blocks.y[idx].copy()
+        self.hp = blocks.hp[idx].astype(np.int16)
+        if not (np.all(blocks.width[idx] == CELL) and np.all(blocks.height[idx] == CELL)):
+            raise ValueError("only stages of CELL x CELL blocks can be modelled")
+        self.ox = float(self.x.min() % CELL) if self.count else 0.0
+        self.oy = float(self.y.min() % CELL) if self.count else 0.0
+        cx = np.round((self.x - self.ox) / CELL).astype(np.int64)
+        cy = np.round((self.y - self.oy) / CELL).astype(np.int64)
+        if not (np.allclose(self.ox + cx * CELL, self.x) and np.allclose(self.oy + cy * CELL, self.y)):
+            raise ValueError("blocks are not on one CELL lattice")
+        # Two cells of padding, so lookups around any ball still in the field
+        # stay in the map; balls above it read the empty top row
+        self.cols = int(math.ceil((sim.width - self.ox) / CELL)) + 2 * PAD
+        self.rows = int(math.ceil((sim.height - self.oy) / CELL)) + 2 * PAD
+        self.cell_map = np.full((self.rows, self.cols), -1, dtype=np.int32)
+        self.cell_map[cy + PAD, cx + PAD] = np.arange(self.count, dtype=np.int32)
+        # Cells within one of a block: a ball can only touch a block from these
+        occupied = np.pad(self.cell_map >= 0, 1)
+        self.near = np.zeros_like(self.cell_map, dtype=bool)
+        for dy in range(3):
+            for dx in range(3):
+                self.near |= occupied[dy:dy + self.rows, dx:dx + self.cols]
+        # Blocks each block's bomb blast reaches, itself included
+        self.blast = ((np.abs(self.x[:, None] - self.x[None, :]) < BOMB_REACH) &
+                      (np.abs(self.y[:, None] - self.y[None, :]) < BOMB_REACH)).astype(np.int16)
+        self.left = (self.x.min() if self.count else sim.width) - 2 * CELL
+        self.top = (self.y.min() if self.count else sim.height) - 2 * CELL
+        self.width = sim.width
+        self.height = sim.height
+        self.launcher_x = float(sim.launcher.x)
+        self.launcher_y = float(sim.launcher.y)
+        self.gravity = sim.balls.gravity
+
+    def cell_index(self, px, py):
+        cx = np.floor((px - self.ox) / CELL).astype(np.intp) + PAD
+        cy = np.maximum(np.floor((py - self.oy) / CELL).astype(np.intp) + PAD, 0)
+        return cx, cy
+
+    def near_blocks(self, x, y):
+        # Balls close enough to a block cell to be worth the full test. Most
+        # of a shot is flown left of or above every block, so a bounding box
+        # check goes first.
+        ball = np.flatnonzero((x > self.left) & (y > self.top))
+        cx, cy = self.cell_index(x[ball], y[ball])
+        return ball[self.near[cy, cx]]
+
+    def first_hit(self, hp, rows, x, y, after):
+        # Lowest block above `after` that is standing and overlaps each ball,
+        # -1 for none: the order Simulation.collide_ball resolves hits in. A
+        # box with x0 < bx + CELL and x1 > bx touches the cells from floor(x0)
+        # to ceil(x1) - 1; a ball is smaller than a cell, so that is at most
+        # two per axis, and repeats when it is one don't change the minimum.
+        cx0, cy0 = self.cell_index(x - RADIUS, y - RADIUS)
+        cx1 = np.ceil((x + RADIUS - self.ox) / CELL).astype(np.intp) + (PAD - 1)
+        cy1 = np.maximum(np.ceil((y + RADIUS - self.oy) / CELL).astype(np.intp) + (PAD - 1), 0)
+        cell_map = self.cell_map
+        candidates = np.stack([cell_map[cy0, cx0], cell_map[cy0, cx1], cell_map[cy1, cx0], cell_map[cy1, cx1]], axis=1)
+        standing = hp[rows[:, None], np.maximum(candidates, 0)] > 0
+        key = np.where((candidates > after[:, None]) & standing, candidates, NO_BLOCK)
+        j = key.min(axis=1)
+        j[j == NO_BLOCK] = -1
+        return j
+
+def simulate_shots(model, hp, angles, powers, ball_type=NORMAL):
+    # Fires shot s at angle/power into its own copy of the stage with block
+    # hp hp[s], all shots advancing together tick by tick. Mirrors
+    # Simulation.update_balls for one ball of ball_type without substeps;
+    # item drops, combos and fever don't change where a lone ball goes.
+    # Blocks never fall here: one whose support is destroyed stays where it
+    # was, so shots that bring a stack down are undercounted.
+    # Returns the hp rows after every shot has left the field.
+    hp = np.array(hp, dtype=np.int16)
+    n = len(angles)
+    radians = np.radians(np.asarray(angles, dtype=np.float64))
+    powers = np.asarray(powers, dtype=np.float64)
+    shot = np.arange(n)
+    x = np.full(n, model.launcher_x)
+    y = np.full(n, model.launcher_y)
+    vx = np.cos(radians) * powers
+    vy = np.sin(radians) * powers
+    pierced = np.zeros(n, dtype=np.int16)
+    for _ in range(MAX_TICKS):
+        if not len(shot):
+            break
+        vy += model.gravity
+        x += vx
+        y += vy
+        live = (x >= -RADIUS) & (x <= model.width + RADIUS) & (y <= model.height + RADIUS)
+        if not live.all():
+            shot, x, y, vx, vy, pierced = shot[live], x[live], y[live], vx[live], vy[live], pierced[live]
+        ball = model.near_blocks(x, y) # Balls still hitting something this tick
+        if not len(ball):
+            continue
+        spent = np.zeros(len(shot), dtype=bool)
+        after = np.full(len(shot), -1)
+        for _ in range(MAX_PASSES):
+            j = model.first_hit(hp, shot[ball], x[ball], y[ball], after[ball])
+            hit = j >= 0
+            ball, j = ball[hit], j[hit]
+            if not len(ball):
+                break
+            rows = shot[ball]
+            after[ball] = j
+            if ball_type == NORMAL:
+                bx = model.x[j] + CELL / 2
+                by = model.y[j] + CELL / 2
+                overlap_x = (RADIUS + CELL / 2) - np.abs(x[ball] - bx)
+                overlap_y = (RADIUS + CELL / 2) - np.abs(y[ball] - by)
+                sideways = overlap_x < overlap_y
+                new_vx = np.where(sideways, -vx[ball], vx[ball])
+                new_vy = np.where(sideways, vy[ball], -vy[ball])
+                x[ball] = np.where(sideways, x[ball] + np.copysign(overlap_x, -new_vx), x[ball])
+                y[ball] = np.where(sideways, y[ball], y[ball] + np.copysign(overlap_y, -new_vy))
+                vx[ball] = new_vx
+                vy[ball] = new_vy
+            elif ball_type == BOMB:
+                spent[ball] = True
+                hp[rows] -= model.blast[j] * (hp[rows] > 0)
+            elif ball_type == PIERCE:
+                pierced[ball] += 1
+                spent[ball] |= pierced[ball] >= PIERCE_HITS
+            hp[rows, j] -= 1
+        if spent.any():
+            keep = ~spent
+            shot, x, y, vx, vy, pierced = shot[keep], x[keep], y[keep], vx[keep], vy[keep], pierced[keep]
+    return hp
+
+def destroyed(before, after):
+    return (before > 0).sum(axis=1) - (after > 0).sum(axis=1)
+
+def random_shots(rng, n):
+    # Any angle and power the launcher can be set to
+    angles = rng.integers(ANGLES[0], ANGLES[1] + 1, n)
+    powers = rng.integers(round(POWERS[0] * 10), round(POWERS[1] * 10) + 1, n) / 10
+    return angles, powers
+
+def play_games(model, games, ball_type, rng, policy="random", balls=BALLS):
+    # Turn the number of the shot that cleared each game, 0 if none did.
+    # Shots are played one after another, each once the last has landed.
+    # "greedy" picks the coarse-grid shot that destroys the most blocks, the
+    # grid shifted by a random offset per game and turn so games differ.
+    hp = np.tile(model.hp, (games, 1))
+    cleared = np.zeros(games, dtype=np.int32)
+    grid = np.array(shot_grid(*ANGLES, COARSE_ANGLE_STEP, *POWERS, COARSE_POWER_STEP))
+    k = len(grid)
+    shots = 0
+    for turn in range(1, balls + 1):
+        playing = np.flatnonzero(cleared == 0)
+        if not len(playing):
+            break
+        state = hp[playing]
+        if policy == "random":
+            angles, powers = random_shots(rng, len(playing))
+            hp[playing] = simulate_shots(model, state, angles, powers, ball_type)
+            shots += len(playing)
+        else:
+            angle_shift = rng.integers(0, COARSE_ANGLE_STEP, len(playing))
+            power_shift = rng.integers(0, round(COARSE_POWER_STEP * 10), len(playing)) / 10
+            angles = np.minimum(np.tile(grid[:, 0], len(playing)) + np.repeat(angle_shift, k), ANGLES[1])
+            powers = np.minimum(np.tile(grid[:, 1], len(playing)) + np.repeat(power_shift, k), POWERS[1])
+            tried = simulate_shots(model, np.repeat(state, k, axis=0), angles, powers, ball_type)
+            score = destroyed(np.repeat(state, k, axis=0), tried).reshape(len(playing), k)
+            best = score.argmax(axis=1)
+            hp[playing] = tried[np.arange(len(playing)) * k + best]
+            shots += len(playing) * k
+        cleared[playing[(hp[playing] > 0).sum(axis=1) == 0]] = turn
+    return cleared, shots
+
+def stage_ball_type(stage):
+    # Same rule as Simulation.__init__
+    return BALL_TYPES.index(("normal", "bomb", "pierce")[stage % 3])
+
+def estimate(stage, seed, ball_type=None, shots=20000, games=200, greedy_games=32, rng=None):
+    # Difficulty report for one generated stage
+    rng = rng if rng is not None else np.random.default_rng(seed)
+    sim = Simulation(stage=stage, seed=seed)
+    model = StageModel(sim)
+    ball_type = stage_ball_type(stage) if ball_type is None else ball_type
+    start = time.perf_counter()
+    angles, powers = random_shots(rng, shots)
+    fresh = np.tile(model.hp, (shots, 1))
+    per_shot = destroyed(fresh, simulate_shots(model, fresh, angles, powers, ball_type))
+    random_cleared, random_shots_run = play_games(model, games, ball_type, rng, "random")
+    greedy_cleared, greedy_shots_run = play_games(model, greedy_games, ball_type, rng, "greedy", MAX_BALLS)
+    elapsed = time.perf_counter() - start
+    needed = np.where(greedy_cleared > 0, greedy_cleared, MAX_BALLS + 1)
+    return {
+        "stage": stage, "seed": seed, "blocks": model.count, "ball": BALL_TYPES[ball_type],
+        "blocks_per_shot": float(per_shot.mean()),
+        "best_random_shot": int(per_shot.max()),
+        "clear_random": float(np.mean((random_cleared > 0) & (random_cleared <= BALLS))),
+        "clear_greedy": float(np.mean((greedy_cleared > 0) & (greedy_cleared <= BALLS))),
+        "greedy_balls_p50": float(np.percentile(needed, 50)),
+        "greedy_balls_p90": float(np.percentile(needed, 90)),
+        "shots": shots + random_shots_run + greedy_shots_run,
+        "seconds": elapsed,
+    }
+
+def verify(stage, seed, ball_type, n, rng):
+    # Shots out of n random lone ones that destroy a different number of
+    # blocks here than in a real Simulation, where knocked-out supports let
+    # the blocks above fall and break
+    sim = Simulation(stage=stage, seed=seed)
+    model = StageModel(sim)
+    angles, powers = random_shots(rng, n)
+    fresh = np.tile(model.hp, (n, 1))
+    batch = destroyed(fresh, simulate_shots(model, fresh, angles, powers, ball_type))
+    mismatches = 0
+    for s in range(n):
+        one = Simulation(stage=stage, seed=seed)
+        before = len(one.blocks)
+        one.balls.spawn(one.launcher.x, one.launcher.y, int(angles[s]), float(powers[s]), ball_type, RADIUS)
+        frames = 0
+        while (len(one.balls) or one.blocks.awake_count) and frames < MAX_TICKS:
+            one.update_balls()
+            one.settle_blocks()
+            one.balls.compact()
+            frames += 1
+        if before - len(one.blocks) != batch[s]: mismatches += 1
+    return mismatches
+
+def parse_stages(text):
+    # "12", "0,5,10" or "0:100:10" (end exclusive)
+    if ":" in text:
+        return list(range(*(int(part) for part in text.split(":"))))
+    return [int(part) for part in text.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate how hard generated stages are by simulating random and greedy shots")
+    parser.add_argument("--stages", default="0:60:6", help='0-based stages: "12", "0,5,10" or "0:100:10"')
+    parser.add_argument("--seeds", type=int, default=3, help="layouts per stage (seeds 0..N-1)")
+    parser.add_argument("--ball", choices=["stage"] + BALL_TYPES, default="stage", help="ball type; by default the stage's own")
+    parser.add_argument("--shots", type=int, default=20000, help="random lone shots per layout")
+    parser.add_argument("--games", type=int, default=200, help="random-policy games per layout")
+    parser.add_argument("--greedy-games", type=int, default=32)
+    parser.add_argument("--verify", type=int, default=0, metavar="N", help="also count how many of N lone shots per layout differ from Simulation")
+    parser.add_argument("--json", metavar="PATH", help="write every layout's report to PATH")
+    args = parser.parse_args()
+
+    ball_type = None if args.ball == "stage" else BALL_TYPES.index(args.ball)
+    reports = []
+    print(f"{'stage':>5} {'blocks':>6} {'ball':>6} {'blk/shot':>8} {'best':>5} {'P(rand)':>8} {'P(greedy)':>9} "
+          f"{'balls p50':>9} {'p90':>5} {'kshots/s':>8}")
+    for stage in parse_stages(args.stages):
+        layouts = [estimate(stage, seed, ball_type, args.shots, args.games, args.greedy_games) for seed in range(args.seeds)]
+        reports.extend(layouts)
+        mean = {key: float(np.mean([r[key] for r in layouts])) for key in
+                ("blocks", "blocks_per_shot", "best_random_shot", "clear_random", "clear_greedy", "greedy_balls_p50", "greedy_balls_p90")}
+        rate = sum(r["shots"] for r in layouts) / sum(r["seconds"] for r in layouts) / 1000
+        print(f"{stage + 1:>5} {mean['blocks']:>6.0f} {layouts[0]['ball']:>6} {mean['blocks_per_shot']:>8.2f} {mean['best_random_shot']:>5.0f} "
+              f"{mean['clear_random']:>8.1%} {mean['clear_greedy']:>9.1%} {mean['greedy_balls_p50']:>9.1f} {mean['greedy_balls_p90']:>5.1f} {rate:>8.0f}")
+        if args.verify:
+            rng = np.random.default_rng(stage)
+            for seed in range(args.seeds):
+                bt = stage_ball_type(stage) if ball_type is None else ball_type
+                mismatches = verify(stage, seed, bt, args.verify, rng)
+                if mismatches: print(f"      seed {seed}: {mismatches}/{args.verify} shots differ from Simulation")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=1)
+
+if __name__ == "__main__":
+    main()
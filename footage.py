@@ -0,0 +1,214 @@
+# Renders recorded sessions to PNG frames or a GIF without a window. Each
+# stage is replayed through the game's own update and draw code with
+# framebuffer.py standing in for pyxel, so footage shows exactly what the
+# player saw. Frames are split into contiguous ranges across worker
+# processes; a worker replays its stage up to the start of its range without
+# drawing, which costs a small fraction of drawing it.
+import argparse
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+import framebuffer
+sys.modules["pyxel"] = framebuffer # Everything imported from here on draws into the software screen
+
+from demolisher import App, GameState
+from replay import load_session
+from timestep import TICK_RATE
+
+HOLD_FRAMES = TICK_RATE * 3 // 2 # The stage clear or game over screen stays up this long
+
+def open_stage(recording):
+    app = App(seed=0, leaderboard_path=":memory:")
+    app.game_state = GameState.RUNNING
+    app.replay_queue = [recording]
+    app.reset_game()
+    return app
+
+def split_frames(counts, start, end, parts):
+    # Cuts the session's frames [start, end) into about `parts` runs of equal
+    # length, none crossing from one stage into the next. Each run is
+    # (recording index, first frame, end frame, frame number in the session).
+    total = end - start
+    jobs = []
+    offset = 0
+    for index, count in enumerate(counts):
+        lo, hi = max(start, offset), min(end, offset + count)
+        if lo < hi:
+            pieces = max(1, round(parts * (hi - lo) / total))
+            cuts = [lo + (hi - lo) * k // pieces for k in range(pieces + 1)]
+            jobs.extend((index, a - offset, b - offset, a) for a, b in zip(cuts, cuts[1:]) if a < b)
+        offset += count
+    return jobs
+
+def render_frames(recording, first, last):
+    # Yields the screen for frames [first, last) of one stage
+    app = open_stage(recording)
+    for frame in range(last):
+        # Past the end of the recording the final screen is simply drawn again
+        if app.game_state == GameState.RUNNING and not app.replayer.done(): app.tick()
+        if frame >= first:
+            framebuffer.frame_count = frame
+            app.draw()
+            yield framebuffer.screen.data
+    app.leaderboard.close()
+
+def scaled(frame, scale):
+    return frame if scale == 1 else frame.repeat(scale, 0).repeat(scale, 1)
+
+def png_bytes(frame):
+    # 8-bit palette PNG, one filter byte per row
+    def chunk(kind, data):
+        return len(data).to_bytes(4, "big") + kind + data + zlib.crc32(kind + data).to_bytes(4, "big")
+    height, width = frame.shape
+    raw = np.zeros((height, width + 1), np.uint8)
+    raw[:, 1:] = frame
+    header = width.to_bytes(4, "big") + height.to_bytes(4, "big") + bytes([8, 3, 0, 0, 0])
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"PLTE", framebuffer.rgb_palette().tobytes())
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b""))
+
+def lzw(pixels, min_code_size):
+    # GIF's variable-width LZW, codes packed LSB first; a clear code resets
+    # the table whenever it fills
+    clear, end = 1 << min_code_size, (1 << min_code_size) + 1
+    out = bytearray()
+    table = {}
+    next_code = end + 1
+    width = min_code_size + 1
+    bits, nbits = clear, width # Starts with a clear code
+    prefix = pixels[0]
+    for pixel in pixels[1:]:
+        key = prefix << 8 | pixel
+        code = table.get(key)
+        if code is not None:
+            prefix = code
+            continue
+        bits |= prefix << nbits
+        nbits += width
+        while nbits >= 8:
+            out.append(bits & 0xFF)
+            bits >>= 8
+            nbits -= 8
+        if next_code == 4096:
+            bits |= clear << nbits
+            nbits += width
+            table.clear()
+            next_code = end + 1
+            width = min_code_size + 1
+        else:
+            table[key] = next_code
+            if next_code == 1 << width: width += 1
+            next_code += 1
+        prefix = pixel
+    for code in (prefix, end):
+        bits |= code << nbits
+        nbits += width
+        if code == prefix and next_code == 1 << width and width < 12: width += 1
+    while nbits > 0:
+        out.append(bits & 0xFF)
+        bits >>= 8
+        nbits -= 8
+    return bytes(out)
+
+def gif_frame(frame, previous, delay):
+    # Graphic control extension and image block for the part of `frame` that
+    # differs from `previous`; unchanged frames become a single pixel
+    if previous is None:
+        y0, x0, y1, x1 = 0, 0, frame.shape[0], frame.shape[1]
+    else:
+        changed = frame != previous
+        rows, cols = np.flatnonzero(changed.any(1)), np.flatnonzero(changed.any(0))
+        if len(rows):
+            y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        else:
+            y0, x0, y1, x1 = 0, 0, 1, 1
+    data = lzw(frame[y0:y1, x0:x1].tobytes(), 4)
+    out = bytearray(b"\x21\xf9\x04\x04" + delay.to_bytes(2, "little") + b"\x00\x00")
+    out += b"\x2c" + b"".join(int(v).to_bytes(2, "little") for v in (x0, y0, x1 - x0, y1 - y0)) + b"\x00\x04"
+    for i in range(0, len(data), 255):
+        block = data[i:i + 255]
+        out.append(len(block))
+        out += block
+    out.append(0)
+    return bytes(out)
+
+def gif_delay(index):
+    # Centiseconds, spread so the average lands on the tick rate
+    return round(100 * (index + 1) / TICK_RATE) - round(100 * index / TICK_RATE)
+
+def render_job(path, job, scale, png_dir, gif):
+    # Worker: renders one run of frames. PNGs are written here; GIF frames
+    # come back encoded, the first one in full since the worker has no
+    # previous frame to diff against
+    index, first, last, number = job
+    recording = load_session(path)[index]
+    blocks = []
+    previous = None
+    for frame in render_frames(recording, first, last):
+        image = scaled(frame, scale)
+        if png_dir:
+            with open(os.path.join(png_dir, f"frame_{number:06d}.png"), "wb") as f:
+                f.write(png_bytes(image))
+        if gif:
+            blocks.append(gif_frame(image, previous, gif_delay(number)))
+            previous = image.copy()
+        number += 1
+    return blocks
+
+def gif_header(width, height):
+    # Global 16-color table, looping forever
+    return (b"GIF89a" + width.to_bytes(2, "little") + height.to_bytes(2, "little") + b"\xf3\x00\x00"
+            + framebuffer.rgb_palette().tobytes() + b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+def render(path, png_dir=None, gif_path=None, frames=None, workers=None, scale=1, hold=HOLD_FRAMES):
+    recordings = load_session(path)
+    counts = [recording.frames + hold for recording in recordings]
+    total = sum(counts)
+    start, end = frames if frames else (0, total)
+    start, end = max(0, start), min(total, end)
+    if start >= end: raise ValueError(f"no frames in {start}:{end}; the session has {total}")
+    workers = workers or os.cpu_count() or 1
+    jobs = split_frames(counts, start, end, workers)
+    if png_dir: os.makedirs(png_dir, exist_ok=True)
+    task = partial(render_job, path, scale=scale, png_dir=png_dir, gif=gif_path is not None)
+    if workers == 1:
+        results = [task(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            results = list(executor.map(task, jobs))
+    if gif_path:
+        width, height = recordings[0].width * scale, recordings[0].height * scale
+        with open(gif_path, "wb") as f:
+            f.write(gif_header(width, height))
+            for blocks in results:
+                f.writelines(blocks)
+            f.write(b"\x3b")
+    return end - start
+
+def parse_frames(text):
+    start, _, end = text.partition(":")
+    return int(start or 0), int(end) if end else sys.maxsize
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a session recorded with demolisher.py --record to PNG frames or a GIF")
+    parser.add_argument("session")
+    parser.add_argument("--png", metavar="DIR", help="write frame_NNNNNN.png files to DIR")
+    parser.add_argument("--gif", metavar="PATH", help="write an animated GIF to PATH")
+    parser.add_argument("--frames", metavar="START:END", type=parse_frames, help="only this range of the session's frames")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--scale", type=int, default=1, help="enlarge each pixel to SCALE x SCALE")
+    parser.add_argument("--hold", type=int, default=HOLD_FRAMES, help="frames the end-of-stage screen is shown for")
+    args = parser.parse_args()
+    if not args.png and not args.gif: parser.error("give --png DIR and/or --gif PATH")
+    start = time.perf_counter()
+    n = render(args.session, args.png, args.gif, args.frames, args.workers, args.scale, args.hold)
+    elapsed = time.perf_counter() - start
+    print(f"{n} frames in {elapsed:.2f}s: {n / elapsed:.0f} frames/s, {n / elapsed / TICK_RATE:.1f}x real time")
+
+if __name__ == "__main__":
+    main()
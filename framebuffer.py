@@ -0,0 +1,256 @@
+# Software stand-in for the part of pyxel the game draws with, rasterizing
+# into NumPy palette-index arrays instead of a window. Coordinates, rects,
+# circles, lines, triangles and the built-in font come out pixel for pixel as
+# pyxel draws them (benchmarks/bench_footage.py checks this against pyxel).
+# Install it as the pyxel module before the game is imported to render
+# without a display; input reads as nothing held and audio is silent.
+import math
+
+import numpy as np
+
+# pyxel's default palette, as 0xRRGGBB
+PALETTE = [0x000000, 0x2B335F, 0x7E2072, 0x19959C, 0x8B4852, 0x395C98, 0xA9C1FF, 0xEEEEEE,
+           0xD4186C, 0xD38441, 0xE9C35B, 0x70C6A9, 0x7696DE, 0xA3A3A3, 0xFF9798, 0xEDC7B0]
+FONT_WIDTH = 4 # Advance per character; glyphs are 3 wide
+FONT_HEIGHT = 6
+# ASCII 32-126, one hex digit per row from the top, bit 0 the leftmost pixel
+FONT_ROWS = ("000000 222020 550000 575750 636320 142140 252530 220000 422240 122210 527250 027200 000210 007000 000020 442110 "
+             "655530 232220 342170 342430 557440 713430 617570 742110 757570 757430 020200 020210 421240 070700 124210 742020 "
+             "255160 257550 353530 611160 355530 717170 717110 617560 557550 722270 444520 553550 111170 577550 355550 255520 "
+             "353110 255760 357350 612430 722220 555560 555520 557750 552550 552220 742170 622260 112440 322230 250000 000070 "
+             "120000 065560 135530 061160 465560 065360 427220 065742 135550 202220 404452 153350 322270 077750 035550 025520 "
+             "035531 065564 061110 063630 272260 055560 055520 055770 052250 055642 074270 623260 222220 326230 630000").split()
+
+def to_int(value):
+    # pyxel rounds halves away from zero
+    return int(math.floor(abs(value) + 0.5)) * (1 if value >= 0 else -1)
+
+def glyph_mask(rows):
+    return np.array([[int(digit, 16) >> col & 1 for col in range(FONT_WIDTH - 1)] for digit in rows], bool)
+
+GLYPHS = {chr(32 + i): glyph_mask(rows) for i, rows in enumerate(FONT_ROWS)}
+circle_masks = {}
+
+def circle_mask(radius):
+    # A pixel is in if it is inside the rounded half-width of its row or its column
+    mask = circle_masks.get(radius)
+    if mask is None:
+        d = np.arange(-radius, radius + 1)
+        half = np.floor(np.sqrt(radius * radius - d * d) + 0.5).astype(int)
+        mask = (np.abs(d)[None, :] <= half[:, None]) | (np.abs(d)[:, None] <= half[None, :])
+        circle_masks[radius] = mask
+    return mask
+
+class Image:
+    # pyxel.Image's drawing methods over a (height, width) uint8 array
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.data = np.zeros((height, width), np.uint8)
+        self.camera_x = self.camera_y = 0
+
+    def camera(self, x=0, y=0):
+        self.camera_x, self.camera_y = to_int(x), to_int(y)
+
+    def cls(self, col):
+        self.data.fill(col)
+
+    def pget(self, x, y):
+        x, y = to_int(x), to_int(y)
+        return int(self.data[y, x]) if 0 <= x < self.width and 0 <= y < self.height else 0
+
+    def pset(self, x, y, col):
+        x, y = to_int(x) - self.camera_x, to_int(y) - self.camera_y
+        if 0 <= x < self.width and 0 <= y < self.height: self.data[y, x] = col
+
+    def fill_rect(self, x, y, w, h, col):
+        # Integer screen coordinates, clipped to the image
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x0 < x1 and y0 < y1: self.data[y0:y1, x0:x1] = col
+
+    def rect(self, x, y, w, h, col):
+        w, h = to_int(w), to_int(h)
+        if w > 0 and h > 0: self.fill_rect(to_int(x) - self.camera_x, to_int(y) - self.camera_y, w, h, col)
+
+    def rectb(self, x, y, w, h, col):
+        w, h = to_int(w), to_int(h)
+        if w <= 0 or h <= 0: return
+        x, y = to_int(x) - self.camera_x, to_int(y) - self.camera_y
+        self.fill_rect(x, y, w, 1, col)
+        self.fill_rect(x, y + h - 1, w, 1, col)
+        self.fill_rect(x, y, 1, h, col)
+        self.fill_rect(x + w - 1, y, 1, h, col)
+
+    def blit_mask(self, x, y, mask, col):
+        # Sets the pixels under a boolean mask whose top left lands at (x, y)
+        h, w = mask.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.width), min(y + h, self.height)
+        if x0 < x1 and y0 < y1:
+            self.data[y0:y1, x0:x1][mask[y0 - y:y1 - y, x0 - x:x1 - x]] = col
+
+    def circ(self, x, y, r, col):
+        r = to_int(r)
+        self.blit_mask(to_int(x) - self.camera_x - r, to_int(y) - self.camera_y - r, circle_mask(r), col)
+
+    def line(self, x1, y1, x2, y2, col):
+        x1, y1 = to_int(x1) - self.camera_x, to_int(y1) - self.camera_y
+        x2, y2 = to_int(x2) - self.camera_x, to_int(y2) - self.camera_y
+        if x1 == x2 and y1 == y2:
+            if 0 <= x1 < self.width and 0 <= y1 < self.height: self.data[y1, x1] = col
+            return
+        # One pixel per step along the longer axis, the other rounded off a slope
+        if abs(x2 - x1) > abs(y2 - y1):
+            if x1 > x2: x1, y1, x2, y2 = x2, y2, x1, y1
+            steps = np.arange(x2 - x1 + 1, dtype=np.float32)
+            xs = x1 + steps.astype(int)
+            ys = y1 + round_array(steps * np.float32((y2 - y1) / (x2 - x1)))
+        else:
+            if y1 > y2: x1, y1, x2, y2 = x2, y2, x1, y1
+            steps = np.arange(y2 - y1 + 1, dtype=np.float32)
+            ys = y1 + steps.astype(int)
+            xs = x1 + round_array(steps * np.float32((x2 - x1) / (y2 - y1)))
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        self.data[ys[inside], xs[inside]] = col
+
+    def tri(self, x1, y1, x2, y2, x3, y3, col):
+        x1, y1 = to_int(x1) - self.camera_x, to_int(y1) - self.camera_y
+        x2, y2 = to_int(x2) - self.camera_x, to_int(y2) - self.camera_y
+        x3, y3 = to_int(x3) - self.camera_x, to_int(y3) - self.camera_y
+        # pyxel sorts by y with these swaps, so ties keep their order
+        if y1 > y2: x1, y1, x2, y2 = x2, y2, x1, y1
+        if y1 > y3: x1, y1, x3, y3 = x3, y3, x1, y1
+        if y2 > y3: x2, y2, x3, y3 = x3, y3, x2, y2
+        if y1 == y3:
+            if 0 <= y1 < self.height: self.hline(min(x1, x2, x3), max(x1, x2, x3), y1, col)
+            return
+        ys = np.arange(max(y1, 0), min(y3, self.height - 1) + 1)
+        if len(ys) == 0: return
+        # The long edge (1-3) restarts from its x on the middle row, rounded,
+        # and both halves step out from that row in float32. Which edge is the
+        # left one is fixed by the middle row, so rows where they cross are empty.
+        beta = slope(x3 - x1, y3 - y1)
+        x_inter = to_int(np.float32(x1) + beta * np.float32(y2 - y1))
+        dy = (ys - y2).astype(np.float32)
+        short_x = round_array((np.float32(x2) + np.where(ys <= y2, slope(x2 - x1, y2 - y1), slope(x3 - x2, y3 - y2)) * dy).astype(np.float64))
+        long_x = round_array((np.float32(x_inter) + beta * dy).astype(np.float64))
+        left, right = (short_x, long_x) if x2 <= x_inter else (long_x, short_x)
+        for y, l, r in zip(ys.tolist(), left.tolist(), right.tolist()):
+            self.hline(l, r, y, col)
+
+    def hline(self, x0, x1, y, col):
+        x0, x1 = max(x0, 0), min(x1, self.width - 1)
+        if x0 <= x1: self.data[y, x0:x1 + 1] = col
+
+    def text(self, x, y, s, col):
+        x, y = to_int(x) - self.camera_x, to_int(y) - self.camera_y
+        left = x
+        for ch in s:
+            if ch == "\n":
+                x = left
+                y += FONT_HEIGHT
+                continue
+            glyph = GLYPHS.get(ch)
+            if glyph is not None: self.blit_mask(x, y, glyph, col)
+            x += FONT_WIDTH
+
+    def blt(self, x, y, img, u, v, w, h, colkey=None):
+        x, y = to_int(x) - self.camera_x, to_int(y) - self.camera_y
+        u, v, w, h = to_int(u), to_int(v), to_int(w), to_int(h)
+        # Clip the destination to this image and the source to img together
+        x0, y0 = max(x, 0, x - u), max(y, 0, y - v)
+        x1, y1 = min(x + w, self.width, x - u + img.width), min(y + h, self.height, y - v + img.height)
+        if x0 >= x1 or y0 >= y1: return
+        src = img.data[y0 - y + v:y1 - y + v, x0 - x + u:x1 - x + u]
+        dst = self.data[y0:y1, x0:x1]
+        if colkey is None:
+            dst[:] = src
+        else:
+            np.copyto(dst, src, where=src != colkey)
+
+def slope(dx, dy):
+    return np.float32(dx) / np.float32(dy) if dy else np.float32(0) # Divided in float32, as pyxel does
+
+def round_array(values):
+    # to_int for arrays
+    return (np.sign(values) * np.floor(np.abs(values) + np.float32(0.5))).astype(int)
+
+def rgb_palette():
+    # (16, 3) uint8, for turning frames into images
+    return np.array([[c >> 16, c >> 8 & 0xFF, c & 0xFF] for c in PALETTE], np.uint8)
+
+# Module-level API mirroring pyxel's, all drawing to `screen`
+width = height = 0
+frame_count = 0
+screen = None
+images = []
+
+KEY_LEFT, KEY_RIGHT, KEY_UP, KEY_DOWN, KEY_SPACE, KEY_RETURN, KEY_F, KEY_P, KEY_ESCAPE, KEY_H = range(10)
+
+class Silent:
+    def set(self, *args, **kwargs):
+        pass
+
+sounds = [Silent() for _ in range(64)]
+musics = [Silent() for _ in range(8)]
+
+def init(w, h, **kwargs):
+    global width, height, screen, images
+    width, height = w, h
+    screen = Image(w, h)
+    images = [Image(256, 256) for _ in range(3)]
+
+def run(update, draw):
+    pass # The caller drives update and draw
+
+def btn(key):
+    return False
+
+def btnp(key, hold=None, repeat=None):
+    return False
+
+def play(*args, **kwargs):
+    pass
+
+def playm(*args, **kwargs):
+    pass
+
+def stop(*args, **kwargs):
+    pass
+
+def load(*args, **kwargs):
+    pass
+
+def camera(x=0, y=0):
+    screen.camera(x, y)
+
+def cls(col):
+    screen.cls(col)
+
+def pget(x, y):
+    return screen.pget(x, y)
+
+def pset(x, y, col):
+    screen.pset(x, y, col)
+
+def rect(x, y, w, h, col):
+    screen.rect(x, y, w, h, col)
+
+def rectb(x, y, w, h, col):
+    screen.rectb(x, y, w, h, col)
+
+def circ(x, y, r, col):
+    screen.circ(x, y, r, col)
+
+def line(x1, y1, x2, y2, col):
+    screen.line(x1, y1, x2, y2, col)
+
+def tri(x1, y1, x2, y2, x3, y3, col):
+    screen.tri(x1, y1, x2, y2, x3, y3, col)
+
+def text(x, y, s, col):
+    screen.text(x, y, s, col)
+
+def blt(x, y, img, u, v, w, h, colkey=None):
+    screen.blt(x, y, img, u, v, w, h, colkey)
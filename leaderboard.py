@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    id INTEGER PRIMARY KEY,
+    score INTEGER NOT NULL,
+    stage INTEGER,
+    launcher_style TEXT,
+    ball_style TEXT,
+    created REAL NOT NULL,
+    uploaded INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_style ON scores (launcher_style, ball_style, score DESC);
+CREATE INDEX IF NOT EXISTS scores_by_stage ON scores (stage, score DESC);
+CREATE INDEX IF NOT EXISTS scores_to_upload ON scores (uploaded, id);
+"""
+COLUMNS = "id, score, stage, launcher_style, ball_style, created"
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=5)
+    conn.execute("PRAGMA journal_mode=WAL") # Readers never wait on the writer
+    conn.execute("PRAGMA synchronous=NORMAL") # A crash can lose the last commit at worst, never corrupt the file
+    conn.executescript(SCHEMA)
+    return conn
+
+class HttpSink:
+    # Posts batches of score records as a JSON list. Any failure raises, and
+    # the Leaderboard keeps the records to retry later.
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def upload(self, records):
+        import urllib.request # Deferred like everything HTTP here: it costs ~25 ms of game startup
+        body = json.dumps(records).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise OSError(f"upload failed with HTTP {response.status}")
+
+class Leaderboard:
+    # SQLite-backed score table. submit() only queues the record; a writer
+    # thread commits whatever has queued up as one transaction, then hands
+    # records not yet uploaded to the sink, retrying with backoff. Reads go
+    # through a separate connection opened on first use.
+    def __init__(self, path="leaderboard.db", sink=None, batch_size=64, upload_batch=20, retry_delay=1.0, max_retry_delay=60.0,
+                 legacy_highscore_path="highscore.txt", writer=True):
+        self.path = path
+        self.sink = sink
+        self.batch_size = batch_size
+        self.upload_batch = upload_batch
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.legacy_highscore_path = legacy_highscore_path
+        self.queue = queue.Queue()
+        self.reader = None
+        self.writer = None
+        if writer: # Without one the board is read-only: nothing is imported, written or uploaded
+            self.import_legacy() # Before any read, so the first best() already counts it
+            self.writer = threading.Thread(target=self.run_writer, name="leaderboard-writer", daemon=True)
+            self.writer.start()
+
+    def submit(self, score, stage, launcher_style, ball_style):
+        self.queue.put((score, stage, launcher_style, ball_style, time.time()))
+
+    def run_writer(self):
+        conn = connect(self.path)
+        delay = self.retry_delay
+        next_upload = time.monotonic() if self.sink else None # None while there is nothing to upload
+        running = True
+        while running:
+            timeout = None if next_upload is None else max(0.0, next_upload - time.monotonic())
+            try:
+                batch = [self.queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [record for record in batch if record is not None]
+            running = len(records) == len(batch)
+            if records:
+                with conn: # One transaction: all of the batch or none of it
+                    conn.executemany("INSERT INTO scores (score, stage, launcher_style, ball_style, created) VALUES (?, ?, ?, ?, ?)", records)
+                if self.sink and next_upload is None:
+                    next_upload = time.monotonic()
+            for _ in batch:
+                self.queue.task_done()
+            if next_upload is not None and time.monotonic() >= next_upload:
+                if self.upload_pending(conn):
+                    delay = self.retry_delay
+                    next_upload = None
+                else:
+                    next_upload = time.monotonic() + delay * random.uniform(0.5, 1.0)
+                    delay = min(delay * 2, self.max_retry_delay)
+        if self.sink:
+            self.upload_pending(conn) # Last try; whatever fails is retried next session
+        conn.close()
+
+    def upload_pending(self, conn):
+        # True once nothing is left to upload, False if the sink failed
+        while True:
+            rows = conn.execute(f"SELECT {COLUMNS} FROM scores WHERE uploaded = 0 ORDER BY id LIMIT ?", (self.upload_batch,)).fetchall()
+            if not rows:
+                return True
+            try:
+                self.sink.upload([self.record(row) for row in rows])
+            except Exception as e:
+                print(f"leaderboard upload failed: {e}", file=sys.stderr)
+                return False
+            with conn:
+                conn.executemany("UPDATE scores SET uploaded = 1 WHERE id = ?", [(row[0],) for row in rows])
+
+    def import_legacy(self):
+        # Carries a score from the old single-integer highscore file over once.
+        # The table is only opened when there is such a file.
+        if not self.legacy_highscore_path:
+            return
+        try:
+            with open(self.legacy_highscore_path) as f:
+                score = int(f.read())
+        except (FileNotFoundError, ValueError):
+            return
+        conn = connect(self.path)
+        try:
+            if not conn.execute("SELECT 1 FROM scores LIMIT 1").fetchone():
+                with conn:
+                    conn.execute("INSERT INTO scores (score, created) VALUES (?, ?)", (score, os.path.getmtime(self.legacy_highscore_path)))
+        finally:
+            conn.close()
+
+    def record(self, row):
+        return dict(zip(("id", "score", "stage", "launcher_style", "ball_style", "created"), row))
+
+    def read(self, sql, params=()):
+        if self.reader is None:
+            self.reader = connect(self.path)
+        return [self.record(row) for row in self.reader.execute(sql, params).fetchall()]
+
+    def top(self, n=10):
+        return self.read(f"SELECT {COLUMNS} FROM scores ORDER BY score DESC LIMIT ?", (n,))
+
+    def top_for_style(self, launcher_style, ball_style, n=10):
+        return self.read(f"SELECT {COLUMNS} FROM scores WHERE launcher_style = ? AND ball_style = ? ORDER BY score DESC LIMIT ?",
+                         (launcher_style, ball_style, n))
+
+    def top_for_stage(self, stage, n=10):
+        return self.read(f"SELECT {COLUMNS} FROM scores WHERE stage = ? ORDER BY score DESC LIMIT ?", (stage, n))
+
+    def best(self):
+        rows = self.top(1)
+        return rows[0]["score"] if rows else 0
+
+    def flush(self, timeout=5.0):
+        # Waits until everything submitted so far is committed
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self, timeout=5.0):
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join(timeout)
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+def serve(port, fail_rate):
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        # Local stand-in for a score server: accepts POSTed JSON lists, keeps
+        # them in memory, and fails a share of requests to exercise retries
+        received = []
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if random.random() < fail_rate:
+                self.send_response(503)
+                self.end_headers()
+                return
+            records = json.loads(body)
+            self.received.extend(records)
+            print(f"received {len(records)} scores, {len(self.received)} total")
+            self.send_response(204)
+            self.end_headers()
+
+        def do_GET(self):
+            body = json.dumps(self.received).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", port), StandInHandler)
+    print(f"score stand-in listening on http://127.0.0.1:{port}/")
+    server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Pyxel Demolisher leaderboard")
+    commands = parser.add_subparsers(dest="command", required=True)
+    top = commands.add_parser("top", help="print the best scores")
+    top.add_argument("--db", default="leaderboard.db")
+    top.add_argument("-n", type=int, default=10)
+    top.add_argument("--stage", type=int, help="only scores that ended on this stage (1-based)")
+    top.add_argument("--style", nargs=2, metavar=("LAUNCHER", "BALL"), help="only scores with this launcher and ball style")
+    stand_in = commands.add_parser("serve", help="run a local stand-in upload server")
+    stand_in.add_argument("--port", type=int, default=8765)
+    stand_in.add_argument("--fail-rate", type=float, default=0.0, help="share of uploads answered with 503")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port, args.fail_rate)
+        return
+    board = Leaderboard(args.db, writer=False)
+    if args.stage is not None:
+        rows = board.top_for_stage(args.stage, args.n)
+    elif args.style:
+        rows = board.top_for_style(*args.style, args.n)
+    else:
+        rows = board.top(args.n)
+    for rank, row in enumerate(rows, 1):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created"]))
+        print(f"{rank:>3}. {row['score']:>8}  stage {row['stage'] or '-':>4}  {row['launcher_style'] or '-':<9} {row['ball_style'] or '-':<9} {when}")
+    board.close()
+
+if __name__ == "__main__":
+    main()
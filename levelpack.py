@@ -0,0 +1,177 @@
+# Pre-generated or hand-made stages in one binary file:
+#
+#   header   magic, version, stage count, index offset, block type count
+#   records  each stage's blocks back to back, RECORD.itemsize bytes each
+#   index    stage count + 1 uint64 offsets; stage n is [index[n], index[n + 1])
+#   types    the block type names records refer to, as u8 length + UTF-8
+#
+# The index and type table go at the end so a writer can stream stages out
+# without knowing how many there will be. Readers mmap the file and only
+# touch the header, two index entries and the stage's own records, so
+# loading a stage costs the same in a pack of ten stages or ten million.
+import argparse
+import mmap
+import random
+import struct
+from array import array
+
+import numpy as np
+
+from blocks import BLOCK_TYPE_IDS, BLOCK_TYPES, stage_block_types
+from stagegen import CELL, generate_layout, stage_field
+
+MAGIC = b"DMLP"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xQQI")
+RECORD = np.dtype([("x", "<i2"), ("y", "<i2"), ("width", "u1"), ("height", "u1"), ("type", "u1"), ("hp", "u1")])
+OFFSET = struct.Struct("<Q")
+
+def stage_records(blocks):
+    # RECORD array from (x, y, width, height, type name, hp) tuples, with the
+    # type as its type_id
+    rows = [(x, y, w, h, BLOCK_TYPE_IDS[name], hp) for x, y, w, h, name, hp in blocks]
+    values = np.array(rows, np.int64).reshape(-1, 6)
+    limits = [(-32768, 32767), (-32768, 32767), (1, 255), (1, 255), (0, 255), (1, 255)]
+    for column, (lo, hi) in zip(values.T, limits):
+        if len(column) and (column.min() < lo or column.max() > hi):
+            raise ValueError(f"block value out of range {lo}..{hi} for a level pack record")
+    records = np.empty(len(values), RECORD)
+    for column, name in zip(values.T, RECORD.names):
+        records[name] = column
+    return records
+
+def generated_stage(stage, layout_seed, width=200, height=150):
+    # The blocks Simulation.generate_random_blocks places for this layout seed
+    ground_y = height - 5 # As Simulation has it
+    left, right, top, count = stage_field(stage, width, height, ground_y)
+    return [(x, y, CELL, CELL, name, BLOCK_TYPES[BLOCK_TYPE_IDS[name]].hp)
+            for x, y, name in generate_layout(count, layout_seed, left, right, top, ground_y, stage_block_types(stage))]
+
+class LevelPackWriter:
+    # Appends stages to a new pack; close() writes the index and type table
+    # and fills in the header
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0))
+        self.offsets = array("Q", [HEADER.size])
+        self.type_names = [] # Pack type index -> name
+        self.pack_types = {} # type_id -> pack type index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def add_stage(self, blocks):
+        # `blocks` is a RECORD array with type_ids, or (x, y, width, height,
+        # type name, hp) tuples
+        records = blocks if isinstance(blocks, np.ndarray) else stage_records(blocks)
+        for type_id in np.unique(records["type"]).tolist():
+            if type_id not in self.pack_types:
+                self.pack_types[type_id] = len(self.type_names)
+                self.type_names.append(BLOCK_TYPES[type_id].name)
+        records = records.copy()
+        records["type"] = self.pack_type_table()[records["type"]]
+        self.file.write(records.tobytes())
+        self.offsets.append(self.offsets[-1] + records.nbytes)
+
+    def pack_type_table(self):
+        # type_id -> pack type index
+        table = np.zeros(max(self.pack_types, default=0) + 1, np.uint8)
+        table[list(self.pack_types)] = list(self.pack_types.values())
+        return table
+
+    def close(self):
+        if self.file.closed: return
+        index_offset = self.offsets[-1]
+        self.file.write(np.asarray(self.offsets).astype("<u8").tobytes())
+        for name in self.type_names:
+            raw = name.encode("utf-8")
+            self.file.write(bytes([len(raw)]) + raw)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(self), index_offset, len(self.type_names)))
+        self.file.close()
+
+class LevelPack:
+    # Read side, over an mmap of the whole file
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            self.map.close()
+            raise ValueError(f"{path} is not a level pack")
+        magic, version, self.count, self.index_offset, n_types = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION or self.index_offset == 0:
+            self.map.close()
+            raise ValueError(f"{path} is not a finished version {VERSION} level pack")
+        pos = self.index_offset + OFFSET.size * (self.count + 1)
+        type_ids = []
+        for _ in range(n_types):
+            n = self.map[pos]
+            name = self.map[pos + 1:pos + 1 + n].decode("utf-8")
+            pos += 1 + n
+            if name not in BLOCK_TYPE_IDS:
+                self.map.close()
+                raise ValueError(f"{path} uses block type {name!r}, which is not registered")
+            type_ids.append(BLOCK_TYPE_IDS[name])
+        self.type_ids = np.array(type_ids, np.uint8) # Pack type index -> type_id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def stage(self, n):
+        # Stage n's blocks as a RECORD array of their own, types as type_ids
+        if not 0 <= n < self.count: raise IndexError(f"stage {n} is not in {self.path} ({self.count} stages)")
+        start, = OFFSET.unpack_from(self.map, self.index_offset + OFFSET.size * n)
+        end, = OFFSET.unpack_from(self.map, self.index_offset + OFFSET.size * (n + 1))
+        records = np.frombuffer(self.map, RECORD, (end - start) // RECORD.itemsize, start).copy()
+        records["type"] = self.type_ids[records["type"]]
+        return records
+
+    def close(self):
+        self.map.close()
+
+def parse_range(text):
+    start, _, end = text.partition(":")
+    return (int(start or 0), int(end)) if end else (0, int(start))
+
+def main():
+    parser = argparse.ArgumentParser(description="Pyxel Demolisher level packs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="write generated stages to a new pack")
+    build.add_argument("path")
+    build.add_argument("--stages", type=parse_range, default=(0, 100), metavar="[START:]END",
+                       help="difficulty of the generated stages, one pack stage each (default 0:100)")
+    build.add_argument("--seed", type=int, default=0)
+    show = commands.add_parser("info", help="print a pack's size or one stage's blocks")
+    show.add_argument("path")
+    show.add_argument("--stage", type=int, help="list this stage's blocks (0-based)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        rng = random.Random(args.seed)
+        with LevelPackWriter(args.path) as writer:
+            for stage in range(*args.stages):
+                writer.add_stage(generated_stage(stage, rng.getrandbits(64)))
+        print(f"{len(writer)} stages written to {args.path}")
+        return
+    with LevelPack(args.path) as pack:
+        if args.stage is None:
+            print(f"{len(pack)} stages, {pack.map.size()} bytes, block types: {', '.join(BLOCK_TYPES[i].name for i in pack.type_ids)}")
+        else:
+            for x, y, w, h, type_id, hp in pack.stage(args.stage).tolist():
+                print(f"{x:>6} {y:>6} {w:>3}x{h:<3} {BLOCK_TYPES[type_id].name:<8} hp {hp}")
+
+if __name__ == "__main__":
+    main()
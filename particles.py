@@ -0,0 +1,85 @@
+import numpy as np
+
+class ParticlePool:
+    # Fixed-capacity structure-of-arrays particle store. Bursts are written
+    # into a ring buffer, so once the pool is full the oldest slots are reused.
+    def __init__(self, capacity=16384, gravity=0.05, rng=None):
+        self.capacity = capacity
+        self.gravity = gravity
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros(capacity, dtype=np.uint8)
+        self.life = np.zeros(capacity, dtype=np.int16)
+        self.head = 0 # Next slot to write
+        self.used = 0 # Slots ever written; nothing past this is alive
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def clear(self):
+        self.life[:] = 0
+        self.head = 0
+        self.used = 0
+
+    def emit(self, x, y, color, count=8, speed_min=0.5, speed_max=2.0, life=20):
+        count = min(count, self.capacity)
+        r = self.rng.random((2, count))
+        angle = r[0] * (2 * np.pi)
+        speed = speed_min + r[1] * (speed_max - speed_min)
+        end = self.head + count
+        if end <= self.capacity:
+            slots = slice(self.head, end)
+        else:
+            slots = np.arange(self.head, end) % self.capacity
+        self.x[slots] = x
+        self.y[slots] = y
+        self.vx[slots] = np.cos(angle) * speed
+        self.vy[slots] = np.sin(angle) * speed
+        self.color[slots] = color
+        self.life[slots] = life
+        self.head = (self.head + count) % self.capacity
+        self.used = min(self.capacity, self.used + count)
+
+    def update(self):
+        n = self.used
+        if n == 0:
+            return
+        life = self.life[:n]
+        life -= life > 0
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.vy[:n] += self.gravity
+
+    def alive(self):
+        return np.flatnonzero(self.life[:self.used] > 0)
+
+    def visible(self, alpha=1.0, view=None):
+        # alpha < 1 steps positions back towards where the last update started;
+        # with a view (x0, y0, x1, y1) only particles inside it are returned
+        idx = self.alive()
+        xs, ys = self.x[idx], self.y[idx]
+        if alpha < 1.0:
+            back = 1.0 - alpha
+            xs, ys = xs - self.vx[idx] * back, ys - (self.vy[idx] - self.gravity) * back
+        if view is None:
+            return xs, ys, self.color[idx]
+        x0, y0, x1, y1 = view
+        shown = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+        return xs[shown], ys[shown], self.color[idx][shown]
+
+    def cull(self, view):
+        # Ends particles beside or below the view (x0, y0, x1, y1) early;
+        # debris the player can't see isn't worth moving. Ones above it may
+        # still fall back in.
+        n = self.used
+        if n == 0:
+            return
+        x0, _, x1, y1 = view
+        x = self.x[:n]
+        self.life[:n][(x < x0) | (x > x1) | (self.y[:n] > y1)] = 0
+
+    def __len__(self):
+        return int(np.count_nonzero(self.life[:self.used] > 0))
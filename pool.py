@@ -0,0 +1,50 @@
+class EntityPool:
+    # Free list of released entities. acquire() re-runs __init__ on a recycled
+    # object when one is available, so entity classes need no extra reset code.
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        self.live = 0
+        self.high_water = 0
+        self.allocations = 0 # Objects ever created
+        self.frame_allocations = 0 # Objects created since begin_frame()
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.__init__(*args)
+        else:
+            obj = self.cls(*args)
+            self.allocations += 1
+            self.frame_allocations += 1
+        self.live += 1
+        if self.live > self.high_water:
+            self.high_water = self.live
+        return obj
+
+    def release(self, obj):
+        self.live -= 1
+        self.free.append(obj)
+
+    def begin_frame(self):
+        self.frame_allocations = 0
+
+    def stats(self):
+        return {"live": self.live, "free": len(self.free), "high_water": self.high_water,
+                "allocations": self.allocations, "frame_allocations": self.frame_allocations}
+
+def swap_remove_inactive(entities, pool=None):
+    # Drops inactive entities in place by moving the last one into each hole.
+    # Order is not kept.
+    i = 0
+    n = len(entities)
+    while i < n:
+        entity = entities[i]
+        if entity.is_active:
+            i += 1
+        else:
+            n -= 1
+            entities[i] = entities[n]
+            if pool is not None:
+                pool.release(entity)
+    del entities[n:]
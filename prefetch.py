@@ -0,0 +1,87 @@
+import queue
+import sys
+import threading
+
+from snapshot import capture, restore
+
+SETTLE_TICKS = 300 # A stage whose blocks are still falling after this long fails the check
+
+def check_stage(sim):
+    # Raises ValueError if the stage is empty, a block is outside the world or
+    # overlaps another, or the blocks don't come to rest. Settling is rewound
+    # afterwards, so `sim` plays exactly as it would have unchecked.
+    blocks, grid = sim.blocks, sim.grid
+    if len(blocks) == 0: raise ValueError("no blocks")
+    bounds = grid.bounds
+    for i in blocks.active_indices().tolist():
+        x0, y0, x1, y1 = bounds[i]
+        if x0 < 0 or y0 < 0 or x1 > sim.width or y1 > sim.ground_y:
+            raise ValueError(f"block {i} at ({x0:g}, {y0:g}) is outside the world")
+        for j in grid.query(x0, y0, x1, y1):
+            bx0, by0, bx1, by1 = bounds[j]
+            if j > i and bx0 < x1 and bx1 > x0 and by0 < y1 and by1 > y0:
+                raise ValueError(f"blocks {i} and {j} overlap")
+    snapshot = capture(sim)
+    for _ in range(SETTLE_TICKS):
+        if blocks.awake_count == 0: break
+        sim.settle_blocks()
+    moving = blocks.awake_count
+    restore(sim, snapshot)
+    sim.events = []
+    if moving: raise ValueError(f"{moving} blocks still falling after {SETTLE_TICKS} ticks")
+
+class StagePrefetcher:
+    # Builds and checks stages on a worker thread. request() queues the
+    # Recording for the stage likely to be played next and returns at once;
+    # the worker hands back its Simulation on a result queue. take() uses
+    # that if it is ready and otherwise builds the stage itself, unchecked,
+    # so it never waits on the worker. A stage that fails `check` is still
+    # played, as the same seed would build it anyway, and the failure is
+    # reported on stderr.
+    def __init__(self, check=check_stage):
+        self.check = check
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.hits = 0 # Stages taken ready from the worker
+        self.misses = 0 # Stages built by take() itself
+        self.worker = threading.Thread(target=self.run_worker, name="stage-prefetch", daemon=True)
+        self.worker.start()
+
+    def request(self, recording):
+        self.requests.put(recording)
+
+    def run_worker(self):
+        while True:
+            recording = self.requests.get()
+            while not self.requests.empty(): # Only the latest request matters
+                recording = self.requests.get_nowait()
+            if recording is None: return
+            sim = recording.make_simulation()
+            try:
+                self.check(sim)
+                error = None
+            except ValueError as e:
+                error = e
+            self.results.put((recording, sim, error))
+
+    def take(self, recording):
+        # A Simulation for `recording`, as recording.make_simulation() builds it
+        found = None
+        while True:
+            try:
+                result = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] is recording: found = result # Anything else was for a stage that wasn't played
+        if found is None:
+            self.misses += 1
+            return recording.make_simulation()
+        _, sim, error = found
+        self.hits += 1
+        if error is not None: print(f"stage {recording.stage + 1} failed its check: {error}", file=sys.stderr)
+        return sim
+
+    def close(self, timeout=1.0):
+        if self.worker.is_alive():
+            self.requests.put(None)
+            self.worker.join(timeout)
@@ -0,0 +1,126 @@
+import json
+import time
+from collections import deque
+
+import pyxel
+
+UPDATE_PHASES = ["timers", "launcher", "lasers", "balls", "blocks", "items", "compact", "outcome", "particles"]
+DRAW_PHASES = ["background", "launcher", "balls", "blocks", "explosions", "items", "hud"]
+COUNTS = ["balls", "blocks", "particles", "items"]
+FRAME_BUDGET_MS = 1000 / 30
+
+class TraceWriter:
+    # Streams one row per profiled frame to CSV, or to a JSON array when the
+    # path ends in .json. Rows are batched so the game does one write() per
+    # `flush_every` frames instead of one per frame.
+    def __init__(self, path, columns, flush_every=60):
+        self.path = path
+        self.columns = columns
+        self.flush_every = flush_every
+        self.json = path.endswith(".json")
+        self.rows = []
+        self.written = 0
+        self.file = open(path, "w", buffering=1 << 16)
+        if self.json:
+            self.file.write("[\n")
+        else:
+            self.file.write(",".join(columns) + "\n")
+
+    def write(self, values):
+        if self.json:
+            self.rows.append(json.dumps(dict(zip(self.columns, values))))
+        else:
+            self.rows.append(",".join(str(v) for v in values))
+        if len(self.rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        if self.json:
+            self.file.write((",\n" if self.written else "") + ",\n".join(self.rows))
+        else:
+            self.file.write("\n".join(self.rows) + "\n")
+        self.written += len(self.rows)
+        self.rows = []
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        if self.json:
+            self.file.write("\n]\n")
+        self.file.close()
+
+class Profiler:
+    # Lap timer for one frame. start() syncs the clock, then each lap(name)
+    # charges the time since the previous lap to that phase. end_frame() folds
+    # the frame into rolling averages, the graph history and the trace.
+    def __init__(self, trace_path=None, history=60, smoothing=0.05):
+        self.enabled = trace_path is not None
+        self.overlay = False
+        self.phases = [f"update_{p}" for p in UPDATE_PHASES] + [f"draw_{p}" for p in DRAW_PHASES]
+        self.index = {name: i for i, name in enumerate(self.phases)}
+        self.update_count = len(UPDATE_PHASES)
+        self.current = [0.0] * len(self.phases)
+        self.averages = [0.0] * len(self.phases)
+        self.smoothing = smoothing
+        self.history = deque(maxlen=history) # (update ms, draw ms) per frame
+        self.counts = dict.fromkeys(COUNTS, 0)
+        self.frame = 0
+        self.last = 0.0
+        self.trace = TraceWriter(trace_path, ["frame", "stage"] + [f"{p}_ms" for p in self.phases] + COUNTS) if trace_path else None
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        was_enabled, self.enabled = self.enabled, self.overlay or self.trace is not None
+        if self.enabled and not was_enabled: self.begin_frame() # Else the first lap is charged all the time spent off
+
+    def begin_frame(self):
+        self.current = [0.0] * len(self.phases)
+        self.last = time.perf_counter()
+
+    def start(self):
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.current[self.index[name]] += now - self.last
+        self.last = now
+
+    def end_frame(self, stage, counts):
+        self.frame += 1
+        ms = [t * 1000 for t in self.current]
+        a = self.smoothing
+        self.averages = [avg + (t - avg) * a for avg, t in zip(self.averages, ms)]
+        self.history.append((sum(ms[:self.update_count]), sum(ms[self.update_count:])))
+        self.counts = counts
+        if self.trace is not None:
+            self.trace.write([self.frame, stage] + [round(t, 4) for t in ms] + [counts[k] for k in COUNTS])
+
+    def close(self):
+        if self.trace is not None:
+            self.trace.close()
+
+    def draw_overlay(self, x, y):
+        # Frame time graph against the 30 fps budget, then rolling ms per phase
+        width = self.history.maxlen
+        pyxel.rect(x - 1, y - 1, 98, 90, 0)
+        pyxel.line(x, y, x + width - 1, y, 8)
+        for i, (update_ms, draw_ms) in enumerate(self.history):
+            h_update = min(16, round(update_ms / FRAME_BUDGET_MS * 16))
+            h_draw = min(16 - h_update, round(draw_ms / FRAME_BUDGET_MS * 16))
+            if h_update: pyxel.line(x + i, y + 16, x + i, y + 17 - h_update, 11)
+            if h_draw: pyxel.line(x + i, y + 16 - h_update, x + i, y + 17 - h_update - h_draw, 12)
+        pyxel.text(x + width + 2, y, "33ms", 8)
+        update_total = sum(self.averages[:self.update_count])
+        draw_total = sum(self.averages[self.update_count:])
+        pyxel.text(x, y + 19, f"UPD {update_total:5.2f}", 11)
+        pyxel.text(x + 48, y + 19, f"DRW {draw_total:5.2f}", 12)
+        for i, name in enumerate(UPDATE_PHASES):
+            pyxel.text(x, y + 26 + i * 6, f"{name[:7]:<7}{self.averages[i]:5.2f}", 7)
+        for i, name in enumerate(DRAW_PHASES):
+            pyxel.text(x + 48, y + 26 + i * 6, f"{name[:7]:<7}{self.averages[self.update_count + i]:5.2f}", 7)
+        c = self.counts
+        pyxel.text(x, y + 81, f"B{c['balls']} K{c['blocks']} P{c['particles']} I{c['items']}", 6)
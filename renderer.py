@@ -0,0 +1,404 @@
+import math
+import random
+
+import numpy as np
+import pyxel
+
+from balls import BOMB, PIERCE
+
+LAYER_COLKEY = 14 # No block uses this color, so it marks empty pixels in the block layer
+BACKGROUND_VARIANTS = 8 # Pre-rendered frames for backgrounds with jittering elements
+BLOCK_LAYER_MARGIN = 48 # The block layer reaches this far past the view, so small scrolls reuse it
+
+def paint_pistol(target, cx, cy, cos_a, sin_a):
+    # Points for body and grip, relative to pivot
+    body = [(-6, -3), (12, -3), (12, 3), (-6, 3)]
+    grip = [(-4, 3), (2, 3), (2, 8), (-4, 8)]
+
+    r_body = [(cx + x * cos_a - y * sin_a, cy + x * sin_a + y * cos_a) for x, y in body]
+    r_grip = [(cx + x * cos_a - y * sin_a, cy + x * sin_a + y * cos_a) for x, y in grip]
+
+    # Draw Body
+    target.tri(r_body[0][0], r_body[0][1], r_body[1][0], r_body[1][1], r_body[2][0], r_body[2][1], 13)
+    target.tri(r_body[0][0], r_body[0][1], r_body[2][0], r_body[2][1], r_body[3][0], r_body[3][1], 13)
+
+    # Draw Grip
+    target.tri(r_grip[0][0], r_grip[0][1], r_grip[1][0], r_grip[1][1], r_grip[2][0], r_grip[2][1], 1)
+    target.tri(r_grip[0][0], r_grip[0][1], r_grip[2][0], r_grip[2][1], r_grip[3][0], r_grip[3][1], 1)
+
+def paint_crossbow(target, cx, cy, cos_a, sin_a):
+    # Bow and stock; the barrel changes length with power and is drawn live
+    def get_rotated_point(px_rel, py_rel):
+        return cx + (px_rel * cos_a - py_rel * sin_a), cy + (px_rel * sin_a + py_rel * cos_a)
+
+    # Draw Bow
+    bl_x, bl_y = get_rotated_point(-15, 0)
+    br_x, br_y = get_rotated_point(15, 0)
+    target.line(bl_x, bl_y, br_x, br_y, 4) # Bow line
+
+    # Draw Stock
+    stock = [get_rotated_point(px, py) for px, py in [(0, -3), (4, -3), (4, 5), (0, 5)]]
+    target.tri(stock[0][0], stock[0][1], stock[1][0], stock[1][1], stock[2][0], stock[2][1], 4)
+    target.tri(stock[0][0], stock[0][1], stock[2][0], stock[2][1], stock[3][0], stock[3][1], 4)
+
+def paint_crossbow_string(target, cx, cy, cos_a, sin_a):
+    # Its own atlas, since the string is drawn over the barrel
+    def get_rotated_point(px_rel, py_rel):
+        return cx + (px_rel * cos_a - py_rel * sin_a), cy + (px_rel * sin_a + py_rel * cos_a)
+
+    # Crossbow string (perpendicular to barrel, 5 back from the pivot)
+    string_start_x, string_start_y = get_rotated_point(-5, 15)
+    string_end_x, string_end_y = get_rotated_point(-5, -15)
+    target.line(string_start_x, string_start_y, string_end_x, string_end_y, 0) # Black string
+
+def paint_slipper(target, cx, cy, cos_a, sin_a):
+    # Sole and strap points relative to ball center
+    sole_points_rel = [(-4, -2), (4, -2), (4, 3), (-4, 3)]
+    strap_points_rel = [(-4, -4), (1, -4), (1, -2), (-4, -2)]
+    for points in (sole_points_rel, strap_points_rel):
+        p = [(cx + px * cos_a - py * sin_a, cy + px * sin_a + py * cos_a) for px, py in points]
+        # Shadow, then main
+        target.tri(p[0][0]+1, p[0][1]+1, p[1][0]+1, p[1][1]+1, p[2][0]+1, p[2][1]+1, 1)
+        target.tri(p[0][0]+1, p[0][1]+1, p[2][0]+1, p[2][1]+1, p[3][0]+1, p[3][1]+1, 1)
+        target.tri(p[0][0], p[0][1], p[1][0], p[1][1], p[2][0], p[2][1], 0)
+        target.tri(p[0][0], p[0][1], p[2][0], p[2][1], p[3][0], p[3][1], 0)
+
+class RotationAtlas:
+    # One sprite pre-rendered at `steps` evenly spaced angles, packed as a grid
+    # of size x size cells in one image. Drawing is a single blt of the cell
+    # nearest to the requested angle. Given a sheet (image, u, v) from the
+    # resource pack, the grid is read from there instead of painted.
+    def __init__(self, paint, size, steps, sheet=None):
+        self.size = size
+        self.steps = steps
+        self.columns = math.ceil(math.sqrt(steps))
+        rows = math.ceil(steps / self.columns)
+        if sheet is not None:
+            self.image, self.u, self.v = sheet[:3]
+            return
+        self.image = pyxel.Image(self.columns * size, rows * size)
+        self.u = self.v = 0
+        self.image.cls(LAYER_COLKEY)
+        half = size // 2
+        for i in range(steps):
+            angle = 2 * math.pi * i / steps
+            u, v = (i % self.columns) * size, (i // self.columns) * size
+            paint(self.image, u + half, v + half, math.cos(angle), math.sin(angle))
+
+    def draw(self, x, y, angle_rad):
+        i = round(angle_rad / (2 * math.pi) * self.steps) % self.steps
+        u, v = self.u + (i % self.columns) * self.size, self.v + (i // self.columns) * self.size
+        half = self.size // 2
+        pyxel.blt(x - half, y - half, self.image, u, v, self.size, self.size, LAYER_COLKEY)
+
+# Launchers only turn in whole degrees, so they get one cell per degree
+ATLAS_SPECS = {
+    "Pistol": (paint_pistol, 28, 360),
+    "Crossbow": (paint_crossbow, 34, 360),
+    "Crossbow string": (paint_crossbow_string, 34, 360),
+    "Slipper": (paint_slipper, 16, 64),
+}
+atlases = {}
+sheets = {} # Pre-rendered name -> (image, u, v, clear color), filled from the resource pack
+
+def use_sheets(new_sheets):
+    sheets.update(new_sheets)
+    atlases.clear()
+
+def atlas_for(style):
+    # Built on first use, so only the styles picked on the start screen cost anything
+    atlas = atlases.get(style)
+    if atlas is None:
+        paint, size, steps = ATLAS_SPECS[style]
+        atlas = RotationAtlas(paint, size, steps, sheets.get(style))
+        atlases[style] = atlas
+    return atlas
+
+def background_sheet_name(stage, ground_y, variant):
+    return f"background-{stage}-{ground_y}-{variant}"
+
+def prepare_styles(*styles):
+    for name in ATLAS_SPECS:
+        if name.split()[0] in styles: atlas_for(name) # "Crossbow string" comes with "Crossbow"
+
+def draw_launcher(launcher):
+    angle_rad = math.radians(launcher.angle)
+    end_x = launcher.x + math.cos(angle_rad) * (launcher.power * 3)
+    end_y = launcher.y + math.sin(angle_rad) * (launcher.power * 3)
+
+    if launcher.style == "Classic":
+        pyxel.rect(launcher.x - 6, launcher.y, 12, 5, 1) # Shadow
+        pyxel.rect(launcher.x - 5, launcher.y - 1, 10, 5, 13) # Body
+        pyxel.line(launcher.x, launcher.y, end_x, end_y, 1) # Barrel Shadow
+        pyxel.line(launcher.x, launcher.y-1, end_x, end_y-1, 7) # Barrel
+    elif launcher.style == "Triangle":
+        pyxel.rect(launcher.x - 8, launcher.y + 2, 16, 4, 1)
+        pyxel.rect(launcher.x - 7, launcher.y+1, 14, 2, 13)
+        pyxel.circ(launcher.x, launcher.y + 2, 3, 1)
+        barrel_length = launcher.power * 2.5
+        barrel_width = 3
+        p_rad = angle_rad + math.pi / 2
+        dx, dy = math.cos(p_rad) * barrel_width, math.sin(p_rad) * barrel_width
+        x1, y1 = launcher.x + dx, launcher.y + dy
+        x2, y2 = launcher.x - dx, launcher.y - dy
+        tip_x = launcher.x + math.cos(angle_rad) * (barrel_length + 2)
+        tip_y = launcher.y + math.sin(angle_rad) * (barrel_length + 2)
+        pyxel.tri(x1, y1, x2, y2, tip_x, tip_y, 7)
+    elif launcher.style == "Pistol":
+        atlas_for("Pistol").draw(launcher.x, launcher.y, angle_rad)
+    elif launcher.style == "Crossbow":
+        atlas_for("Crossbow").draw(launcher.x, launcher.y, angle_rad)
+        # Main barrel/arrow depends on power, so it is drawn live over the frame
+        pyxel.line(launcher.x, launcher.y, end_x, end_y, 7)
+        atlas_for("Crossbow string").draw(launcher.x, launcher.y, angle_rad)
+
+    pyxel.text(launcher.x - 10, launcher.y - 12, f"P:{int(launcher.power)}", 7)
+
+def draw_ball(x, y, vx, vy, radius, ball_type, style):
+    if style == "Normal":
+        color = 10
+        if ball_type == BOMB: color = 8
+        elif ball_type == PIERCE: color = 6
+        pyxel.circ(x, y, radius, 1) # Shadow
+        pyxel.circ(x, y - 1, radius, color)
+        pyxel.circ(x, y - 2, 1, 7) # Highlight
+    elif style == "Baseball":
+        pyxel.circ(x, y, radius, 1) # Shadow
+        pyxel.circ(x, y - 1, radius, 7)
+        for i in range(-2, 3):
+            pyxel.pset(x + i, y + (1-abs(i)), 8)
+            pyxel.pset(x + i, y - (3-abs(i)), 8)
+    elif style == "Billiard":
+        pyxel.circ(x, y, radius, 1) # Shadow
+        pyxel.circ(x, y - 1, radius, 10)
+        pyxel.circ(x, y - 1, radius - 1, 7)
+        pyxel.text(x - 1, y - 3, "8", 1)
+    elif style == "Slipper":
+        atlas_for("Slipper").draw(x, y, math.atan2(vy, vx)) # Angle based on ball's velocity
+
+def in_view(x, y, view):
+    x0, y0, x1, y1 = view
+    return x0 <= x <= x1 and y0 <= y <= y1
+
+def draw_balls(balls, alpha=1.0, view=None):
+    # alpha < 1 draws balls part way from where the last tick started; with a
+    # view (x0, y0, x1, y1) only balls inside it are drawn
+    n = balls.count
+    xs, ys = balls.x[:n], balls.y[:n]
+    if alpha < 1.0:
+        xs = balls.prev_x[:n] + (xs - balls.prev_x[:n]) * alpha
+        ys = balls.prev_y[:n] + (ys - balls.prev_y[:n]) * alpha
+    vxs, vys, radii, types = balls.vx[:n], balls.vy[:n], balls.radius[:n], balls.ball_type[:n]
+    if view is not None:
+        x0, y0, x1, y1 = view
+        shown = (xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)
+        xs, ys, vxs, vys, radii, types = xs[shown], ys[shown], vxs[shown], vys[shown], radii[shown], types[shown]
+    for x, y, vx, vy, radius, ball_type in zip(xs.tolist(), ys.tolist(), vxs.tolist(), vys.tolist(), radii.tolist(), types.tolist()):
+        draw_ball(x, y, vx, vy, radius, ball_type, balls.style)
+
+def paint_block(target, blocks, i, origin_x=0, origin_y=0):
+    # Into `target` with its top left at (origin_x, origin_y). pyxel rounds
+    # coordinates, so they are rounded before the shift.
+    x, y = math.floor(blocks.x[i] + 0.5) - origin_x, math.floor(blocks.y[i] + 0.5) - origin_y
+    w, h = float(blocks.width[i]), float(blocks.height[i])
+    block_type = blocks.block_type(i)
+    style = block_type.style
+
+    # Draw main body
+    target.rect(x, y, w, h, block_type.base_color)
+
+    # Draw 3D effect
+    if style == "bevel":
+        target.rect(x, y, w, 1, block_type.highlight_color)
+        target.rect(x, y + h - 1, w, 1, block_type.shadow_color)
+        target.rect(x + w - 1, y, 1, h, block_type.shadow_color)
+    elif style == "speckled":
+        target.rect(x, y, w, 1, block_type.highlight_color)
+        target.rect(x, y + h - 1, w, 1, block_type.shadow_color)
+        target.rect(x + w - 1, y, 1, h, block_type.shadow_color)
+        # Speckle is seeded by the block, not its position, so it looks the same on every repaint
+        speckle = random.Random(i)
+        for _ in range(5):
+            target.pset(x + speckle.randint(1, int(w) - 2), y + speckle.randint(1, int(h) - 2), block_type.shadow_color)
+    elif style == "glass":
+        target.rectb(x, y, w, h, block_type.shadow_color)
+        target.rect(x + 1, y + 1, w - 2, h - 2, block_type.base_color)
+        target.pset(x + 1, y + 1, block_type.highlight_color)
+    else:
+        target.rectb(x, y, w, h, 0)
+
+    # Damage overlay for the hits taken so far
+    hits = block_type.hp - int(blocks.hp[i])
+    if hits > 0 and block_type.damage_sprites:
+        sprite = block_type.damage_sprites[min(hits, len(block_type.damage_sprites)) - 1]
+        for row, pixels in enumerate(sprite):
+            for col, pixel in enumerate(pixels):
+                if pixel != ".": target.pset(x + col, y + row, int(pixel, 16))
+
+def draw_item(item):
+    if item.is_active:
+        if item.item_type == "multi_ball":
+            pyxel.circ(item.x, item.y, 4, 11)
+        elif item.item_type == "big_ball":
+            pyxel.rect(item.x - 2, item.y - 2, 5, 5, 14)
+        elif item.item_type == "laser_beam":
+            pyxel.tri(item.x, item.y - 2, item.x - 3, item.y + 2, item.x + 3, item.y + 2, 8)
+
+def draw_laser(laser):
+    if laser.is_active:
+        end_x = laser.x + laser.dx * laser.length
+        end_y = laser.y + laser.dy * laser.length
+        pyxel.line(laser.x, laser.y, end_x, end_y, 8)
+
+def draw_aim_hint(x, y, angle, power, gravity, width, height, color):
+    # Dotted path of a shot through empty space, integrated like BallStore
+    vx = math.cos(math.radians(angle)) * power
+    vy = math.sin(math.radians(angle)) * power
+    for frame in range(90):
+        vy += gravity
+        x += vx
+        y += vy
+        if x < 0 or x > width or y > height:
+            break
+        if frame % 3 == 2: pyxel.pset(x, y, color)
+
+def draw_particles(particles, alpha=1.0, view=None):
+    xs, ys, colors = particles.visible(alpha, view)
+    for x, y, color in zip(xs.tolist(), ys.tolist(), colors.tolist()):
+        pyxel.pset(x, y, color)
+
+def paint_background(target, stage, width, height, ground_y, rng):
+    # Returns the clear color so the screen edge matches under camera shake
+    if stage == 0: # Grassland
+        target.cls(12) # Sky
+        target.rect(0, ground_y - 20, width, 20, 3) # Green grass
+        target.rect(0, ground_y, width, height - ground_y, 1) # Dirt
+        for i in range(0, width, 8):
+            target.tri(i+4, ground_y - 20, i, ground_y - 30, i+8, ground_y - 30, 3) # Hills
+        return 12
+    elif stage == 1: # Volcano
+        target.cls(0) # Dark sky
+        target.tri(width/2, ground_y, width/2 - 50, ground_y - 50, width/2 + 50, ground_y - 50, 8) # Volcano mountain
+        target.circ(width/2, ground_y - 50, 5, 10) # Lava
+        target.rect(0, ground_y, width, height - ground_y, 1) # Ground
+        return 0
+    elif stage == 2: # Ocean
+        target.cls(6) # Deep blue ocean
+        target.rect(0, ground_y - 10, width, 10, 12) # Lighter blue surface
+        for i in range(0, width, 10):
+            target.circ(i + rng.randint(-2,2), ground_y - 5 + rng.randint(-2,2), 2, 7) # Bubbles
+        target.rect(0, ground_y, width, height - ground_y, 1) # Seabed
+        return 6
+    elif stage == 3: # Sky
+        target.cls(12) # Bright sky
+        for i in range(0, width, 15):
+            target.circ(i + rng.randint(-5,5), 30 + rng.randint(-5,5), 10, 7) # Clouds
+            target.circ(i + rng.randint(-5,5), 50 + rng.randint(-5,5), 8, 7) # Clouds
+        target.rect(0, ground_y, width, height - ground_y, 3) # Ground
+        return 12
+    elif stage == 4: # Space
+        target.cls(0) # Black space
+        for _ in range(50): # Stars
+            target.pset(rng.randint(0, width), rng.randint(0, height), 7)
+        target.circ(width - 20, 20, 10, 10) # Moon/Planet
+        target.rect(0, ground_y, width, height - ground_y, 1) # Ground
+        return 0
+    else: # Default background for stages beyond 4
+        target.cls(12)
+        target.rect(0, ground_y, width, height - ground_y, 3)
+        return 12
+
+PAINTED_COLUMNS = ("x", "y", "width", "height", "hp", "type_id", "active") # Everything paint_block() reads
+
+def painted_state(blocks):
+    n = blocks.count
+    return np.stack([getattr(blocks, name)[:n].astype(np.float64) for name in PAINTED_COLUMNS])
+
+class LayeredRenderer:
+    # Backgrounds are painted once per stage into off-screen images (several
+    # variants for stages whose elements jitter), and blocks are composited
+    # into one layer that is only repainted where the block set changes. Each
+    # frame then costs a couple of blt calls for everything static.
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.backgrounds = {}
+        self.block_layer = pyxel.Image(width + 2 * BLOCK_LAYER_MARGIN, height + 2 * BLOCK_LAYER_MARGIN)
+        self.block_scratch = pyxel.Image(self.block_layer.width, self.block_layer.height) # Regions of the layer are repainted here first
+        self.block_version = None
+        self.block_sim = None
+        self.block_origin = (0, 0) # World position of the layer's top left
+        self.painted = None # painted_state() as of the last paint
+
+    def background(self, stage, ground_y):
+        # (clear color, [(image, u, v) per variant])
+        key = (min(stage, 5), ground_y)
+        cached = self.backgrounds.get(key)
+        if cached is None:
+            variants = BACKGROUND_VARIANTS if key[0] in (2, 3, 4) else 1
+            baked = [sheets.get(background_sheet_name(key[0], ground_y, i)) for i in range(variants)]
+            if all(baked):
+                cached = (baked[0][3], [sheet[:3] for sheet in baked])
+            else:
+                rng = random.Random(key[0])
+                images = []
+                for _ in range(variants):
+                    image = pyxel.Image(self.width, self.height)
+                    color = paint_background(image, key[0], self.width, self.height, ground_y, rng)
+                    images.append((image, 0, 0))
+                cached = (color, images)
+            self.backgrounds[key] = cached
+        return cached
+
+    def draw_background(self, stage, ground_y, frame):
+        color, images = self.background(stage, ground_y)
+        image, u, v = images[frame % len(images)]
+        pyxel.cls(color)
+        pyxel.blt(0, 0, image, u, v, self.width, self.height)
+
+    def draw_blocks(self, sim, view_x=0, view_y=0):
+        # The layer covers the view at (view_x, view_y) and a margin around it.
+        # A new stage, or a view scrolled past the margin, is painted whole
+        # from a grid query. After that only the regions of blocks whose
+        # painted columns changed since the last paint are repainted.
+        layer = self.block_layer
+        ox, oy = self.block_origin
+        inside = ox <= view_x and view_x + self.width <= ox + layer.width and oy <= view_y and view_y + self.height <= oy + layer.height
+        if sim is not self.block_sim or sim.block_version != self.block_version or not inside:
+            blocks = sim.blocks
+            state = painted_state(blocks)
+            painted = self.painted
+            if sim is not self.block_sim or not inside or painted.shape != state.shape:
+                ox, oy = view_x - BLOCK_LAYER_MARGIN, view_y - BLOCK_LAYER_MARGIN
+                layer.cls(LAYER_COLKEY)
+                for i in sim.grid.query(ox, oy, ox + layer.width, oy + layer.height):
+                    paint_block(layer, blocks, i, ox, oy)
+                self.block_origin = (ox, oy)
+            else:
+                for i in np.flatnonzero((painted != state).any(axis=0)).tolist():
+                    # Where the block was and where it is now, if shown there
+                    rects = [(x, y, x + w, y + h) for x, y, w, h, _, _, active in (painted[:, i].tolist(), state[:, i].tolist()) if active]
+                    if rects:
+                        x0s, y0s, x1s, y1s = zip(*rects)
+                        self.repaint_region(sim, min(x0s), min(y0s), max(x1s), max(y1s))
+            self.block_sim = sim
+            self.block_version = sim.block_version
+            self.painted = state
+        pyxel.blt(ox, oy, layer, 0, 0, layer.width, layer.height, LAYER_COLKEY)
+
+    def repaint_region(self, sim, x0, y0, x1, y1):
+        # Every block touching the world rect is painted into the scratch
+        # image in index order, as a full repaint would, and the rect copied
+        # over the layer. Parts of it outside the layer are left out.
+        ox, oy = self.block_origin
+        layer = self.block_layer
+        x0, y0 = max(math.floor(x0), ox), max(math.floor(y0), oy)
+        x1, y1 = min(math.ceil(x1), ox + layer.width), min(math.ceil(y1), oy + layer.height)
+        if x0 >= x1 or y0 >= y1: return
+        w, h = x1 - x0, y1 - y0
+        scratch = self.block_scratch
+        scratch.rect(0, 0, w, h, LAYER_COLKEY)
+        blocks = sim.blocks
+        for i in sim.grid.query(x0, y0, x1, y1):
+            paint_block(scratch, blocks, i, x0, y0)
+        layer.blt(x0 - ox, y0 - oy, scratch, 0, 0, w, h)
@@ -0,0 +1,205 @@
+import struct
+import sys
+import time
+
+import numpy as np
+
+from levelpack import RECORD
+from simulation import Simulation, split_seed
+from snapshot import capture, from_snapshot
+
+MAGIC = b"DMRP"
+VERSION = 5 # Bumped whenever the same inputs would play out differently
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def write_text(out, text):
+    raw = text.encode("utf-8")
+    write_varint(out, len(raw))
+    out.extend(raw)
+
+def read_text(data, pos):
+    n, pos = read_varint(data, pos)
+    return bytes(data[pos:pos + n]).decode("utf-8"), pos + n
+
+class Recording:
+    # Input log for one stage played from a fresh Simulation. Only changes
+    # of the button mask are stored, as (frames since last change, mask).
+    # A stage loaded from a level pack keeps its blocks with it, so the
+    # recording plays back without the pack.
+    def __init__(self, stage, seed, launcher_style="Classic", ball_style="Normal", laser_pierce=None, width=200, height=150, substeps=1,
+                 layout=None):
+        self.stage = stage
+        self.seed = seed
+        self.launcher_style = launcher_style
+        self.ball_style = ball_style
+        self.laser_pierce = laser_pierce
+        self.width = width
+        self.height = height
+        self.substeps = substeps
+        self.layout = layout
+        self.changes = []
+        self.frames = 0
+        self.last_buttons = 0
+        self.last_change = 0
+
+    def record(self, buttons):
+        if buttons != self.last_buttons:
+            self.changes.append((self.frames - self.last_change, buttons))
+            self.last_buttons = buttons
+            self.last_change = self.frames
+        self.frames += 1
+
+    def inputs(self):
+        # Button mask for every frame
+        masks = bytearray(self.frames)
+        frame = 0
+        buttons = 0
+        for delta, new_buttons in self.changes:
+            masks[frame:frame + delta] = bytes([buttons]) * delta
+            frame += delta
+            buttons = new_buttons
+        masks[frame:] = bytes([buttons]) * (self.frames - frame)
+        return masks
+
+    def make_simulation(self):
+        gameplay_seed, _ = split_seed(self.seed)
+        return Simulation(self.width, self.height, stage=self.stage, seed=gameplay_seed, launcher_style=self.launcher_style,
+                          ball_style=self.ball_style, laser_pierce=self.laser_pierce, substeps=self.substeps, layout=self.layout)
+
+    def encode(self, out):
+        write_varint(out, self.stage)
+        out.extend(struct.pack("<Q", self.seed))
+        write_text(out, self.launcher_style)
+        write_text(out, self.ball_style)
+        write_varint(out, 0 if self.laser_pierce is None else self.laser_pierce + 1)
+        write_varint(out, self.width)
+        write_varint(out, self.height)
+        write_varint(out, self.substeps)
+        write_varint(out, 0 if self.layout is None else len(self.layout) + 1)
+        if self.layout is not None: out.extend(self.layout.tobytes())
+        write_varint(out, self.frames)
+        write_varint(out, len(self.changes))
+        for delta, buttons in self.changes:
+            write_varint(out, delta)
+            write_varint(out, buttons)
+
+    @classmethod
+    def decode(cls, data, pos):
+        stage, pos = read_varint(data, pos)
+        seed, = struct.unpack_from("<Q", data, pos)
+        pos += 8
+        launcher_style, pos = read_text(data, pos)
+        ball_style, pos = read_text(data, pos)
+        pierce, pos = read_varint(data, pos)
+        width, pos = read_varint(data, pos)
+        height, pos = read_varint(data, pos)
+        substeps, pos = read_varint(data, pos)
+        n, pos = read_varint(data, pos)
+        layout = None
+        if n:
+            layout = np.frombuffer(data, RECORD, n - 1, pos).copy()
+            pos += layout.nbytes
+        recording = cls(stage, seed, launcher_style, ball_style, None if pierce == 0 else pierce - 1, width, height, substeps, layout)
+        recording.frames, pos = read_varint(data, pos)
+        n, pos = read_varint(data, pos)
+        for _ in range(n):
+            delta, pos = read_varint(data, pos)
+            buttons, pos = read_varint(data, pos)
+            recording.changes.append((delta, buttons))
+        return recording, pos
+
+def save_session(path, recordings):
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    write_varint(out, len(recordings))
+    for recording in recordings:
+        recording.encode(out)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def load_session(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != MAGIC or data[4] != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} replay")
+    n, pos = read_varint(data, 5)
+    recordings = []
+    for _ in range(n):
+        recording, pos = Recording.decode(data, pos)
+        recordings.append(recording)
+    return recordings
+
+class Replayer:
+    # Re-runs a Recording against a fresh Simulation. The world is
+    # checkpointed every `checkpoint_interval` frames so seek() only has to
+    # replay from the nearest earlier checkpoint. Seeking back swaps in a new
+    # Simulation built from the checkpoint, so one handed out earlier (to a
+    # renderer, say) is never rewound under its holder.
+    def __init__(self, recording, checkpoint_interval=60):
+        self.recording = recording
+        self.inputs = recording.inputs()
+        self.checkpoint_interval = checkpoint_interval
+        self.sim = recording.make_simulation()
+        self.frame = 0
+        self.checkpoints = {0: self.snapshot()}
+
+    def snapshot(self):
+        return capture(self.sim)
+
+    def restore(self, state):
+        self.sim = from_snapshot(state, self.sim)
+
+    def done(self):
+        return self.frame >= len(self.inputs) or self.sim.outcome is not None
+
+    def step(self, profiler=None):
+        events = self.sim.step(self.inputs[self.frame], profiler)
+        self.frame += 1
+        if self.frame % self.checkpoint_interval == 0 and self.frame not in self.checkpoints:
+            self.checkpoints[self.frame] = self.snapshot()
+        return events
+
+    def fast_forward(self, frame=None):
+        # Unlimited speed, nothing rendered
+        end = len(self.inputs) if frame is None else min(frame, len(self.inputs))
+        while self.frame < end and self.sim.outcome is None:
+            self.step()
+
+    def seek(self, frame):
+        base = max(f for f in self.checkpoints if f <= frame)
+        if not (base <= self.frame <= frame):
+            self.restore(self.checkpoints[base])
+            self.frame = base
+        self.fast_forward(frame)
+
+def main(path):
+    for recording in load_session(path):
+        replayer = Replayer(recording)
+        t = time.perf_counter()
+        replayer.fast_forward()
+        elapsed = time.perf_counter() - t
+        sim = replayer.sim
+        print(f"stage {recording.stage + 1}: {replayer.frame} frames, outcome={sim.outcome}, "
+              f"score={sim.score}, {replayer.frame / max(elapsed, 1e-9):.0f} frames/s")
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python replay.py SESSION_FILE")
+        sys.exit(1)
+    main(sys.argv[1])
@@ -0,0 +1,444 @@
+import math
+import random
+import numpy as np
+from balls import BallStore, BALL_TYPES, NORMAL, BOMB, PIERCE
+from blocks import BlockStore, stage_block_types
+from broadphase import BlockGrid
+from pool import EntityPool, swap_remove_inactive
+from stagegen import CELL, generate_layout, stage_field
+
+# Input bits for one simulation step
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_UP = 4
+INPUT_DOWN = 8
+INPUT_FIRE = 16 # Space held (fever auto-fire)
+INPUT_FIRE_PRESSED = 32 # Space pressed this frame
+INPUT_LASER = 64 # F pressed this frame
+
+def split_seed(seed):
+    # Independent gameplay and cosmetic seeds from one seed, so purely visual
+    # randomness can never shift the gameplay stream
+    rng = random.Random(seed)
+    return rng.getrandbits(64), rng.getrandbits(64)
+
+ITEM_TYPES = ["multi_ball", "big_ball", "laser_beam"]
+BLOCK_GRAVITY = 0.3
+MAX_FALL_SPEED = 6 # Under a block's height, so a fall never skips a block
+BREAK_SPEED = 3 # Landing this fast costs a hit; a fall of two blocks or more
+CONTACT = 1e-6 # Blocks this close count as touching, whatever rounding left between them
+
+class Launcher:
+    __slots__ = ("x", "y", "angle", "power", "style")
+
+    def __init__(self, x, y, style="Classic"):
+        self.x = x
+        self.y = y
+        self.angle = -45
+        self.power = 5
+        self.style = style
+
+    def update(self, buttons):
+        if buttons & INPUT_LEFT:
+            self.angle -= 1
+        if buttons & INPUT_RIGHT:
+            self.angle += 1
+        self.angle = max(-90, min(0, self.angle))
+
+        if buttons & INPUT_UP:
+            self.power += 0.1
+        if buttons & INPUT_DOWN:
+            self.power -= 0.1
+        self.power = max(1, min(10, self.power))
+
+class Item:
+    __slots__ = ("x", "y", "item_type", "is_active", "vy")
+
+    def __init__(self, x, y, item_type):
+        self.x = x
+        self.y = y
+        self.item_type = item_type
+        self.is_active = True
+        self.vy = 0.5
+
+    def update(self, height):
+        self.y += self.vy
+        if self.y > height:
+            self.is_active = False
+
+class Laser:
+    __slots__ = ("x", "y", "angle", "dx", "dy", "is_active", "length", "travel", "pierce", "hits", "blocked")
+
+    def __init__(self, x, y, angle, pierce=None):
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.dx = math.cos(math.radians(angle))
+        self.dy = math.sin(math.radians(angle))
+        self.is_active = True
+        self.length = 0 # Drawn length; stops growing once the beam is blocked
+        self.travel = 0 # How far the beam front has gone
+        self.pierce = pierce # Blocks it can hit before stopping, None for unlimited
+        self.hits = 0
+        self.blocked = False
+
+    def update(self, max_length):
+        self.travel += 10
+        if self.travel > max_length:
+            self.is_active = False
+
+class Simulation:
+    # Headless game core. step() consumes one frame of input bits and returns
+    # the audio/visual events for that frame:
+    #   ("sound", sound_id), ("music", music_id, loop),
+    #   ("explosion", x, y, color), ("shake", intensity)
+    # Channels and overlapping sounds are left to the App's AudioMixer.
+    # Timers count ticks; `substeps` splits each tick's ball motion into that
+    # many shorter moves, each collided on its own. `layout`, a level pack
+    # RECORD array, places those blocks instead of generating the stage.
+    def __init__(self, width=200, height=150, stage=0, launcher_style="Classic", ball_style="Normal", seed=None, laser_pierce=None,
+                 substeps=1, layout=None):
+        self.width = width
+        self.height = height
+        self.stage = stage
+        self.ball_style = ball_style
+        self.rng = random.Random(seed)
+        self.events = []
+        self.frame = 0
+        self.outcome = None # None while running, then "won" or "lost"
+
+        self.launcher = Launcher(20, height - 10, style=launcher_style)
+        self.balls = BallStore(style=ball_style)
+        self.blocks = BlockStore()
+        self.items = []
+        self.lasers = []
+        self.item_pool = EntityPool(Item)
+        self.laser_pool = EntityPool(Laser)
+        self.laser_pierce = laser_pierce # 1 stops at the first block hit, None goes through everything
+        self.substeps = substeps
+        self.layout = layout
+        self.score = 0
+        self.balls_left = 5
+        self.combo_count = 0
+        self.combo_timer = 0
+        self.multi_ball_timer = 0
+        self.big_ball_timer = 0
+        self.laser_beam_timer = 0
+        self.fever_mode = False
+        self.fever_timer = 0
+        self.fever_shot_timer = 0
+        self.fantastic_display_timer = 0
+        self.was_power_max = False
+        self.ground_y = height - 5
+        self.grid = BlockGrid()
+        self.block_version = 0 # Bumped whenever a block is damaged or the block set changes
+        self.generate_random_blocks()
+        if stage % 3 == 1: self.current_ball_type = "bomb"
+        elif stage % 3 == 2: self.current_ball_type = "pierce"
+        else: self.current_ball_type = "normal"
+
+    def play(self, sound_id):
+        self.events.append(("sound", sound_id))
+
+    def play_music(self, music_id, loop):
+        self.events.append(("music", music_id, loop))
+
+    def spawn_explosion(self, x, y, color):
+        self.events.append(("explosion", x, y, color))
+
+    def trigger_shake(self, intensity):
+        self.events.append(("shake", intensity))
+
+    def pool_stats(self):
+        # High-water marks and allocation counts, for spotting allocation churn
+        return {"items": self.item_pool.stats(), "lasers": self.laser_pool.stats(), "balls": self.balls.stats()}
+
+    def damage_block(self, i, damage):
+        self.block_version += 1
+        if self.blocks.damage(i, damage):
+            if i in self.grid.bounds:
+                self.grid.remove(i)
+                self.wake_stack(i)
+            return True
+        return False
+
+    def count_combo(self):
+        self.combo_count += 1
+        self.combo_timer = 30
+        if self.combo_count >= 10 and not self.fever_mode:
+            self.fever_mode = True
+            self.fever_timer = 600
+            self.play_music(3, True)
+            self.play(7)
+        if self.combo_count > 1: self.play(5)
+
+    def block_center(self, i):
+        blocks = self.blocks
+        return float(blocks.x[i] + blocks.width[i] / 2), float(blocks.y[i] + blocks.height[i] / 2)
+
+    def step(self, buttons=0, profiler=None):
+        self.events = []
+        if self.outcome is not None:
+            return self.events
+        self.frame += 1
+        self.item_pool.begin_frame()
+        self.laser_pool.begin_frame()
+        self.balls.begin_frame()
+
+        if self.combo_timer > 0: self.combo_timer -= 1
+        else:
+            if self.combo_count > 1: self.score += self.combo_count * 50
+            self.combo_count = 0
+
+        if self.multi_ball_timer > 0: self.multi_ball_timer -= 1
+        if self.big_ball_timer > 0:
+            self.big_ball_timer -= 1
+            if self.big_ball_timer == 0:
+                self.balls.set_radius(3)
+        if self.laser_beam_timer > 0: self.laser_beam_timer -= 1
+
+        if self.fever_mode:
+            self.fever_timer -= 1
+            if self.fever_timer == 0:
+                self.fever_mode = False
+                self.play_music(0, True)
+            if self.fever_shot_timer > 0: self.fever_shot_timer -= 1
+        if profiler: profiler.lap("update_timers")
+
+        self.launcher.update(buttons)
+
+        if self.launcher.power == 10 and not self.was_power_max:
+            self.fantastic_display_timer = 60
+            self.play(8)
+        self.was_power_max = (self.launcher.power == 10)
+
+        if self.fantastic_display_timer > 0: self.fantastic_display_timer -= 1
+
+        if self.fever_mode:
+            if buttons & INPUT_FIRE and self.fever_shot_timer == 0:
+                power = self.launcher.power * 1.5
+                self.balls.spawn(self.launcher.x, self.launcher.y, self.launcher.angle, power, ball_type=NORMAL)
+                self.play(3)
+                self.fever_shot_timer = 5
+        elif buttons & INPUT_FIRE_PRESSED and self.balls_left > 0:
+            radius = 6 if self.big_ball_timer > 0 else 3
+            ball_type = BALL_TYPES.index(self.current_ball_type)
+            self.balls.spawn(self.launcher.x, self.launcher.y, self.launcher.angle, self.launcher.power, ball_type, radius)
+            self.balls_left -= 1
+            self.play(3)
+            if self.multi_ball_timer > 0:
+                for i in range(2):
+                    angle = self.launcher.angle + self.rng.uniform(-10, 10)
+                    self.balls.spawn(self.launcher.x, self.launcher.y, angle, self.launcher.power, ball_type, radius)
+
+        if self.laser_beam_timer > 0 and buttons & INPUT_LASER:
+            self.lasers.append(self.laser_pool.acquire(self.launcher.x, self.launcher.y, self.launcher.angle, self.laser_pierce))
+            self.play(6)
+        if profiler: profiler.lap("update_launcher")
+
+        for laser in self.lasers:
+            laser.update(self.width)
+            if laser.blocked:
+                continue
+            # Only the piece the beam extended by this frame is traced
+            for t, i in self.grid.raycast(laser.x, laser.y, laser.dx, laser.dy, laser.length, laser.travel):
+                if self.damage_block(i, 1):
+                    block_type = self.blocks.block_type(i)
+                    self.score += 100
+                    self.spawn_explosion(*self.block_center(i), block_type.explosion_color)
+                    self.play(block_type.destruction_sound_id)
+                    self.trigger_shake(1)
+                laser.hits += 1
+                if laser.pierce is not None and laser.hits >= laser.pierce:
+                    laser.blocked = True
+                    laser.length = t
+                    break
+            else:
+                laser.length = laser.travel
+        if profiler: profiler.lap("update_lasers")
+
+        self.update_balls()
+        if profiler: profiler.lap("update_balls")
+
+        self.settle_blocks()
+        if profiler: profiler.lap("update_blocks")
+
+        for item in self.items:
+            item.update(self.height)
+            if item.is_active and self.check_item_collision(item):
+                item.is_active = False
+                self.play(4)
+                if item.item_type == "multi_ball": self.multi_ball_timer = 300
+                elif item.item_type == "big_ball":
+                    self.big_ball_timer = 300
+                    self.balls.set_radius(6)
+                elif item.item_type == "laser_beam": self.laser_beam_timer = 120
+        if profiler: profiler.lap("update_items")
+
+        self.balls.compact()
+        swap_remove_inactive(self.items, self.item_pool)
+        swap_remove_inactive(self.lasers, self.laser_pool)
+        if profiler: profiler.lap("update_compact")
+
+        if not self.blocks:
+            self.outcome = "won"
+            self.balls.clear()
+            self.balls_left = 0
+            self.play_music(1, False)
+        elif self.balls_left == 0 and len(self.balls) == 0 and self.blocks.awake_count == 0:
+            self.outcome = "lost"
+            self.play_music(2, False)
+        if profiler: profiler.lap("update_outcome")
+
+        return self.events
+
+    def update_balls(self):
+        balls = self.balls
+        balls.begin_tick()
+        dt = 1 / self.substeps
+        for _ in range(self.substeps):
+            balls.integrate(self.width, self.height, dt)
+            for i in balls.near_blocks(self.grid, dt):
+                self.collide_ball(i, dt)
+
+    def collide_ball(self, i, dt=1.0):
+        balls = self.balls
+        blocks = self.blocks
+        bounds = self.grid.bounds
+        x, y, vx, vy = float(balls.x[i]), float(balls.y[i]), float(balls.vx[i]), float(balls.vy[i])
+        r = float(balls.radius[i])
+        ball_type = balls.ball_type[i]
+        prev_x, prev_y = x - vx * dt, y - vy * dt
+        # Swept bounds of the last move
+        candidates = self.grid.query(min(prev_x, x) - r, min(prev_y, y) - r,
+                                     max(prev_x, x) + r, max(prev_y, y) + r)
+        k = 0
+        while k < len(candidates):
+            j = candidates[k]
+            k += 1
+            if blocks.active[j] and self.check_collision(x, y, r, bounds[j]):
+                if ball_type == NORMAL:
+                    bx0, by0, bx1, by1 = bounds[j]
+                    half_w, half_h = (bx1 - bx0) / 2, (by1 - by0) / 2
+                    overlap_x = (r + half_w) - abs(x - (bx0 + half_w))
+                    overlap_y = (r + half_h) - abs(y - (by0 + half_h))
+                    if overlap_x < overlap_y:
+                        vx *= -1
+                        x += math.copysign(overlap_x, -vx)
+                    else:
+                        vy *= -1
+                        y += math.copysign(overlap_y, -vy)
+                    # Pushed out, so the remaining blocks are tested at the new position
+                    candidates = self.grid.query_after(x - r, y - r, x + r, y + r, j)
+                    k = 0
+                elif ball_type == BOMB:
+                    balls.active[i] = False
+                    for other in blocks.near(blocks.x[j], blocks.y[j], 20):
+                        if self.damage_block(other, 1):
+                            self.score += 100
+                            self.spawn_explosion(*self.block_center(other), blocks.block_type(other).explosion_color)
+                            self.play(1)
+                            self.trigger_shake(4)
+                            if self.rng.random() < 0.1: self.items.append(self.item_pool.acquire(float(blocks.x[other]), float(blocks.y[other]), self.rng.choice(ITEM_TYPES)))
+                elif ball_type == PIERCE:
+                    balls.pierce_count[i] += 1
+                    if balls.pierce_count[i] >= 3: balls.active[i] = False
+                self.play(0)
+                if self.damage_block(j, 1):
+                    block_type = blocks.block_type(j)
+                    self.score += 100
+                    self.spawn_explosion(*self.block_center(j), block_type.explosion_color)
+                    self.play(block_type.destruction_sound_id)
+                    self.trigger_shake(2)
+                    self.count_combo()
+                    if self.rng.random() < 0.1: self.items.append(self.item_pool.acquire(float(blocks.x[j]), float(blocks.y[j]), self.rng.choice(ITEM_TYPES)))
+        balls.x[i], balls.y[i], balls.vx[i], balls.vy[i] = x, y, vx, vy
+
+    def check_collision(self, x, y, radius, bounds):
+        x0, y0, x1, y1 = bounds
+        return x - radius < x1 and x + radius > x0 and y - radius < y1 and y + radius > y0
+
+    def check_item_collision(self, item):
+        return (item.x > self.launcher.x - 5 and item.x < self.launcher.x + 10 and
+                item.y > self.launcher.y and item.y < self.launcher.y + 5)
+
+    def generate_random_blocks(self):
+        self.blocks.clear()
+        self.grid = BlockGrid()
+        self.block_version += 1
+        self.layout_seed = self.rng.getrandbits(64) # Regenerates this exact layout
+        if self.layout is not None:
+            # Drawn all the same, so the gameplay stream doesn't depend on where blocks came from
+            for i in self.blocks.add_records(self.layout):
+                if self.blocks.active[i]:
+                    self.grid.insert(i, int(self.blocks.x[i]), int(self.blocks.y[i]), int(self.blocks.width[i]), int(self.blocks.height[i]))
+        else:
+            left, right, top, count = stage_field(self.stage, self.width, self.height, self.ground_y)
+            block_types = stage_block_types(self.stage)
+            for x, y, block_type in generate_layout(count, self.layout_seed, left, right, top, self.ground_y, block_types):
+                i = self.blocks.add(x, y, CELL, CELL, block_type)
+                self.grid.insert(i, x, y, CELL, CELL)
+        # Everything starts awake so anything left in the air falls on the first tick
+        for i in self.blocks.active_indices().tolist():
+            self.blocks.wake(i)
+
+    def settle_blocks(self):
+        # Moves awake blocks down under gravity, lowest first so each one sees
+        # where the blocks under it ended up this tick. A block stops on the
+        # ground or on the first block below that overlaps it; on a resting
+        # block it goes back to sleep, on a falling one it rides along.
+        # Sleeping blocks cost nothing here.
+        blocks, grid = self.blocks, self.grid
+        if blocks.awake_count == 0:
+            return
+        awake = np.flatnonzero(blocks.awake[:blocks.count])
+        order = awake[np.argsort(-(blocks.y[awake] + blocks.height[awake]), kind="stable")].tolist()
+        bounds = grid.bounds
+        for i in order:
+            if not blocks.active[i]:
+                blocks.sleep(i)
+                continue
+            x0, y, x1, bottom = bounds[i]
+            height = float(blocks.height[i])
+            vy = min(float(blocks.vy[i]) + BLOCK_GRAVITY, MAX_FALL_SPEED)
+            floor, support = self.ground_y, None
+            for j in grid.query(x0, bottom, x1, bottom + vy):
+                bx0, by0, bx1, _ = bounds[j]
+                if j != i and bx0 < x1 and bx1 > x0 and bottom - CONTACT <= by0 < floor:
+                    floor, support = by0, j
+            landed = bottom + vy >= floor
+            if not landed:
+                blocks.vy[i] = vy
+                new_y = y + vy
+            else:
+                new_y = floor - height
+                if support is not None and blocks.awake[support]:
+                    blocks.vy[i] = blocks.vy[support]
+                else:
+                    blocks.sleep(i)
+            if new_y != y:
+                blocks.y[i] = new_y
+                grid.remove(i)
+                grid.place(i, float(blocks.x[i]), new_y, float(blocks.width[i]), height)
+                self.block_version += 1
+            if landed and vy >= BREAK_SPEED and self.damage_block(i, 1):
+                block_type = blocks.block_type(i)
+                self.score += 100
+                self.spawn_explosion(*self.block_center(i), block_type.explosion_color)
+                self.play(block_type.destruction_sound_id)
+                self.trigger_shake(2)
+                self.count_combo()
+
+    def wake_stack(self, i):
+        # Wakes the island resting on block i: every block touching its top,
+        # the blocks on those, and so on up
+        blocks, grid = self.blocks, self.grid
+        pending = [i]
+        while pending:
+            j = pending.pop()
+            x0, top, x1 = float(blocks.x[j]), float(blocks.y[j]), float(blocks.x[j] + blocks.width[j])
+            for k in grid.query(x0, top, x1, top):
+                bx0, _, bx1, by1 = grid.bounds[k]
+                if not blocks.awake[k] and bx0 < x1 and bx1 > x0 and abs(by1 - top) < CONTACT:
+                    blocks.wake(k)
+                    pending.append(k)
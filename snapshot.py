@@ -0,0 +1,215 @@
+import struct
+import zlib
+from operator import attrgetter
+
+import numpy as np
+
+from balls import BALL_TYPES
+from broadphase import BlockGrid
+from simulation import ITEM_TYPES, Simulation
+
+MAGIC = b"DMSS"
+VERSION = 2 # Bumped whenever a field is added, dropped or reordered
+
+# Simulation attributes kept as one int64 array, in this order
+SIM_FIELDS = ("stage", "frame", "score", "balls_left", "combo_count", "combo_timer", "multi_ball_timer", "big_ball_timer",
+              "laser_beam_timer", "fever_mode", "fever_timer", "fever_shot_timer", "fantastic_display_timer", "was_power_max",
+              "block_version")
+BOOL_FIELDS = ("fever_mode", "was_power_max")
+# After SIM_FIELDS: launcher x, y and angle, ball type, outcome, live blocks
+OUTCOMES = (None, "won", "lost")
+BALL_COLUMNS = ("x", "y", "vx", "vy", "prev_x", "prev_y", "radius", "ball_type", "pierce_count", "active")
+BLOCK_COLUMNS = ("x", "y", "width", "height", "vy", "hp", "type_id", "active", "awake")
+PARTICLE_COLUMNS = ("x", "y", "vx", "vy", "color", "life")
+# Rows of the item and laser arrays, each read off every live object
+ITEM_FIELDS = (attrgetter("x"), attrgetter("y"), lambda item: ITEM_TYPES.index(item.item_type), attrgetter("vy"))
+LASER_FIELDS = (attrgetter("x"), attrgetter("y"), attrgetter("angle"), attrgetter("length"), attrgetter("travel"),
+                lambda laser: -1 if laser.pierce is None else laser.pierce, attrgetter("hits"), attrgetter("blocked"))
+ITEM_ROWS = len(ITEM_FIELDS) # x, y, type, vy
+LASER_ROWS = len(LASER_FIELDS) # x, y, angle, length, travel, pierce (-1 for unlimited), hits, blocked
+HEADER = struct.Struct("<4sB7IQ")
+
+class Snapshot:
+    # One moment of a Simulation, and optionally of the particles drawn over
+    # it, as a handful of flat arrays: every ball, block, item and laser is a
+    # column in a 2D array rather than an object. Immutable once taken, so a
+    # snapshot can be restored any number of times.
+    __slots__ = ("ints", "power", "layout_seed", "rng", "balls", "blocks", "items", "lasers", "particles")
+
+    def to_bytes(self):
+        # Header, then the arrays raw and zlib-compressed
+        particles = self.particles
+        n_particles = 0 if particles is None else particles[0].shape[1] + 1 # 0 means no particles
+        out = bytearray(HEADER.pack(MAGIC, VERSION, len(self.ints), self.balls.shape[1], self.blocks.shape[1], self.items.shape[1],
+                                    self.lasers.shape[1], n_particles, self.rng[2] is not None, self.layout_seed))
+        body = [self.ints.tobytes(), struct.pack("<dd", self.power, self.rng[2] or 0.0), np.array(self.rng[1], np.uint32).tobytes(),
+                self.balls.tobytes(), self.blocks.tobytes(), self.items.tobytes(), self.lasers.tobytes()]
+        if particles is not None:
+            columns, head, generator = particles
+            state = generator["state"]
+            body.append(columns.tobytes())
+            body.append(struct.pack("<I", head) + state["state"].to_bytes(16, "little") + state["inc"].to_bytes(16, "little")
+                        + struct.pack("<IQ", generator["has_uint32"], generator["uinteger"]))
+        out += zlib.compress(b"".join(body), 1)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version, n_ints, n_balls, n_blocks, n_items, n_lasers, n_particles, has_gauss, layout_seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"not a version {VERSION} snapshot")
+        body = zlib.decompress(memoryview(data)[HEADER.size:])
+        pos = 0
+        def take(dtype, count, rows=1):
+            nonlocal pos
+            array = np.frombuffer(body, dtype, count * rows, pos)
+            pos += array.nbytes
+            return array.reshape(rows, count) if rows > 1 else array
+        snapshot = cls()
+        snapshot.ints = take(np.int64, n_ints)
+        snapshot.power, gauss = struct.unpack_from("<dd", body, pos)
+        pos += 16
+        snapshot.rng = (3, tuple(take(np.uint32, 625).tolist()), gauss if has_gauss else None)
+        snapshot.layout_seed = layout_seed
+        snapshot.balls = take(np.float64, n_balls, len(BALL_COLUMNS))
+        snapshot.blocks = take(np.float64, n_blocks, len(BLOCK_COLUMNS))
+        snapshot.items = take(np.float64, n_items, ITEM_ROWS)
+        snapshot.lasers = take(np.float64, n_lasers, LASER_ROWS)
+        snapshot.particles = None
+        if n_particles:
+            columns = take(np.float32, n_particles - 1, len(PARTICLE_COLUMNS))
+            head, = struct.unpack_from("<I", body, pos)
+            state = int.from_bytes(body[pos + 4:pos + 20], "little")
+            inc = int.from_bytes(body[pos + 20:pos + 36], "little")
+            has_uint32, uinteger = struct.unpack_from("<IQ", body, pos + 36)
+            generator = {"bit_generator": "PCG64", "state": {"state": state, "inc": inc}, "has_uint32": has_uint32, "uinteger": uinteger}
+            snapshot.particles = (columns, head, generator)
+        return snapshot
+
+def stack(store, columns, n, dtype=np.float64):
+    # The first n rows of a store's columns as one (columns, n) array
+    out = np.empty((len(columns), n), dtype)
+    for row, name in enumerate(columns):
+        out[row] = getattr(store, name)[:n]
+    return out
+
+def gather(objects, fields):
+    # (fields, objects) array filled a row at a time, one field of every object
+    n = len(objects)
+    out = np.empty((len(fields), n))
+    for row, field in enumerate(fields):
+        out[row] = np.fromiter(map(field, objects), np.float64, n)
+    return out
+
+def unstack(array, store, columns):
+    for row, name in enumerate(columns):
+        getattr(store, name)[:array.shape[1]] = array[row]
+
+def capture(sim, particles=None):
+    # Costs a few array copies whatever the number of balls and blocks
+    snapshot = Snapshot()
+    launcher = sim.launcher
+    values = [getattr(sim, name) for name in SIM_FIELDS]
+    values += (launcher.x, launcher.y, launcher.angle, BALL_TYPES.index(sim.current_ball_type), OUTCOMES.index(sim.outcome),
+               sim.blocks.remaining)
+    snapshot.ints = np.array(values, np.int64)
+    snapshot.power = float(launcher.power)
+    snapshot.layout_seed = sim.layout_seed
+    snapshot.rng = sim.rng.getstate()
+    snapshot.balls = stack(sim.balls, BALL_COLUMNS, sim.balls.count)
+    snapshot.blocks = stack(sim.blocks, BLOCK_COLUMNS, sim.blocks.count)
+    snapshot.items = gather([item for item in sim.items if item.is_active], ITEM_FIELDS)
+    snapshot.lasers = gather([laser for laser in sim.lasers if laser.is_active], LASER_FIELDS)
+    snapshot.particles = None
+    if particles is not None:
+        snapshot.particles = (stack(particles, PARTICLE_COLUMNS, particles.used, np.float32), particles.head,
+                              particles.rng.bit_generator.state)
+    return snapshot
+
+def restore(sim, snapshot, particles=None):
+    # Puts `sim` (and `particles`) back as they were at capture(). The
+    # Simulation must have been made with the same width, height, styles and
+    # substeps. block_version moves forward rather than back, so caches keyed
+    # on it never mistake the restored blocks for ones seen since.
+    version = sim.block_version
+    ints = snapshot.ints.tolist()
+    for name, value in zip(SIM_FIELDS, ints):
+        setattr(sim, name, bool(value) if name in BOOL_FIELDS else value)
+    launcher = sim.launcher
+    launcher.x, launcher.y, launcher.angle, ball_type, outcome, remaining = ints[len(SIM_FIELDS):]
+    launcher.power = snapshot.power
+    sim.current_ball_type = BALL_TYPES[ball_type]
+    sim.outcome = OUTCOMES[outcome]
+    sim.rng.setstate(snapshot.rng)
+
+    balls = sim.balls
+    n = snapshot.balls.shape[1]
+    if n > balls.capacity: balls.grow(max(n, balls.capacity * 2))
+    unstack(snapshot.balls, balls, BALL_COLUMNS)
+    balls.count = n
+
+    blocks = sim.blocks
+    n = snapshot.blocks.shape[1]
+    same_layout = sim.layout_seed == snapshot.layout_seed and blocks.count == n
+    was_active, was_y = blocks.active[:blocks.count].copy(), blocks.y[:blocks.count].copy()
+    if n > blocks.capacity: blocks.grow(max(n, blocks.capacity * 2))
+    unstack(snapshot.blocks, blocks, BLOCK_COLUMNS)
+    blocks.count = n
+    blocks.remaining = remaining
+    blocks.awake_count = int(np.count_nonzero(blocks.awake[:n]))
+    sim.layout_seed = snapshot.layout_seed
+    restore_grid(sim, was_active, was_y, same_layout)
+    sim.block_version = max(version, sim.block_version) + 1
+
+    for item in sim.items:
+        sim.item_pool.release(item)
+    sim.items[:] = []
+    for x, y, kind, vy in snapshot.items.T.tolist():
+        item = sim.item_pool.acquire(x, y, ITEM_TYPES[int(kind)])
+        item.vy = vy
+        sim.items.append(item)
+    for laser in sim.lasers:
+        sim.laser_pool.release(laser)
+    sim.lasers[:] = []
+    for x, y, angle, length, travel, pierce, hits, blocked in snapshot.lasers.T.tolist():
+        laser = sim.laser_pool.acquire(x, y, angle, None if pierce < 0 else int(pierce))
+        laser.length, laser.travel, laser.hits, laser.blocked = length, travel, int(hits), bool(blocked)
+        sim.lasers.append(laser)
+
+    if particles is not None and snapshot.particles is not None:
+        columns, head, generator = snapshot.particles
+        particles.life[:] = 0
+        unstack(columns, particles, PARTICLE_COLUMNS)
+        particles.used = columns.shape[1]
+        particles.head = head
+        particles.rng.bit_generator.state = generator
+
+def from_snapshot(snapshot, like):
+    # A new Simulation in the state of `snapshot`, sharing nothing with
+    # `like`, which only lends the settings a snapshot doesn't hold: size,
+    # styles, laser pierce and substeps. It is built as stage 0, the smallest
+    # layout, and restore() then replaces every block.
+    sim = Simulation(like.width, like.height, launcher_style=like.launcher.style, ball_style=like.ball_style,
+                     laser_pierce=like.laser_pierce, substeps=like.substeps)
+    restore(sim, snapshot)
+    return sim
+
+def clone(sim):
+    return from_snapshot(capture(sim), sim)
+
+def restore_grid(sim, was_active, was_y, same_layout):
+    # With the same layout only blocks that were destroyed, brought back or
+    # moved since are taken out of or put back into the grid; otherwise it is
+    # rebuilt. Cells stay in index order either way, as they always are.
+    blocks, grid = sim.blocks, sim.grid
+    n = blocks.count
+    active = blocks.active[:n]
+    if not same_layout:
+        grid = sim.grid = BlockGrid(grid.cell_size)
+        for i in np.flatnonzero(active).tolist():
+            grid.insert(i, float(blocks.x[i]), float(blocks.y[i]), float(blocks.width[i]), float(blocks.height[i]))
+        return
+    changed = np.flatnonzero((was_active != active) | (active & (was_y != blocks.y[:n]))).tolist()
+    for i in changed:
+        grid.remove(i)
+        if blocks.active[i]: grid.place(i, float(blocks.x[i]), float(blocks.y[i]), float(blocks.width[i]), float(blocks.height[i]))
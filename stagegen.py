@@ -0,0 +1,66 @@
+import random
+
+CELL = 10 # Blocks sit on a grid of CELL x CELL slots
+MAX_FILL = 0.75 # Share of a playfield's slots filled before the next, larger field is used
+
+def stage_block_count(stage):
+    return 5 + stage * 2
+
+def stage_field(stage, width, height, ground_y, cell=CELL):
+    # Playfield (left, right, top) for a stage and how many blocks go in it.
+    # Early stages use the right half up to mid-screen like before; busier
+    # stages first build taller, then spread left towards the launcher, and
+    # past that the count is capped at a full field.
+    right = width - cell
+    fields = [(width // 2, ground_y - height // 2), (width // 2, 2 * cell), (width * 3 // 10, 2 * cell)]
+    count = stage_block_count(stage)
+    for left, top in fields:
+        capacity = ((right - left) // cell) * ((ground_y - top) // cell)
+        if count <= capacity * MAX_FILL:
+            break
+    return left, right, top, min(count, capacity)
+
+def generate_layout(count, seed, left, right, top, bottom, block_types, cell=CELL):
+    # Blocks as (x, y, block_type) built up from `bottom` as stacks, towers and
+    # walls. Each column only tracks its height, so blocks never overlap and
+    # nothing floats, and placement costs O(count + columns).
+    rng = random.Random(seed)
+    cols = (right - left) // cell
+    rows = (bottom - top) // cell
+    count = min(count, cols * rows)
+    heights = [0] * cols
+    row_y = [bottom - (r + 1) * cell for r in range(rows)]
+    open_cols = list(range(cols)) # Columns with room left
+    slots = list(range(cols)) # Index of each column in open_cols
+    blocks = []
+
+    def build(c, n, block_type):
+        h = heights[c]
+        n = min(n, rows - h, count - len(blocks))
+        if n <= 0:
+            return
+        x = left + c * cell
+        blocks.extend([(x, y, block_type) for y in row_y[h:h + n]])
+        heights[c] = h + n
+        if h + n == rows:
+            # Column full: swap it out of open_cols
+            last = open_cols.pop()
+            if last != c:
+                open_cols[slots[c]] = last
+                slots[last] = slots[c]
+
+    while len(blocks) < count:
+        c = open_cols[rng.randrange(len(open_cols))]
+        block_type = rng.choice(block_types)
+        shape = rng.random()
+        if shape < 0.4: # Stack
+            build(c, rng.randint(1, 3), block_type)
+        elif shape < 0.7: # Tower, two columns wide
+            tall = rng.randint(3, 6)
+            build(c, tall, block_type)
+            if c + 1 < cols: build(c + 1, tall, block_type)
+        else: # Wall
+            levels = rng.randint(1, 2)
+            for wall_col in range(c, min(cols, c + rng.randint(3, 6))):
+                build(wall_col, levels, block_type)
+    return blocks
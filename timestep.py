@@ -0,0 +1,39 @@
+TICK_RATE = 30 # Game ticks per second; timers, replays and audio all count these
+
+class FixedClock:
+    # Turns wall-clock time into whole game ticks. advance() says how many
+    # ticks are due; `alpha` is how far the clock has got towards the next
+    # one, for drawing moving things between their last two positions. More
+    # than `max_steps` ticks behind, the rest is dropped: a slow machine runs
+    # at full speed until it can't keep up even without drawing, and only
+    # then slows down instead of falling further and further behind.
+    def __init__(self, rate=TICK_RATE, max_steps=5, snap=0.1):
+        self.rate = rate
+        self.max_steps = max_steps
+        self.snap = snap # Frames this close to a tick boundary, in ticks, count as on it
+        self.last = None
+        self.accumulator = 0.0 # Ticks due, fractional
+        self.alpha = 1.0
+        self.dropped = 0 # Ticks given up to the catch-up cap
+
+    def reset(self):
+        self.last = None
+
+    def advance(self, now):
+        if self.last is None:
+            self.accumulator = 1.0 # First frame gets one tick
+        else:
+            self.accumulator += (now - self.last) * self.rate
+        self.last = now
+        # A frame rate matching the tick rate then runs exactly one tick per
+        # frame despite timer jitter, rather than alternating zero and two
+        nearest = round(self.accumulator)
+        if abs(self.accumulator - nearest) < self.snap: self.accumulator = float(nearest)
+        steps = int(self.accumulator)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = float(steps)
+        self.accumulator -= steps
+        self.alpha = self.accumulator
+        return steps